@@ -1,13 +1,33 @@
-from flask import Flask, jsonify, render_template
+from flask import Flask, Response, jsonify, render_template, request, stream_with_context
 import success  # 复用 success.py 中的核心逻辑
+from fetcher import fetch_all, get_estimate, get_history, iter_fetch  # 并发抓取引擎（带缓存）
+from intraday import TICKS  # 盘中估值分时序列
+import cache
+import fundlist  # 全市场基金名单（本地缓存）
+import http_client  # 共享连接池 / 重试统计
+import metrics  # 耗时直方图 / 回退率等运行指标
+import signal_log  # 列式信号历史日志
+import universe  # 基金名单（funds.json）与自选列表
+from response_cache import RESPONSE_CACHE  # 按快照版本缓存序列化 / 压缩后的响应
+from scheduler import LEADER_LOCK, SCHEDULER  # 后台预取
+from snapshot import SNAPSHOT
 from datetime import date
+import json
 import os
+import threading
+import time
 
 # 初始化 Flask 应用
 app = Flask(__name__)
 
-# 确保输出目录存在（复用 success.py 的配置）
-os.makedirs(success.OUTPUT_DIR, exist_ok=True)
+# SSE 推送：首轮信号推完后，再检查多少轮快照更新、每轮间隔（秒）；
+# 推完就结束连接、让出线程，浏览器的 EventSource 按 retry 字段（毫秒）过一会儿自动重连
+STREAM_UPDATE_ROUNDS = 2
+STREAM_UPDATE_INTERVAL = 30
+STREAM_RETRY_MS = 30000
+
+# 调度器未运行时，快照超过这么多秒就现场重新抓取
+SNAPSHOT_MAX_AGE = 300
 
 # ========== 路由定义 ==========
 
@@ -18,28 +38,33 @@ def index():
 
 @app.route("/api/funds")
 def get_all_funds():
-    """API：获取所有基金的基本信息（名称、代码）"""
-    return jsonify(success.FUNDS)
+    """API：获取所有基金的基本信息（名称、代码）；按名单版本序列化一次后复用"""
+    u = universe.current()
+    return RESPONSE_CACHE.response("funds", u.version, lambda: u.funds, cache_control="public, max-age=300")
 
 @app.route("/api/fund/<code>")
 def get_fund_detail(code):
     """API：获取单只基金的实时数据和信号分析"""
-    # 1. 抓取实时数据
-    data = success.fetch_fundgz(code) or success.fetch_eastmoney(code)
+    # 1. 抓取实时数据（优先用后台预取的快照）
+    item = SNAPSHOT.get(code)
+    data = item["data"] if item and item["data"] else get_estimate(code)
     if not data:
         return jsonify({"error": "基金代码不存在或数据获取失败"}), 404
     
     daily_change_pct = float(data.get("gszzl", 0.0))
     
     # 2. 抓取历史数据并计算连续趋势
-    history = success.fetch_history_nav(code, days=5) + [daily_change_pct]
+    if item and item["history"]:
+        history = item["history"] + [daily_change_pct]
+    else:
+        history = success.closes_before(get_history(code, days=5), data, days=5) + [daily_change_pct]
     consecutive_days, consecutive_dir, consecutive_pct = success.compute_recent_consecutive(history)
     
     # 3. 生成信号
     sig, reasons, risk = success.generate_signal(daily_change_pct, consecutive_days, consecutive_pct)
     
     # 4. 查找基金名称
-    fund_name = next((f["name"] for f in success.FUNDS if f["code"] == code), "未知名称")
+    fund_name = universe.current().name_of(code)
     
     return jsonify({
         "code": code,
@@ -53,38 +78,250 @@ def get_fund_detail(code):
         "risk_warning": risk
     })
 
+def _signal_row(item: dict, today: str) -> dict:
+    """由抓取结果生成接口返回的一行信号数据"""
+    r = success.analyze_fund(item["code"], item["name"], item["data"], item["history"], item.get("consecutive"))
+    return {
+        "date": today,
+        "code": r["code"],
+        "name": r["name"],
+        "daily_change_pct": r["daily_change_pct"],
+        "consecutive_days": r["consecutive_days"],
+        "signal": r["signal"],
+        "strength": round(r["strength"], 2),
+        "reasons": r["reasons"],
+        "status": item["status"]
+    }
+
 @app.route("/api/funds/signals")
 def get_all_signals():
-    """API：获取所有基金的信号分析（类似 success.py 的 main 函数逻辑）"""
+    """
+    API：获取所有基金的信号分析（类似 success.py 的 main 函数逻辑）
+    按快照版本缓存序列化结果：快照没刷新时不重新计算，客户端带 ETag 时直接 304
+    """
     today = date.today().isoformat()
-    results = []
-    for fund in success.FUNDS:
-        code, name = fund["code"], fund["name"]
-        
-        # 复用 success.py 的数据抓取和计算流程
-        data = success.fetch_fundgz(code) or success.fetch_eastmoney(code)
-        daily_change_pct = float(data.get("gszzl", 0.0)) if data else 0.0
-        
-        history = success.fetch_history_nav(code, days=5) + [daily_change_pct]
-        consecutive_days, consecutive_dir, consecutive_pct = success.compute_recent_consecutive(history)
-        
-        sig, reasons, risk = success.generate_signal(daily_change_pct, consecutive_days, consecutive_pct)
-        
-        strength = min(1, abs(consecutive_pct)/10)  # 信号强度（复用 success.py 逻辑）
-        
-        results.append({
-            "date": today,
-            "code": code,
-            "name": name,
-            "daily_change_pct": daily_change_pct,
-            "consecutive_days": consecutive_days,
-            "signal": sig,
-            "strength": round(strength, 2),
-            "reasons": reasons
-        })
-    return jsonify(results)
+    u = universe.current()
+    items, version, updated_at, stale = _current_items(u.funds)
+    # 名单版本也在键里：funds.json 删减基金时快照不一定变，不能还返回旧名单的结果
+    return RESPONSE_CACHE.response("signals", (version, today, u.version, stale),
+                                   lambda: [_signal_row(item, today) for item in items],
+                                   last_modified=updated_at)
+
+def _snapshot_items(funds=None):
+    """
+    读快照，返回 (items, 版本号, 写入时间)（见 SNAPSHOT.read）；快照没覆盖这批基金（默认全部）或不够新时 items 为 None
+    调度器在跑时（本进程或多 worker 部署中的主进程）不看时效（盘后本来就不刷新）
+    """
+    funds = universe.current().funds if funds is None else funds
+    max_age = None if SCHEDULER.is_active() else SNAPSHOT_MAX_AGE
+    return SNAPSHOT.read([f["code"] for f in funds], max_age=max_age)
+
+def _current_items(funds=None):
+    """
+    优先读后台预取的快照；快照过期（调度器没在跑，如刚重启）时先用旧快照作答（数据标为 stale），同时后台刷新；
+    快照里没有这批基金时才现场并发抓取（超过总截止时间的基金标记为 stale / missing），写回快照后再读出
+    返回 (items, version, updated_at, stale)：version / updated_at 与 items 同一次读出，响应缓存按它作键；
+    stale 表示用的是过期快照，响应缓存按它区分（同一快照版本过期前后内容不同）
+    """
+    funds = universe.current().funds if funds is None else funds
+    items, version, updated_at = _snapshot_items(funds)
+    if items is not None:
+        return items, version, updated_at, False
+    codes = [f["code"] for f in funds]
+    items, version, updated_at = SNAPSHOT.read(codes)
+    if items is not None:
+        _refresh_in_background(funds)
+        return _mark_stale(items), version, updated_at, True
+    SNAPSHOT.update(fetch_all(funds))
+    items, version, updated_at = SNAPSHOT.read(codes)
+    return items, version, updated_at, False
+
+def _mark_stale(items):
+    """过期快照里的数据不是刚抓的，刷新完成之前不当作 ok 返回"""
+    return [dict(item, status="stale") if item["status"] == "ok" else item for item in items]
+
+_background_refresh = threading.Lock()
+
+def _refresh_in_background(funds):
+    """后台抓一次写回快照；已有刷新在跑时不重复发起"""
+    if not _background_refresh.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            SNAPSHOT.update(fetch_all(funds))
+        except Exception as e:
+            print("后台刷新快照失败:", e)
+        finally:
+            _background_refresh.release()
+
+    threading.Thread(target=run, name="snapshot-refresh", daemon=True).start()
+
+def _sse(event: str, payload) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+@app.route("/api/funds/signals/stream")
+def stream_signals():
+    """
+    API（SSE）：逐只推送信号，哪只先算完先推哪只（event: signal），全部推完发 event: done
+    之后每隔 interval 秒看一次共享快照的版本号，变了就和已推送的行比对，有变化的基金推送 event: update，
+    共 updates 轮后发 event: end 并断开；更新只读快照（由调度器主进程刷新），各 worker 的连接都不直接请求上游；
+    开头的 retry 字段让浏览器 STREAM_RETRY_MS 毫秒后自动重连，一个连接最多占用线程 updates × interval 秒
+    """
+    updates = max(0, min(request.args.get("updates", STREAM_UPDATE_ROUNDS, type=int), STREAM_UPDATE_ROUNDS))
+    interval = max(5, min(request.args.get("interval", STREAM_UPDATE_INTERVAL, type=int), STREAM_UPDATE_INTERVAL))
+
+    def generate():
+        yield f"retry: {STREAM_RETRY_MS}\n\n"
+        today = date.today().isoformat()
+        funds = universe.current().funds
+        codes = [f["code"] for f in funds]
+        snap, version, _ = _snapshot_items(funds)
+        # 有快照直接整批推送；没有就边抓边推，抓完写回快照
+        fetched, sent = [], {}
+        for item in (snap if snap is not None else iter_fetch(funds)):
+            fetched.append(item)
+            sent[item["code"]] = row = _signal_row(item, today)
+            yield _sse("signal", row)
+        if snap is None:
+            SNAPSHOT.update(fetched)
+        yield _sse("done", {"count": len(sent)})
+
+        for _ in range(updates):
+            time.sleep(interval)
+            snap, new_version, _ = SNAPSHOT.read(codes)
+            if snap is None or new_version == version:
+                continue
+            version = new_version
+            for item in snap:
+                row = _signal_row(item, today)
+                if row != sent.get(item["code"]):
+                    sent[item["code"]] = row
+                    yield _sse("update", row)
+        yield _sse("end", {})
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/api/watchlists")
+def get_watchlists():
+    """API：自选列表名称及其中的基金代码（配置在 funds.json）"""
+    return jsonify(universe.current().watchlists)
+
+@app.route("/api/watchlists/<name>/signals")
+def get_watchlist_signals(name):
+    """API：某个自选列表的信号；数据取自共享快照，同一版本的结果所有用户共用"""
+    u = universe.current()
+    funds = u.watchlist(name)
+    if funds is None:
+        return jsonify({"error": "自选列表不存在"}), 404
+    today = date.today().isoformat()
+    items, version, updated_at, stale = _current_items(funds)
+    return RESPONSE_CACHE.response(("watchlist", name), (version, today, u.version, stale),
+                                   lambda: [_signal_row(item, today) for item in items],
+                                   last_modified=updated_at)
+
+@app.route("/api/search")
+def search_funds():
+    """API：按名称模糊搜索全市场基金，?q=名称&k=返回条数"""
+    q = request.args.get("q", "").strip()
+    if not q:
+        return jsonify({"error": "缺少参数 q"}), 400
+    k = min(request.args.get("k", 10, type=int), 50)
+    index = fundlist.universe_index()
+    if index is None:
+        return jsonify({"error": "基金名单加载失败"}), 503
+    return jsonify(index.search(q, k))
+
+@app.route("/api/signals/history")
+def get_signals_history():
+    """API：信号历史，?start=&end=（YYYY-MM-DD）&code=多个逗号分隔&signal=&limit="""
+    codes = [c for c in request.args.get("code", "").split(",") if c]
+    signals = [s for s in request.args.get("signal", "").split(",") if s]
+    limit = min(request.args.get("limit", 5000, type=int), 50000)
+    try:
+        rows = signal_log.query(request.args.get("start"), request.args.get("end"),
+                                codes or None, signals or None, limit=limit)
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify({"count": len(rows), "rows": rows})
+
+@app.route("/api/fund/<code>/intraday")
+def get_fund_intraday(code):
+    """API：单只基金当日盘中估值分时序列，以及涨跌幅达到阈值的时刻，?threshold= 默认单日涨跌阈值"""
+    threshold = request.args.get("threshold", success.THRESHOLDS["daily_move_threshold"], type=float)
+    return jsonify(dict(TICKS.series(code), code=code, name=universe.current().name_of(code),
+                        threshold=threshold, crossings=TICKS.crossings(code, threshold)))
+
+@app.route("/api/intraday/alerts")
+def get_intraday_alerts():
+    """API：当日盘中涨跌幅首次达到阈值的基金，按时刻先后，?threshold=&watchlist="""
+    threshold = request.args.get("threshold", success.THRESHOLDS["daily_move_threshold"], type=float)
+    u = universe.current()
+    funds = u.watchlist(request.args.get("watchlist", universe.ALL_WATCHLIST))
+    if funds is None:
+        return jsonify({"error": "自选列表不存在"}), 404
+    alerts = TICKS.alerts(threshold, [f["code"] for f in funds])
+    for a in alerts:
+        a["name"] = u.name_of(a["code"])
+    return jsonify({"threshold": threshold, "count": len(alerts), "alerts": alerts})
+
+@app.route("/api/scheduler/status")
+def get_scheduler_status():
+    """API：后台预取调度器状态，含每只基金上次刷新时间"""
+    return jsonify(SCHEDULER.status())
+
+@app.route("/api/http/stats")
+def get_http_stats():
+    """API：上游 HTTP 连接复用和重试计数"""
+    return jsonify(http_client.stats())
+
+@app.route("/api/cache/stats")
+def get_cache_stats():
+    """API：估值 / 历史缓存及响应缓存的命中统计"""
+    return jsonify(cache.all_stats() + [RESPONSE_CACHE.stats()])
+
+@app.route("/metrics")
+def get_metrics():
+    """Prometheus 指标：上游耗时、抓取结果、估值回退、空历史、信号计算耗时"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 # ========== 运行应用 ==========
+def preload_snapshot() -> int:
+    """
+    启动时从 data/snapshot.db 加载上次持久化的快照，并预先序列化 /api/funds/signals 的响应：
+    重启后第一个请求直接用旧快照作答，不必等整批抓取；新数据由调度器或后台刷新随后补上
+    旧快照已过期时数据标为 stale（与 _current_items 的判断相同），刷新完成前不当作 ok
+    """
+    n = SNAPSHOT.load()
+    u = universe.current()
+    items, version, updated_at = _snapshot_items(u.funds)
+    stale = items is None
+    if stale:
+        items, version, updated_at = SNAPSHOT.read([f["code"] for f in u.funds])
+    if items is not None:
+        today = date.today().isoformat()
+        if stale:
+            items = _mark_stale(items)
+        RESPONSE_CACHE.payload("signals", (version, today, u.version, stale),
+                               lambda: [_signal_row(item, today) for item in items],
+                               last_modified=updated_at)
+    return n
+
+def start_scheduler():
+    """
+    按环境变量 FUND_SCHEDULER（默认开启，设 0 关闭）启动后台预取
+    多进程时靠文件锁选出一个进程抓取，其余进程读共享快照
+    """
+    if os.environ.get("FUND_SCHEDULER", "1") != "0":
+        SCHEDULER.start(leader_lock=LEADER_LOCK)
+
 if __name__ == "__main__":
-    # 开发环境：开启 debug 模式，允许外部访问
-    app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
+    # 开发服务器：FUND_DEBUG=0 关闭 debug / reloader；生产部署用 gunicorn（见 wsgi.py、gunicorn.conf.py）
+    debug = os.environ.get("FUND_DEBUG", "1") == "1"
+    # debug 模式下 reloader 会起两个进程，只在实际处理请求的子进程里启动调度器
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        preload_snapshot()
+        start_scheduler()
+    app.run(host=os.environ.get("FUND_HOST", "0.0.0.0"), port=int(os.environ.get("FUND_PORT", "5000")),
+            debug=debug, threaded=True)
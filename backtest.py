@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+backtest.py
+- 用本地净值库（navstore）的多年日涨跌回放 generate_signal 的信号规则
+- 参数网格：单日涨跌阈值 daily_move_threshold × 强度下限 signal_strength_cutoff × 连续天数下限 min_streak_days
+  （signal_strength_cutoff 目前未参与 generate_signal，这里作为趋势提醒的过滤条件评估；取 0 即为现行规则）
+- 每只基金一次向量化计算整个网格：连续趋势用 batch_signals 对滑动窗口批量算出，与参数无关只算一次
+- 对买入 / 减持 / 趋势提醒分别统计：信号次数、命中率、未来 N 日平均收益、未来 N 日内最大回撤
+- 各基金放进进程池并行
+用法：
+    python navstore.py sync            # 先把历史净值同步到本地
+    python backtest.py --horizon 5 --workers 4
+输出：outputs/backtest_YYYYMMDD.csv，并打印按命中率排序的参数组合汇总
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+import batch_signals
+import navstore
+import success
+import universe
+
+# ========== 配置 ==========
+WINDOW = 6   # 与线上一致：最近 5 个交易日 + 当日
+GRID = {
+    "daily_move_threshold": [1.0, 1.5, 2.0, 2.5, 3.0],
+    "signal_strength_cutoff": [0.0, 0.2, 0.4, 0.6],
+    "min_streak_days": [2, 3, 4],
+}
+SIGNALS = (batch_signals.BUY, batch_signals.REDUCE, batch_signals.TREND)
+
+
+def param_grid(grid: Dict[str, list] = GRID) -> np.ndarray:
+    """网格展开成 P×3 数组：[daily_move_threshold, signal_strength_cutoff, min_streak_days]"""
+    return np.array(list(itertools.product(grid["daily_move_threshold"],
+                                           grid["signal_strength_cutoff"],
+                                           grid["min_streak_days"])), dtype=np.float64)
+
+
+# ========== 单只基金 ==========
+
+def forward_metrics(changes: np.ndarray, horizon: int):
+    """
+    对每个交易日 t 计算未来 horizon 日（t+1 ~ t+horizon）的累计收益（%）和区间内最大回撤（%，<=0）
+    末尾不足 horizon 日的位置为 NaN
+    """
+    n = len(changes)
+    growth = np.concatenate([[1.0], np.cumprod(1 + changes / 100.0)])   # growth[t+1] 为第 t 日收盘净值（相对）
+    fwd = np.full(n, np.nan)
+    mdd = np.full(n, np.nan)
+    if n <= horizon:
+        return fwd, mdd
+    paths = sliding_window_view(growth[1:], horizon + 1)[: n - horizon]   # 第 t 行：第 t ~ t+horizon 日净值
+    rel = paths / paths[:, :1]
+    fwd[: n - horizon] = (rel[:, -1] - 1) * 100
+    running_max = np.maximum.accumulate(rel, axis=1)
+    mdd[: n - horizon] = (rel / running_max - 1).min(axis=1) * 100
+    return fwd, mdd
+
+
+def backtest_fund(code: str, changes: np.ndarray, params: np.ndarray, horizon: int) -> List[dict]:
+    """单只基金：整个参数网格一次算完，返回每个（参数组合, 信号类型）一行统计"""
+    changes = np.nan_to_num(np.asarray(changes, dtype=np.float64), nan=0.0)
+    if len(changes) < WINDOW + horizon:
+        return []
+    windows = sliding_window_view(changes, WINDOW)          # 第 i 行对应交易日 i+WINDOW-1
+    days, direction, change_sum = batch_signals.compute_consecutive(windows)
+    strength = batch_signals.compute_strength(change_sum)
+    daily = windows[:, -1]
+    fwd, mdd = forward_metrics(changes, horizon)
+    fwd, mdd = fwd[WINDOW - 1:], mdd[WINDOW - 1:]
+    valid = ~np.isnan(fwd)
+
+    thr = params[:, 0:1]
+    cutoff = params[:, 1:2]
+    min_days = params[:, 2:3]
+    buy = (np.abs(daily) >= thr) & (daily > 0)
+    reduce = (np.abs(daily) >= thr) & (daily <= 0)
+    trend = ~(buy | reduce) & (days >= min_days) & (strength >= cutoff)
+
+    # 每类信号的“预期方向”：买入看涨、减持看跌、趋势提醒看延续
+    expected = {
+        batch_signals.BUY: np.ones_like(fwd),
+        batch_signals.REDUCE: -np.ones_like(fwd),
+        batch_signals.TREND: direction.astype(np.float64),
+    }
+    fwd0 = np.where(valid, fwd, 0.0)
+    mdd0 = np.where(valid, mdd, np.inf)
+
+    rows = []
+    for sig, mask in ((batch_signals.BUY, buy), (batch_signals.REDUCE, reduce), (batch_signals.TREND, trend)):
+        mask = mask & valid
+        count = mask.sum(axis=1)
+        hit = (mask & (np.sign(fwd0) == expected[sig])).sum(axis=1)
+        ret_sum = mask.astype(np.float64) @ fwd0
+        worst = np.where(mask, mdd0, np.inf).min(axis=1)
+        for p in range(len(params)):
+            n = int(count[p])
+            rows.append({
+                "code": code,
+                "daily_move_threshold": float(params[p, 0]),
+                "signal_strength_cutoff": float(params[p, 1]),
+                "min_streak_days": int(params[p, 2]),
+                "signal": sig,
+                "count": n,
+                "hits": int(hit[p]),
+                "hit_rate": round(float(hit[p]) / n, 4) if n else None,
+                "avg_forward_return": round(float(ret_sum[p]) / n, 4) if n else None,
+                "max_drawdown": round(float(worst[p]), 4) if n else None,
+            })
+    return rows
+
+
+def _load_changes(code: str, start: Optional[str], end: Optional[str]) -> np.ndarray:
+    rows = navstore.history(code, start, end)
+    return np.array([r["change_pct"] if r["change_pct"] is not None else 0.0 for r in rows])
+
+
+# ========== 全组合 ==========
+
+def run(codes: List[str], horizon: int = 5, workers: Optional[int] = None,
+        start: Optional[str] = None, end: Optional[str] = None) -> List[dict]:
+    params = param_grid()
+    series = {code: _load_changes(code, start, end) for code in codes}
+    rows: List[dict] = []
+    if workers == 1:
+        for code, changes in series.items():
+            rows.extend(backtest_fund(code, changes, params, horizon))
+        return rows
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(backtest_fund, code, changes, params, horizon)
+                   for code, changes in series.items()]
+        for fut in futures:
+            rows.extend(fut.result())
+    return rows
+
+
+def summarize(rows: List[dict]) -> List[dict]:
+    """跨基金汇总：按（参数组合, 信号类型）合计次数、命中率和平均收益"""
+    agg: Dict[tuple, dict] = {}
+    for r in rows:
+        key = (r["daily_move_threshold"], r["signal_strength_cutoff"], r["min_streak_days"], r["signal"])
+        a = agg.setdefault(key, {"count": 0, "hits": 0, "ret": 0.0, "mdd": 0.0})
+        if r["count"]:
+            a["count"] += r["count"]
+            a["hits"] += r["hits"]
+            a["ret"] += r["avg_forward_return"] * r["count"]
+            a["mdd"] = min(a["mdd"], r["max_drawdown"])
+    out = []
+    for (thr, cutoff, min_days, sig), a in agg.items():
+        if not a["count"]:
+            continue
+        out.append({
+            "daily_move_threshold": thr,
+            "signal_strength_cutoff": cutoff,
+            "min_streak_days": min_days,
+            "signal": sig,
+            "count": a["count"],
+            "hit_rate": round(a["hits"] / a["count"], 4),
+            "avg_forward_return": round(a["ret"] / a["count"], 4),
+            "max_drawdown": round(a["mdd"], 4),
+        })
+    out.sort(key=lambda x: (x["signal"], -x["hit_rate"]))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="信号阈值回测")
+    parser.add_argument("--codes", nargs="*", help="基金代码，默认基金名单（funds.json）全部")
+    parser.add_argument("--horizon", type=int, default=5, help="评估未来多少个交易日")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认 CPU 核数；1 为单进程")
+    parser.add_argument("--start", type=str, default=None, help="起始日期 YYYY-MM-DD")
+    parser.add_argument("--end", type=str, default=None, help="结束日期 YYYY-MM-DD")
+    parser.add_argument("--top", type=int, default=5, help="每类信号打印前几名参数组合")
+    args = parser.parse_args()
+
+    codes = args.codes or [f["code"] for f in universe.current().funds]
+    t0 = time.time()
+    rows = run(codes, args.horizon, args.workers, args.start, args.end)
+    elapsed = time.time() - t0
+    if not rows:
+        print("没有可回测的数据，请先运行：python navstore.py sync")
+        return
+
+    os.makedirs(success.OUTPUT_DIR, exist_ok=True)
+    out_file = os.path.join(success.OUTPUT_DIR, f"backtest_{date.today().strftime('%Y%m%d')}.csv")
+    with open(out_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    summary = summarize(rows)
+    for sig in SIGNALS:
+        print(f"\n【{sig}】命中率最高的参数组合（未来 {args.horizon} 日）：")
+        for s in [x for x in summary if x["signal"] == sig][: args.top]:
+            print(f"  阈值 {s['daily_move_threshold']}% / 强度≥{s['signal_strength_cutoff']} / 连续≥{s['min_streak_days']}天："
+                  f"{s['count']} 次，命中率 {s['hit_rate']:.1%}，平均收益 {s['avg_forward_return']:.2f}%，"
+                  f"最大回撤 {s['max_drawdown']:.2f}%")
+    print(f"\n✅ 已生成 {out_file}（{len(codes)} 只基金 × {len(param_grid())} 组参数，用时 {elapsed:.2f}s）")
+
+
+if __name__ == "__main__":
+    main()
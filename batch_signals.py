@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+batch_signals.py
+- 向量化批量信号计算：输入 基金×交易日 的涨跌矩阵（NumPy），一次算完所有基金
+- 逻辑与 success.compute_recent_consecutive / generate_signal 完全一致：
+  多数方向判定、零天跳过的连续天数、连续涨跌合计、强度、信号标签
+- 适合全市场（fundcode_search.js 上万只基金）或长历史的批量计算
+"""
+
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+import success
+
+BUY, REDUCE, TREND, NONE = "买入", "减持", "趋势提醒", "无操作"
+
+
+def build_matrix(histories: Sequence[Sequence[float]]) -> np.ndarray:
+    """
+    把长短不一的涨跌列表（从旧到新）拼成矩阵，右对齐，左侧补 0
+    补 0 不影响结果：零天本来就不计入方向判定和连续天数
+    """
+    width = max((len(h) for h in histories), default=0)
+    m = np.zeros((len(histories), width), dtype=np.float64)
+    for i, h in enumerate(histories):
+        if len(h):
+            m[i, width - len(h):] = h
+    return m
+
+
+def compute_consecutive(changes: np.ndarray):
+    """
+    批量版 compute_recent_consecutive，changes 为 基金×交易日 矩阵（列从旧到新）
+    返回三个数组：consecutive_days, consecutive_direction, consecutive_change_pct
+    """
+    m = np.nan_to_num(np.asarray(changes, dtype=np.float64), nan=0.0)
+    n_funds, n_days = m.shape
+    sign = np.sign(m).astype(np.int8)
+
+    # 多数方向：涨天数 >= 跌天数 记为涨，全是零天记为 0
+    pos = (sign > 0).sum(axis=1)
+    neg = (sign < 0).sum(axis=1)
+    direction = np.where(pos >= neg, 1, -1).astype(np.int8)
+    direction[(pos + neg) == 0] = 0
+
+    # 从最近一天往前数，遇到第一个反方向的非零天就中断
+    dir_col = direction[:, None]
+    breaker = (sign != 0) & (sign != dir_col)
+    has_break = breaker.any(axis=1)
+    last_break = np.where(has_break, n_days - 1 - breaker[:, ::-1].argmax(axis=1), -1)
+    in_streak = (sign != 0) & (sign == dir_col) & (np.arange(n_days) > last_break[:, None])
+
+    days = in_streak.sum(axis=1)
+    # 按“最近一天在前”的顺序逐项累加（cumsum 是顺序累加），保证与标量版浮点结果逐位一致
+    if n_days:
+        change_sum = np.cumsum(np.where(in_streak, m, 0.0)[:, ::-1], axis=1)[:, -1]
+    else:
+        change_sum = np.zeros(n_funds)
+    return days, direction, change_sum
+
+
+def compute_strength(change_sum: np.ndarray) -> np.ndarray:
+    return np.minimum(1, np.abs(change_sum) / 10)
+
+
+def generate_signals(daily_change_pct: np.ndarray, consecutive_days: np.ndarray,
+                     daily_move_threshold: Optional[float] = None) -> np.ndarray:
+    """批量版 generate_signal，只返回信号标签"""
+    if daily_move_threshold is None:
+        daily_move_threshold = success.THRESHOLDS["daily_move_threshold"]
+    daily = np.asarray(daily_change_pct, dtype=np.float64)
+    return np.where(np.abs(daily) >= daily_move_threshold,
+                    np.where(daily > 0, BUY, REDUCE),
+                    np.where(np.asarray(consecutive_days) >= 2, TREND, NONE))
+
+
+def run_batch(changes: np.ndarray, daily_change_pct: Optional[np.ndarray] = None) -> dict:
+    """
+    一次算完所有基金：
+        changes: 基金×交易日 矩阵，最后一列为当日涨跌（即 history + [daily_change_pct]）
+        daily_change_pct: 当日涨跌，默认取最后一列
+    """
+    m = np.asarray(changes, dtype=np.float64)
+    if daily_change_pct is None:
+        daily_change_pct = m[:, -1] if m.shape[1] else np.zeros(m.shape[0])
+    days, direction, change_sum = compute_consecutive(m)
+    return {
+        "daily_change_pct": np.asarray(daily_change_pct, dtype=np.float64),
+        "consecutive_days": days,
+        "consecutive_direction": direction,
+        "consecutive_change_pct": change_sum,
+        "strength": compute_strength(change_sum),
+        "signal": generate_signals(daily_change_pct, days),
+    }
+
+
+def run_histories(histories: List[List[float]]) -> dict:
+    """便捷入口：输入每只基金的 history + [daily_change_pct] 列表"""
+    return run_batch(build_matrix(histories))
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+breaker.py
+- 按上游域名的熔断器 + 自适应限速，http_client.get 每次请求前后调用
+- 熔断：最近 WINDOW 次请求里失败率超过 FAILURE_RATE（且至少 MIN_CALLS 次）就打开，
+  打开期间请求直接失败（CircuitOpenError），不再等 8 秒超时；OPEN_SECONDS 后放一个探测请求，
+  成功则恢复，失败则打开时间翻倍（最长 MAX_OPEN_SECONDS）
+- 限速：每个域名一个令牌桶，收到 429 / 403 时速率减半并遵守 Retry-After，之后每次成功缓慢回升；
+  排队超过 MAX_WAIT 秒直接放弃（RateLimitedError），避免尾延迟堆积
+- 两种异常都继承 requests.ConnectionError，调用方原有的异常处理和回退逻辑不用改；
+  异常类第一次用到时才创建（errors()），导入本模块不会连带导入 requests
+"""
+
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    import requests
+
+# ========== 配置 ==========
+WINDOW = 20               # 统计最近多少次请求
+MIN_CALLS = 5             # 窗口内至少这么多次才判断失败率
+FAILURE_RATE = 0.5        # 失败率阈值
+OPEN_SECONDS = 15.0       # 首次打开时长
+MAX_OPEN_SECONDS = 300.0
+
+DEFAULT_RATE = 20.0       # 每个域名每秒请求数上限（初始）
+MIN_RATE = 0.5
+MAX_RATE = 50.0
+RATE_RECOVERY = 0.5       # 每次成功请求速率回升多少
+BURST_SECONDS = 1.0       # 桶容量 = 速率 × BURST_SECONDS
+MAX_WAIT = 2.0            # 排队超过这么多秒就放弃
+
+THROTTLE_STATUS = (429, 403)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+_errors: Optional[Tuple[type, type]] = None
+_errors_lock = threading.Lock()
+
+
+def errors() -> Tuple[type, type]:
+    """(CircuitOpenError, RateLimitedError)"""
+    global _errors
+    with _errors_lock:
+        if _errors is None:
+            import requests
+
+            class CircuitOpenError(requests.ConnectionError):
+                """熔断打开，请求未发出"""
+
+            class RateLimitedError(requests.ConnectionError):
+                """限速排队超时，请求未发出"""
+
+            _errors = (CircuitOpenError, RateLimitedError)
+        return _errors
+
+
+def __getattr__(name: str):
+    # breaker.CircuitOpenError / breaker.RateLimitedError 照常可用
+    if name == "CircuitOpenError":
+        return errors()[0]
+    if name == "RateLimitedError":
+        return errors()[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class CircuitBreaker:
+    def __init__(self, host: str):
+        self.host = host
+        self.state = CLOSED
+        self._results: deque = deque(maxlen=WINDOW)   # True=成功
+        self._opened_at = 0.0
+        self._open_for = OPEN_SECONDS
+        self._probing = False
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.opened = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self._open_for:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True   # 只放一个探测请求
+                return True
+            self.rejected += 1
+            return False
+
+    def record(self, ok: bool):
+        with self._lock:
+            if self.state == HALF_OPEN and self._probing:
+                self._probing = False
+                if ok:
+                    self.state = CLOSED
+                    self._results.clear()
+                    self._open_for = OPEN_SECONDS
+                else:
+                    self._open(min(self._open_for * 2, MAX_OPEN_SECONDS))
+                return
+            self._results.append(ok)
+            if self.state == CLOSED and len(self._results) >= MIN_CALLS:
+                failures = self._results.count(False)
+                if failures / len(self._results) >= FAILURE_RATE:
+                    self._open(OPEN_SECONDS)
+
+    def release_probe(self):
+        """拿到探测名额但请求没发出去（如限速排队超时），把名额还回去"""
+        with self._lock:
+            self._probing = False
+
+    def _open(self, duration: float):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._open_for = duration
+        self._results.clear()
+        self.opened += 1
+
+    def is_open(self) -> bool:
+        """打开且尚未到探测时间（调用方据此直接走备用来源）"""
+        with self._lock:
+            return self.state == OPEN and time.monotonic() - self._opened_at < self._open_for
+
+    def status(self) -> dict:
+        with self._lock:
+            remaining = max(0.0, self._open_for - (time.monotonic() - self._opened_at)) if self.state == OPEN else 0.0
+            return {"state": self.state, "recent": len(self._results),
+                    "recent_failures": self._results.count(False), "open_remaining": round(remaining, 1),
+                    "opened": self.opened, "rejected": self.rejected}
+
+
+class AdaptiveRateLimiter:
+    """令牌桶；被上游限流（429/403）时速率减半，成功后线性回升"""
+
+    def __init__(self, rate: float = DEFAULT_RATE):
+        self.rate = rate
+        self._tokens = rate * BURST_SECONDS
+        self._last = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.throttled = 0
+        self.rejected = 0
+
+    def acquire(self, max_wait: float = MAX_WAIT) -> bool:
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                capacity = max(1.0, self.rate * BURST_SECONDS)
+                self._tokens = min(capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if now >= self._blocked_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = max(self._blocked_until - now, (1 - self._tokens) / self.rate)
+                if now + wait > deadline:
+                    self.rejected += 1
+                    return False
+            time.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(MAX_RATE, self.rate + RATE_RECOVERY)
+
+    def on_throttled(self, retry_after: Optional[float] = None):
+        with self._lock:
+            self.throttled += 1
+            self.rate = max(MIN_RATE, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+
+    def status(self) -> dict:
+        with self._lock:
+            return {"rate": round(self.rate, 2), "throttled": self.throttled, "rejected": self.rejected,
+                    "blocked_for": round(max(0.0, self._blocked_until - time.monotonic()), 1)}
+
+
+class HostGuard:
+    def __init__(self, host: str):
+        self.host = host
+        self.breaker = CircuitBreaker(host)
+        self.limiter = AdaptiveRateLimiter()
+
+    def before(self, max_wait: Optional[float] = None):
+        """请求前调用；熔断打开或限速排队超时抛异常。max_wait 可把排队时间压到 MAX_WAIT 以下（如整批剩余时间）"""
+        if not self.breaker.allow():
+            raise errors()[0](f"{self.host} 熔断中")
+        if not self.limiter.acquire(MAX_WAIT if max_wait is None else min(MAX_WAIT, max_wait)):
+            self.breaker.release_probe()
+            raise errors()[1](f"{self.host} 限速排队超时")
+
+    def after(self, response: Optional["requests.Response"] = None, error: Optional[BaseException] = None):
+        """请求后调用：5xx / 429 / 403 / 连接错误记为失败"""
+        if error is not None:
+            self.breaker.record(False)
+            return
+        status = response.status_code
+        if status in THROTTLE_STATUS:
+            self.limiter.on_throttled(_retry_after(response))
+            self.breaker.record(False)
+        elif status >= 500:
+            self.breaker.record(False)
+        else:
+            self.limiter.on_success()
+            self.breaker.record(True)
+
+    def status(self) -> dict:
+        return {"breaker": self.breaker.status(), "limiter": self.limiter.status()}
+
+
+def _retry_after(response: "requests.Response") -> Optional[float]:
+    value = response.headers.get("Retry-After")
+    try:
+        return min(float(value), MAX_OPEN_SECONDS) if value else None
+    except ValueError:
+        return None
+
+
+_guards: Dict[str, HostGuard] = {}
+_guards_lock = threading.Lock()
+
+
+def guard(host: str) -> HostGuard:
+    with _guards_lock:
+        g = _guards.get(host)
+        if g is None:
+            g = _guards[host] = HostGuard(host)
+        return g
+
+
+def is_open(host: str) -> bool:
+    with _guards_lock:
+        g = _guards.get(host)
+    return g is not None and g.breaker.is_open()
+
+
+def status() -> dict:
+    with _guards_lock:
+        guards = dict(_guards)
+    return {host: g.status() for host, g in sorted(guards.items())}
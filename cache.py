@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+cache.py
+- 内存 TTL 缓存，按 LRU 淘汰，限制条目数
+- stale-while-revalidate：过期但仍在宽限期内的数据先返回，后台线程刷新
+- 同一个 key 的并发请求合并成一次抓取（single-flight）
+- 记录命中 / 未命中 / 过期命中等统计，供 Flask 接口查看
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+
+def _is_usable(value: Any) -> bool:
+    """抓取失败（None / 空列表）不写入缓存，下次继续尝试"""
+    return value is not None and value != []
+
+
+class _InFlight:
+    """一次正在进行中的抓取，其他线程等待它的结果"""
+    __slots__ = ("event", "value")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+
+
+class TTLCache:
+    def __init__(self, name: str, ttl: float, stale_ttl: float = 0.0, maxsize: int = 1024,
+                 should_cache: Callable[[Any], bool] = _is_usable):
+        """
+        ttl:       新鲜期（秒），期内直接返回
+        stale_ttl: 新鲜期之后的宽限期（秒），期内先返回旧值，并在后台刷新
+        maxsize:   最多保留的条目数，超出按最近最少使用淘汰
+        """
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        self.should_cache = should_cache
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (value, stored_at)
+        self._inflight: Dict[Hashable, _InFlight] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0,
+                       "loads": 0, "load_failures": 0, "evictions": 0}
+
+    # ---------- 读 ----------
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                age = now - stored_at
+                if age < self.ttl:
+                    self._data.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return value
+                if age < self.ttl + self.stale_ttl:
+                    self._data.move_to_end(key)
+                    self._stats["stale_hits"] += 1
+                    if key not in self._inflight:
+                        self._inflight[key] = _InFlight()
+                        threading.Thread(target=self._load, args=(key, loader),
+                                         name=f"cache-refresh-{self.name}", daemon=True).start()
+                    return value
+            self._stats["misses"] += 1
+            call = self._inflight.get(key)
+            if call is not None:
+                self._stats["coalesced"] += 1
+                owner = False
+            else:
+                call = self._inflight[key] = _InFlight()
+                owner = True
+
+        if not owner:
+            call.event.wait()
+            return call.value
+        return self._load(key, loader)
+
+    def _load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """调用 loader 抓取并写入缓存；失败时保留旧值（若有）"""
+        with self._lock:
+            call = self._inflight[key]
+        value = None
+        try:
+            value = loader()
+        except Exception:
+            value = None
+        with self._lock:
+            self._stats["loads"] += 1
+            if self.should_cache(value):
+                self._data[key] = (value, time.time())
+                self._data.move_to_end(key)
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+                    self._stats["evictions"] += 1
+            else:
+                self._stats["load_failures"] += 1
+                old = self._data.get(key)
+                if old is not None:
+                    value = old[0]
+            call.value = value
+            del self._inflight[key]
+        call.event.set()
+        return value
+
+    def refresh(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """强制重新抓取（不管是否过期），同一 key 正在抓取时直接等待那一次的结果"""
+        with self._lock:
+            call = self._inflight.get(key)
+            if call is None:
+                self._inflight[key] = _InFlight()
+        if call is not None:
+            call.event.wait()
+            return call.value
+        return self._load(key, loader)
+
+    def get_fresh(self, key: Hashable) -> Optional[Any]:
+        """只取新鲜期内的值，不触发抓取；过期或不存在返回 None（批量抓取先用它筛掉命中项）"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or time.time() - entry[1] >= self.ttl:
+                return None
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any):
+        """直接写入（批量抓取的结果逐只回填）"""
+        if not self.should_cache(value):
+            return
+        with self._lock:
+            self._data[key] = (value, time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """只读缓存，不触发抓取（过期也返回）"""
+        with self._lock:
+            entry = self._data.get(key)
+            return entry[0] if entry is not None else None
+
+    # ---------- 维护 ----------
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+            s["size"] = len(self._data)
+        s["name"] = self.name
+        s["maxsize"] = self.maxsize
+        s["ttl"] = self.ttl
+        s["stale_ttl"] = self.stale_ttl
+        total = s["hits"] + s["stale_hits"] + s["misses"]
+        s["hit_rate"] = round((s["hits"] + s["stale_hits"]) / total, 4) if total else 0.0
+        return s
+
+
+# ========== 全局缓存实例 ==========
+
+# 盘中估值：变化快，短 TTL
+ESTIMATE_CACHE = TTLCache("estimate", ttl=60, stale_ttl=300, maxsize=4096)
+# 历史涨跌：按（基金, 交易日）缓存，当天内基本不变
+HISTORY_CACHE = TTLCache("history", ttl=6 * 3600, stale_ttl=6 * 3600, maxsize=4096)
+
+ALL_CACHES: List[TTLCache] = [ESTIMATE_CACHE, HISTORY_CACHE]
+
+
+def all_stats() -> List[dict]:
+    return [c.stats() for c in ALL_CACHES]
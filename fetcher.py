@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+fetcher.py
+- 并发抓取基金当日涨跌和历史涨跌（lsjz），线程池实现
+- 当日估值先走多代码批量接口（一次请求几十只），批量接口缺的再逐只走 fundgz / eastmoney
+- 按上游域名限制并发数，避免把某一个接口打挂；某个来源熔断时直接走备用来源或缓存
+- 整批设置总截止时间，超时的基金不再等待；每个任务的请求超时和排队都不超过剩余时间（http_client.deadline），
+  截止时正在进行的请求随之结束，不会占着线程池和域名名额拖慢下一批
+- 调用方线程的请求预算（http_client.budget，调度器后台抓取时设）随任务带进线程池；接口请求现场抓取不受它限制
+- 每只基金标记数据状态：ok（完整）/ stale（只拿到部分数据）/ missing（什么都没拿到）
+- 历史涨跌优先读本地净值库 navstore.py，估值和历史都经过 cache.py 的 TTL 缓存，多个页面同时轮询只抓一次
+- 历史带净值日期，产出前去掉估值当天及以后的收盘日（success.closes_before），同一天不会算两次
+- 每次从上游拿到的估值记入 intraday.TICKS 的分时序列
+- success.main 和 app.get_all_signals 共用
+"""
+
+import threading
+import time
+from datetime import date
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import breaker
+import http_client
+import intraday
+import metrics
+import navstore
+import success
+import universe
+from cache import ESTIMATE_CACHE, HISTORY_CACHE
+
+# ========== 配置 ==========
+MAX_WORKERS = 24          # 线程池大小，应不小于各域名并发上限之和的主要部分
+BATCH_DEADLINE = 20.0     # 整批抓取的总截止时间（秒）
+HISTORY_DAYS = 5
+
+FUNDGZ_HOST = "fundgz.1234567.com.cn"
+EASTMONEY_HOST = "fund.eastmoney.com"
+LSJZ_HOST = "api.fund.eastmoney.com"
+FUNDMOB_HOST = "fundmobapi.eastmoney.com"
+
+HOST_LIMITS = {
+    FUNDGZ_HOST: 12,
+    EASTMONEY_HOST: 6,
+    LSJZ_HOST: 12,
+    FUNDMOB_HOST: 4,
+}
+
+# ========== 并发控制 ==========
+
+_host_semaphores = {host: threading.BoundedSemaphore(n) for host, n in HOST_LIMITS.items()}
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """全局共用一个线程池；超时未完成的任务留在池里自行结束，不阻塞本次返回"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="fund-fetch")
+        return _executor
+
+
+@contextmanager
+def host_slot(host: str):
+    """占用某个上游域名的一个并发名额；设了截止时间（http_client.deadline）时最多等到截止，等不到抛 TimeoutError"""
+    sem = _host_semaphores.get(host)
+    if sem is None:
+        yield
+        return
+    left = http_client.remaining()
+    if not sem.acquire(timeout=None if left is None else max(0.0, left)):
+        raise TimeoutError(f"{host} 并发名额排队超过截止时间")
+    try:
+        yield
+    finally:
+        sem.release()
+
+
+def _until(end: float, budget, fn, *args):
+    """在截止时间内、按提交方的请求预算执行一个抓取任务（线程池里跑）"""
+    with http_client.deadline(end), http_client.budget(budget):
+        return fn(*args)
+
+
+# ========== 单只基金的抓取任务 ==========
+
+def _load_estimate(code: str) -> Optional[dict]:
+    """
+    当日估值：先 fundgz，失败再回退 eastmoney
+    某个来源熔断中（breaker.py）就直接跳过；都不可用时返回 None，缓存层继续提供旧值
+    """
+    if not breaker.is_open(FUNDGZ_HOST):
+        with host_slot(FUNDGZ_HOST):
+            data = success.fetch_fundgz(code)
+        if data:
+            metrics.ESTIMATE_SOURCE.inc(source="fundgz")
+            intraday.TICKS.record(code, data)
+            return data
+    data = None
+    if not breaker.is_open(EASTMONEY_HOST):
+        with host_slot(EASTMONEY_HOST):
+            data = success.fetch_eastmoney(code)
+    metrics.ESTIMATE_FALLBACK.inc(result="ok" if data else "failed")
+    metrics.ESTIMATE_SOURCE.inc(source="eastmoney" if data else "none")
+    return data
+
+
+def _load_history(code: str, days: int) -> List[tuple]:
+    """
+    历史涨跌 [(日期, 涨跌幅)]：优先读本地净值库（navstore），本地没有或已过期才联网
+    多取一天：估值那天已收盘时要去掉它（success.closes_before），剩下的仍够 N 日
+    """
+    local = navstore.recent_rows(code, days + 1)
+    if len(local) > days:
+        metrics.HISTORY_LOADS.inc(source="navstore", empty="0")
+        return local
+    with host_slot(LSJZ_HOST):
+        hist = success.fetch_history_rows(code, days=days)[-(days + 1):]
+    metrics.HISTORY_LOADS.inc(source="network", empty="0" if hist else "1")
+    return hist
+
+
+def get_estimate(code: str, refresh: bool = False) -> Optional[dict]:
+    """带缓存的当日估值；refresh=True 时跳过缓存强制重新抓取（后台预取用）"""
+    if refresh:
+        return ESTIMATE_CACHE.refresh(code, lambda: _load_estimate(code))
+    return ESTIMATE_CACHE.get_or_load(code, lambda: _load_estimate(code))
+
+
+def get_history(code: str, days: int = HISTORY_DAYS, refresh: bool = False) -> List[tuple]:
+    """
+    带缓存的历史涨跌，按（基金, 天数, 日期）缓存；返回 [(日期, 涨跌幅)]（从旧到新，最多 N+1 条），
+    与当日估值一起用时经 success.closes_before 截成 N 日
+    """
+    key = (code, days, date.today().isoformat())
+    if refresh:
+        return HISTORY_CACHE.refresh(key, lambda: _load_history(code, days))
+    return HISTORY_CACHE.get_or_load(key, lambda: _load_history(code, days))
+
+
+def _load_estimates_bulk(codes: List[str], refresh: bool = False) -> Dict[str, dict]:
+    """批量估值：先取缓存里新鲜的，其余用一次多代码请求查询，并逐只回填缓存"""
+    out, missing = {}, []
+    for code in codes:
+        data = None if refresh else ESTIMATE_CACHE.get_fresh(code)
+        if data:
+            out[code] = data
+        else:
+            missing.append(code)
+    if missing:
+        with host_slot(FUNDMOB_HOST):
+            fetched = success.fetch_estimates_batch(missing)
+        metrics.ESTIMATE_SOURCE.inc(len(fetched), source="bulk")
+        for code, data in fetched.items():
+            ESTIMATE_CACHE.put(code, data)
+            out[code] = data
+        intraday.TICKS.record_many(fetched)
+    return out
+
+
+# ========== 批量抓取 ==========
+
+def _iter_parts(codes: List[str], days: int, deadline: float,
+                with_history: bool = True, refresh: bool = False) -> Iterator[tuple]:
+    """
+    抓取引擎：估值按 success.BATCH_SIZE 分块走批量接口，批量接口没有的基金再逐只并发抓（复用 keep-alive 连接）；
+    历史逐只并发读取。某只基金需要的数据到齐就产出 (code, parts)，截止时间到了剩余的用默认值补齐产出
+    """
+    executor = _get_executor()
+    end = time.monotonic() + deadline
+    budget = http_client.current_budget()
+    need = 2 if with_history else 1
+    parts: Dict[str, dict] = {code: {} for code in codes}
+    pending = {}
+    for i in range(0, len(codes), success.BATCH_SIZE):
+        chunk = codes[i:i + success.BATCH_SIZE]
+        pending[executor.submit(_until, end, budget, _load_estimates_bulk, chunk, refresh)] = (chunk, "bulk")
+    if with_history:
+        for code in codes:
+            pending[executor.submit(_until, end, budget, get_history, code, days)] = ([code], "history")
+
+    while pending:
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            break
+        done, _ = wait(list(pending), timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            chunk, kind = pending.pop(future)
+            ready = []
+            if kind == "bulk":
+                found = _result_or(future, {})
+                for code in chunk:
+                    if found.get(code):
+                        parts[code]["data"] = found[code]
+                        ready.append(code)
+                    else:
+                        pending[executor.submit(_until, end, budget, get_estimate, code, refresh)] = ([code], "data")
+            else:
+                parts[chunk[0]][kind] = _result_or(future, _DEFAULTS[kind])
+                ready.append(chunk[0])
+            for code in ready:
+                if len(parts[code]) == need:
+                    yield code, parts[code]
+
+    # 截止时间到了还没齐的基金：取消还没开始的任务（已开始的请求超时也不超过截止时间），用已有数据产出
+    for future, (chunk, kind) in pending.items():
+        future.cancel()
+        key = "data" if kind == "bulk" else kind
+        for code in chunk:
+            if key not in parts[code]:
+                parts[code][key] = _DEFAULTS[key]
+                if len(parts[code]) == need:
+                    yield code, parts[code]
+
+
+def iter_fetch(funds: List[dict], days: int = HISTORY_DAYS,
+               deadline: float = BATCH_DEADLINE) -> Iterator[dict]:
+    """
+    并发抓取，哪只基金的估值和历史都到齐了就先产出哪只（完成顺序）
+    到达截止时间后，剩余基金带着已有的部分数据一并产出
+    每项格式：{"code", "name", "data", "history", "status"}
+    """
+    names = {f["code"]: f["name"] for f in funds}
+    for code, part in _iter_parts(list(names), days, deadline):
+        yield make_item(code, names[code], part["data"], success.closes_before(part["history"], part["data"], days))
+
+
+def fetch_all(funds: List[dict], days: int = HISTORY_DAYS,
+              deadline: float = BATCH_DEADLINE) -> List[dict]:
+    """
+    并发抓取所有基金的估值和历史，按 funds 原顺序返回：
+        [{"code", "name", "data", "history", "status"}, ...]
+    data 为 None 表示当日估值未取到；history 为 [] 表示历史未取到
+    """
+    by_code = {item["code"]: item for item in iter_fetch(funds, days, deadline)}
+    return [by_code[f["code"]] for f in funds]
+
+
+def fetch_estimates(codes: List[str], deadline: float = BATCH_DEADLINE,
+                    refresh: bool = False) -> Dict[str, Optional[dict]]:
+    """批量抓取当日估值，返回 {code: data 或 None}；refresh=True 时不用缓存里的旧值"""
+    codes = list(dict.fromkeys(codes))
+    return {code: part["data"]
+            for code, part in _iter_parts(codes, 0, deadline, with_history=False, refresh=refresh)}
+
+
+_DEFAULTS = {"data": None, "history": []}
+
+
+def _result_or(future, default):
+    """已完成则取结果，超时或抛异常则返回默认值（超时的任务顺手取消）"""
+    if not future.done():
+        future.cancel()
+        return default
+    try:
+        return future.result()
+    except Exception:
+        return default
+
+
+def make_item(code: str, name: str, data: Optional[dict], history: List[float]) -> dict:
+    """组装单只基金的抓取结果（格式同 iter_fetch 产出）；history 为当日之前的已收盘涨跌"""
+    return {
+        "code": code,
+        "name": name,
+        "data": data,
+        "history": history,
+        "status": _status(data, history),
+    }
+
+
+def _status(data: Optional[dict], history: List[float]) -> str:
+    if data and history:
+        return "ok"
+    if data or history:
+        return "stale"
+    return "missing"
+
+
+if __name__ == "__main__":
+    t0 = time.time()
+    rows = fetch_all(universe.current().funds)
+    counts: Dict[str, int] = {}
+    for row in rows:
+        counts[row["status"]] = counts.get(row["status"], 0) + 1
+    print(f"抓取 {len(rows)} 只基金，用时 {time.time() - t0:.2f}s，状态统计：{counts}")
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+fund_index.py
+- 基金名称匹配索引，替代 tool/getfundnum.py 中对全量名单的逐行扫描
+- 规范化名称 -> 行号 的哈希表，用于精确匹配
+- 二元组（bigram）倒排索引，为子串匹配和模糊匹配筛出少量候选，再用 difflib 精算相似度
+- 匹配规则与原逐行扫描相同：exact -> substring（取名单中最靠前的）-> fuzzy（取相似度最高的）；
+  exact / substring 结果与逐行扫描一致。fuzzy 只精算候选，候选里最高分不到阈值时再全表扫一遍，不会因为候选没覆盖而漏匹配；
+  但候选里已有够阈值的行时不保证就是全表最高分（tool/bench_match.py 在合成名单上对照，结果一致）
+- 索引可序列化到磁盘，名单不变时直接加载，不用每次重建
+"""
+
+import hashlib
+import os
+import pickle
+import re
+from difflib import SequenceMatcher
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# ========== 配置 ==========
+INDEX_PATH = os.path.join("data", "fund_index.pkl")
+FUZZY_THRESHOLD = 0.70   # 相似度阈值（0-1），低于此不算匹配；tool/getfundnum.py 的逐行扫描也用它
+SHORTLIST_SIZE = 32      # 模糊匹配时按共有二元组数量取前多少个候选做精算
+INDEX_VERSION = 2        # 索引结构变化时递增，磁盘上的旧索引自动重建
+
+
+def normalize(s: str) -> str:
+    """标准化名称用于匹配：去括号、去空格、去类后缀、统一大小写"""
+    if s is None:
+        return ""
+    s2 = re.sub(r"（.*?）|\(.*?\)", "", s)  # 去掉括号内容
+    s2 = s2.replace(" ", "").replace("　", "")
+    s2 = s2.replace("A类", "").replace("B类", "").replace("C类", "").replace("/C", "").replace("/A", "")
+    s2 = s2.strip().lower()
+    return s2
+
+
+def seq_ratio(a: str, b: str) -> float:
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def _bigrams(s: str) -> List[str]:
+    """去重后的二元组，保持首次出现顺序"""
+    return list(dict.fromkeys(s[i:i + 2] for i in range(len(s) - 1)))
+
+
+def fingerprint(fund_data: List[List[str]]) -> str:
+    """名单指纹：名单内容变了索引就要重建"""
+    h = hashlib.sha1()
+    for item in fund_data:
+        h.update(item[0].encode("utf-8"))
+        h.update(b"\x00")
+        h.update(item[2].encode("utf-8"))
+        h.update(b"\x01")
+    return h.hexdigest()
+
+
+class FundIndex:
+    def __init__(self, fund_data: List[List[str]]):
+        """fund_data 格式同 fundcode_search.js：[[code, abbrev, fullname, type, pinyin], ...]"""
+        self.version = INDEX_VERSION
+        self.fingerprint = fingerprint(fund_data)
+        self.codes = [item[0] for item in fund_data]
+        self.names = [item[2] for item in fund_data]
+        self.types = [item[3] if len(item) > 3 else "" for item in fund_data]
+        self.norms = [normalize(n) for n in self.names]
+
+        # 精确匹配：规范化名称 -> 最靠前的行号
+        self.exact = {}
+        for i, norm in enumerate(self.norms):
+            self.exact.setdefault(norm, i)
+
+        # 倒排索引：二元组 -> 行号数组（升序）
+        postings = {}
+        gram_count = np.zeros(len(self.norms), dtype=np.int32)
+        self.short_rows = []  # 规范化名称不足 2 个字符，没有二元组，单独检查
+        for i, norm in enumerate(self.norms):
+            grams = _bigrams(norm)
+            gram_count[i] = len(grams)
+            if not grams:
+                self.short_rows.append(i)
+            for g in grams:
+                postings.setdefault(g, []).append(i)
+        self.postings = {g: np.asarray(rows, dtype=np.int32) for g, rows in postings.items()}
+        self.gram_count = gram_count
+        self.lengths = np.fromiter((len(n) for n in self.norms), dtype=np.int32, count=len(self.norms))
+
+    def __len__(self):
+        return len(self.codes)
+
+    # ---------- 序列化 ----------
+
+    def save(self, path: str = INDEX_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str = INDEX_PATH) -> Optional["FundIndex"]:
+        try:
+            with open(path, "rb") as f:
+                obj = pickle.load(f)
+        except Exception:
+            return None
+        return obj if isinstance(obj, cls) else None
+
+    @classmethod
+    def load_or_build(cls, fund_data: List[List[str]], path: str = INDEX_PATH) -> "FundIndex":
+        """磁盘上的索引与名单指纹一致就直接用，否则重建并保存"""
+        idx = cls.load(path)
+        if idx is not None and getattr(idx, "version", None) == INDEX_VERSION \
+                and idx.fingerprint == fingerprint(fund_data):
+            return idx
+        idx = cls(fund_data)
+        idx.save(path)
+        return idx
+
+    # ---------- 查询 ----------
+
+    def _shared_counts(self, grams: List[str]) -> np.ndarray:
+        """每一行与查询共有的（去重）二元组个数"""
+        lists = [self.postings[g] for g in grams if g in self.postings]
+        if not lists:
+            return np.zeros(len(self.codes), dtype=np.int64)
+        return np.bincount(np.concatenate(lists), minlength=len(self.codes))
+
+    def _substring_row(self, norm: str, grams: List[str], counts: np.ndarray) -> Optional[int]:
+        """规范名互为子串的最靠前一行"""
+        if len(norm) < 2:
+            # 查询太短没有二元组，直接逐行判断（极少出现）
+            for i, it in enumerate(self.norms):
+                if norm in it or it in norm:
+                    return i
+            return None
+        # 查询是某行的子串：该行必须包含查询的全部二元组
+        cand = np.flatnonzero(counts == len(grams)).tolist()
+        # 某行是查询的子串：该行的二元组必须全部出现在查询里
+        cand += np.flatnonzero((counts == self.gram_count) & (self.gram_count > 0)).tolist()
+        cand += self.short_rows
+        best = None
+        for i in sorted(set(cand)):
+            it = self.norms[i]
+            if norm in it or it in norm:
+                best = i
+                break
+        return best
+
+    def _fuzzy(self, norm: str, counts: np.ndarray, k: int,
+                full: bool = False, min_score: float = 0.0) -> List[Tuple[int, float]]:
+        """
+        按共有二元组数量取候选（数量相同时长度越接近越优先），再用 difflib 精算，返回相似度最高的 k 行
+        full=True 时不筛候选，全表精算（只保留相似度不低于 min_score 的行）
+        """
+        rows = np.arange(len(self.codes)) if full else np.flatnonzero(counts)
+        # 优先级：共有二元组数为主，长度差为辅，再按行号靠前（与逐行扫描取第一个最高分一致）
+        priority = (counts[rows].astype(np.int64) * 256
+                    - np.minimum(np.abs(self.lengths[rows] - len(norm)), 255)) * (1 << 32) - rows
+        if not full and len(rows) > SHORTLIST_SIZE:
+            top = np.argpartition(-priority, SHORTLIST_SIZE)[:SHORTLIST_SIZE]
+            rows, priority = rows[top], priority[top]
+        # 优先级高的先算，便于用相似度上界剪枝
+        order = [i for _, i in sorted(zip((-priority).tolist(), rows.tolist()))]
+        scored: List[Tuple[int, float]] = []
+        floor = min_score
+        la = len(norm)
+        for i in order:
+            b = self.norms[i]
+            if floor > 0:
+                # 相似度上界 2*min(la,lb)/(la+lb)，不可能进前 k 的直接跳过，省掉构建 SequenceMatcher
+                lb = len(b)
+                if la + lb == 0 or 2.0 * min(la, lb) / (la + lb) < floor:
+                    continue
+                sm = SequenceMatcher(None, norm, b)
+                if sm.quick_ratio() < floor:
+                    continue
+            else:
+                sm = SequenceMatcher(None, norm, b)
+            ratio = sm.ratio()
+            if ratio < min_score:
+                continue
+            scored.append((i, ratio))
+            scored.sort(key=lambda x: (-x[1], x[0]))
+            del scored[k:]
+            if len(scored) >= k:
+                floor = max(min_score, scored[-1][1])
+        return scored
+
+    def search(self, name: str, k: int = 5) -> List[dict]:
+        """模糊搜索，返回相似度最高的 k 个候选：[{"code", "name", "type", "score"}, ...]"""
+        norm = normalize(name)
+        counts = self._shared_counts(_bigrams(norm))
+        return [self._row(i, score) for i, score in self._fuzzy(norm, counts, k)]
+
+    def match(self, name: str, k: int = 3) -> dict:
+        """
+        单个名称的多步匹配（exact -> substring -> fuzzy），规则与原逐行扫描相同（fuzzy 的差别见模块说明）
+        返回 {"norm", "row", "method", "score", "candidates"}，未匹配时 row 为 None
+        """
+        norm = normalize(name)
+        row = self.exact.get(norm)
+        if row is not None:
+            return {"norm": norm, "row": row, "method": "exact", "score": 1.0, "candidates": []}
+
+        grams = _bigrams(norm)
+        counts = self._shared_counts(grams)
+        row = self._substring_row(norm, grams, counts)
+        if row is not None:
+            return {"norm": norm, "row": row, "method": "substring",
+                    "score": seq_ratio(norm, self.norms[row]), "candidates": []}
+
+        top = self._fuzzy(norm, counts, max(k, 1))
+        if not top or top[0][1] < FUZZY_THRESHOLD:
+            # 候选里没有够阈值的：全表再扫一遍（上界剪枝后只精算可能够阈值的行），候选没覆盖到的匹配也能找到
+            top = self._fuzzy(norm, counts, max(k, 1), full=True, min_score=FUZZY_THRESHOLD) or top
+        candidates = [self._row(i, score) for i, score in top[:k]]
+        if top and top[0][1] >= FUZZY_THRESHOLD:
+            return {"norm": norm, "row": top[0][0], "method": "fuzzy", "score": top[0][1],
+                    "candidates": candidates}
+        return {"norm": norm, "row": None, "method": "", "score": 0.0, "candidates": candidates}
+
+    def _row(self, i: int, score: float) -> dict:
+        return {"code": self.codes[i], "name": self.names[i], "type": self.types[i],
+                "score": round(score, 4)}
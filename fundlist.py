@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+fundlist.py
+- 天天基金全量名单 fundcode_search.js 的本地缓存
+- 本地保留原始文件，用 ETag / If-Modified-Since 条件请求校验，未变化（304）不重新下载
+- 解析结果存成紧凑快照（代码、简称、全称、类型、拼音 五列元组，pickle），再次运行直接加载，毫秒级
+- 距上次校验不到 REVALIDATE_AFTER 秒时连请求都不发；网络失败时退回本地快照
+- 同时提供全市场名称索引，供 Flask 接口按名称搜索
+"""
+
+import json
+import os
+import pickle
+import threading
+import time
+from typing import List, Optional
+
+import http_client
+import parsers
+
+# ========== 配置 ==========
+FUND_JS_URL = "http://fund.eastmoney.com/js/fundcode_search.js"
+CACHE_DIR = "data"
+JS_PATH = os.path.join(CACHE_DIR, "fundcode_search.js")
+META_PATH = os.path.join(CACHE_DIR, "fundcode_search.meta.json")
+SNAPSHOT_PATH = os.path.join(CACHE_DIR, "fundcode_search.snapshot.pkl")
+REVALIDATE_AFTER = 6 * 3600   # 秒，名单一天变化很少
+
+COLUMNS = ("code", "abbrev", "name", "type", "pinyin")
+
+
+# ========== 解析 ==========
+
+def parse_fund_js(content: bytes) -> List[List[str]]:
+    """
+    解析 fundcode_search.js：var r = [[code, abbrev, fullname, type, pinyin], ...];
+    直接切出字节里的数组交给 parsers.loads，不先把 2 MB 的文件解码成 str；不是 UTF-8 时按 GBK 解码
+    """
+    start = content.find(b"[[")
+    end = content.rfind(b"]]")
+    if start < 0 or end < 0:
+        raise RuntimeError("无法解析 fundcode_search.js 格式")
+    body = content[start:end + 2]
+    try:
+        return parsers.loads(body)
+    except ValueError:
+        return json.loads(body.decode("gbk", errors="replace"))
+
+
+def _to_snapshot(data: List[List[str]]) -> dict:
+    """按列存储，比逐行 list 更紧凑，pickle / 反序列化都更快"""
+    cols = {c: [] for c in COLUMNS}
+    for item in data:
+        for i, c in enumerate(COLUMNS):
+            cols[c].append(item[i] if i < len(item) else "")
+    return {c: tuple(v) for c, v in cols.items()}
+
+
+def _from_snapshot(snap: dict) -> List[List[str]]:
+    return [list(row) for row in zip(*(snap[c] for c in COLUMNS))]
+
+
+# ========== 本地文件 ==========
+
+def _read_meta() -> dict:
+    try:
+        with open(META_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def _write_atomic(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _load_snapshot() -> Optional[dict]:
+    try:
+        with open(SNAPSHOT_PATH, "rb") as f:
+            return pickle.load(f)
+    except Exception:
+        return None
+
+
+def _save(content: bytes, snap: dict, meta: dict):
+    _write_atomic(JS_PATH, content)
+    _write_atomic(SNAPSHOT_PATH, pickle.dumps(snap, protocol=pickle.HIGHEST_PROTOCOL))
+    _write_atomic(META_PATH, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+
+def _touch_meta(meta: dict):
+    meta["checked_at"] = time.time()
+    _write_atomic(META_PATH, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+
+# ========== 对外接口 ==========
+
+def load_fund_list(url: str = FUND_JS_URL, force: bool = False) -> List[List[str]]:
+    """
+    返回与 fundcode_search.js 相同格式的名单：[[code, abbrev, fullname, type, pinyin], ...]
+    force=True 时忽略本地缓存，重新下载
+    """
+    meta = {} if force else _read_meta()
+    snap = None if force else _load_snapshot()
+
+    if snap is not None and meta.get("url") == url \
+            and time.time() - meta.get("checked_at", 0) < REVALIDATE_AFTER:
+        return _from_snapshot(snap)
+
+    headers = {}
+    if snap is not None and meta.get("url") == url:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        r = http_client.get(url, headers=headers, timeout=15)
+    except Exception:
+        if snap is not None:
+            print("下载基金代码库失败，使用本地缓存")
+            return _from_snapshot(snap)
+        raise
+
+    if r.status_code == 304 and snap is not None:
+        _touch_meta(meta)
+        return _from_snapshot(snap)
+    r.raise_for_status()
+
+    print("下载基金代码库...")
+    data = parse_fund_js(r.content)
+    snap = _to_snapshot(data)
+    _save(r.content, snap, {
+        "url": url,
+        "etag": r.headers.get("ETag", ""),
+        "last_modified": r.headers.get("Last-Modified", ""),
+        "checked_at": time.time(),
+        "count": len(data),
+    })
+    return data
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def universe_index():
+    """全市场名称索引（进程内只加载一次），失败时返回 None"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            from fund_index import FundIndex
+            try:
+                _index = FundIndex.load_or_build(load_fund_list())
+            except Exception as e:
+                print("加载基金名单失败:", e)
+                return None
+        return _index
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""
+gunicorn 配置：gunicorn -c gunicorn.conf.py wsgi:application
+全部参数可用环境变量覆盖：
+    FUND_BIND          监听地址，默认 0.0.0.0:5000
+    FUND_WORKERS       worker 进程数，默认 min(CPU 核数 * 2 + 1, 8)
+    FUND_THREADS       每个 worker 的线程数，默认 8
+    FUND_WORKER_CLASS  worker 类型，默认 gthread；装了 gevent 可设为 gevent
+    FUND_TIMEOUT       worker 无响应多少秒后重启，默认 60
+注意：SSE 接口（/api/funds/signals/stream）每个连接会占用一个线程直到推送结束（app.STREAM_UPDATE_ROUNDS ×
+      STREAM_UPDATE_INTERVAL，默认约 1 分钟，之后浏览器自动重连），同时打开的看板多时调大 FUND_THREADS 或换 gevent
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get("FUND_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("FUND_WORKERS", min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.environ.get("FUND_THREADS", 8))
+worker_class = os.environ.get("FUND_WORKER_CLASS", "gthread")
+timeout = int(os.environ.get("FUND_TIMEOUT", 60))
+graceful_timeout = 10
+keepalive = 5
+
+# 不预加载应用：每个 worker 各自导入，各自建 SQLite 连接和调度线程（由文件锁选主）
+preload_app = False
+
+accesslog = os.environ.get("FUND_ACCESS_LOG", "-") or None   # 设为空字符串关闭访问日志
+errorlog = "-"
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+http_client.py
+- 所有上游抓取（fundgz / eastmoney / lsjz / fundcode_search）共用一个 requests.Session
+- 按域名复用连接池（keep-alive），省掉每次请求的 TCP + TLS 握手
+- 5xx / 连接失败 / 读超时自动重试：指数退避 + 随机抖动，避免同时重试打爆上游
+- 统计请求数、新建连接数（复用数 = 请求数 - 新建连接数）、重试次数
+- 每次请求按域名记录耗时直方图（metrics.UPSTREAM_SECONDS）
+- 每个域名经过熔断器和自适应限速（breaker.py）：上游故障时直接失败，不再逐只等超时
+- budget() 给当前线程设一个请求预算（scheduler 的令牌桶）：块内每次请求和每次重试发出前各取一个令牌，
+  批量估值、逐只回退、历史、净值同步都算在内；排队不超过剩余时间（没设截止时间时不超过请求超时）。
+  只有调度器自己的后台抓取在预算里，接口请求现场抓取不排这个队
+- deadline() 给当前线程设一个截止时刻（fetcher 的整批截止时间），期间发出的请求超时不超过剩余时间，
+  剩余时间不够完整再试一次就不重试，截止后不再发出新请求，整批返回时线程池里不会留着还在等上游的任务
+- requests / urllib3 在第一次发请求时才导入，只导入本模块（如 Flask 启动、读快照）不付这部分开销
+- 环境变量 FUND_UPSTREAM（如 http://127.0.0.1:8765）把所有上游请求改发到本地回放服务
+  （tool/replay.py），地址改写为 {FUND_UPSTREAM}/{原域名}{原路径}；熔断、指标仍按原域名统计
+"""
+
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, List, Optional
+from urllib.parse import urlsplit
+
+import breaker
+import metrics
+
+if TYPE_CHECKING:
+    import requests
+
+# ========== 配置 ==========
+UPSTREAM_OVERRIDE = os.environ.get("FUND_UPSTREAM", "").rstrip("/")
+DEFAULT_TIMEOUT = 8       # 秒，与原来各抓取函数一致
+POOL_CONNECTIONS = 8      # 缓存多少个域名的连接池
+POOL_MAXSIZE = 16         # 每个域名最多保留多少条空闲连接
+
+RETRY_CONFIG = {
+    "total": 2,                                   # 最多重试次数
+    "backoff_factor": 0.3,                        # 退避：0.3s, 0.6s, 1.2s ...
+    "backoff_jitter": 0.3,                        # 每次退避额外加 0~0.3s 随机抖动
+    "status_forcelist": (500, 502, 503, 504),     # 这些状态码触发重试
+}
+
+# ========== 统计 ==========
+
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "new_connections": 0, "retries": 0, "errors": 0, "rejected": 0}
+
+
+def _incr(key: str, n: int = 1):
+    with _stats_lock:
+        _stats[key] += n
+
+
+def stats() -> dict:
+    """返回连接复用和重试计数的快照"""
+    with _stats_lock:
+        snap = dict(_stats)
+    snap["reused_connections"] = max(0, snap["requests"] - snap["rejected"] - snap["new_connections"])
+    snap["hosts"] = breaker.status()
+    return snap
+
+
+def reset_stats():
+    with _stats_lock:
+        for k in _stats:
+            _stats[k] = 0
+
+
+# ========== Session ==========
+
+_session: Optional["requests.Session"] = None
+_session_lock = threading.Lock()
+
+
+def _build_session() -> "requests.Session":
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+    from urllib3.util.retry import Retry
+
+    class _CountingHTTPPool(HTTPConnectionPool):
+        def _new_conn(self):
+            _incr("new_connections")
+            return super()._new_conn()
+
+    class _CountingHTTPSPool(HTTPSConnectionPool):
+        def _new_conn(self):
+            _incr("new_connections")
+            return super()._new_conn()
+
+    class _JitterRetry(Retry):
+        """带抖动退避并记录重试次数的 Retry"""
+
+        def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+            new_retry = super().increment(method, url, response, error, _pool, _stacktrace)
+            left = remaining()
+            if left is not None and left < new_retry.get_backoff_time() + getattr(_local, "attempt_timeout", 0.0):
+                # 剩余时间不够再完整试一次：不重试，让整批截止时请求已经结束
+                from urllib3.exceptions import MaxRetryError, ResponseError
+                raise MaxRetryError(_pool, url, error or ResponseError("剩余时间不够重试"))
+            if not _take_token(DEFAULT_TIMEOUT):
+                from urllib3.exceptions import MaxRetryError, ResponseError
+                raise MaxRetryError(_pool, url, error or ResponseError("请求预算用完，放弃重试"))
+            _incr("retries")
+            return new_retry
+
+        def get_backoff_time(self) -> float:
+            base = super().get_backoff_time()
+            if base <= 0:
+                return base
+            return base + random.uniform(0, RETRY_CONFIG["backoff_jitter"])
+
+    class _PooledAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {
+                "http": _CountingHTTPPool,
+                "https": _CountingHTTPSPool,
+            }
+
+    retry = _JitterRetry(
+        total=RETRY_CONFIG["total"],
+        backoff_factor=RETRY_CONFIG["backoff_factor"],
+        status_forcelist=RETRY_CONFIG["status_forcelist"],
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        raise_on_status=False,   # 重试用尽后把最后一次响应交给调用方自己判断 status_code
+    )
+    adapter = _PooledAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                             max_retries=retry)
+    s = requests.Session()
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
+
+def get_session() -> "requests.Session":
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _build_session()
+        return _session
+
+
+# ========== 截止时间 ==========
+
+_local = threading.local()
+
+
+@contextmanager
+def deadline(at: float):
+    """with 块内本线程发出的请求不超过 at（time.monotonic() 时刻）；嵌套时取更早的那个"""
+    prev = getattr(_local, "deadline", None)
+    _local.deadline = at if prev is None else min(prev, at)
+    try:
+        yield
+    finally:
+        _local.deadline = prev
+
+
+def remaining() -> Optional[float]:
+    """距本线程截止时间还有几秒；没设截止时间返回 None"""
+    at = getattr(_local, "deadline", None)
+    return None if at is None else at - time.monotonic()
+
+
+def _bounded_timeout(timeout):
+    """
+    把 requests 的 timeout（秒或 (连接, 读取)）压到剩余时间以内；已经截止时抛 Timeout，请求不发出
+    单次尝试的时长记在线程上，重试前（_JitterRetry）据此判断剩余时间还够不够再试一次
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        import requests
+        raise requests.Timeout("已过整批截止时间，请求未发出")
+    if isinstance(timeout, tuple):
+        timeout = tuple(left if t is None else min(t, left) for t in timeout)
+        _local.attempt_timeout = sum(timeout)
+    else:
+        timeout = left if timeout is None else min(timeout, left)
+        _local.attempt_timeout = timeout
+    return timeout
+
+
+# ========== 请求预算 ==========
+
+@contextmanager
+def budget(limiter):
+    """with 块内本线程发出的请求（含重试）各取 limiter 一个令牌；limiter 有 acquire(timeout=None) -> bool，None 表示不限"""
+    prev = getattr(_local, "budget", None)
+    _local.budget = limiter
+    try:
+        yield
+    finally:
+        _local.budget = prev
+
+
+def current_budget():
+    """本线程的请求预算；提交到线程池的任务要带上它（见 fetcher._until）"""
+    return getattr(_local, "budget", None)
+
+
+def _take_token(timeout) -> bool:
+    """从本线程的预算取一个令牌；排队不超过剩余时间，没设截止时间时不超过这次请求的超时"""
+    limiter = current_budget()
+    if limiter is None:
+        return True
+    left = remaining()
+    if left is None:
+        left = sum(timeout) if isinstance(timeout, tuple) else timeout
+    return limiter.acquire(timeout=left)
+
+
+# ========== 回放 / 录制 ==========
+
+_observers: List[Callable] = []
+
+
+def upstream_url(url: str) -> str:
+    """设置了 UPSTREAM_OVERRIDE 时把上游地址改写到回放服务"""
+    if not UPSTREAM_OVERRIDE:
+        return url
+    parts = urlsplit(url)
+    return f"{UPSTREAM_OVERRIDE}/{parts.netloc}{parts.path}" + (f"?{parts.query}" if parts.query else "")
+
+
+def add_observer(fn: Callable):
+    """注册响应观察者 fn(url, params, response)，每个成功返回的响应调用一次（tool/replay.py 录制用）"""
+    _observers.append(fn)
+
+
+def remove_observer(fn: Callable):
+    if fn in _observers:
+        _observers.remove(fn)
+
+
+def get(url: str, **kwargs) -> "requests.Response":
+    """替代 requests.get：走共享连接池和重试策略；在 deadline() 块里时超时不超过剩余时间"""
+    import requests
+    timeout = kwargs.get("timeout", DEFAULT_TIMEOUT)
+    _bounded_timeout(timeout)   # 已经截止就不再排队
+    _incr("requests")
+    host = urlsplit(url).hostname or ""
+    guard = breaker.guard(host)
+    t0 = time.perf_counter()
+    try:
+        if not _take_token(timeout):
+            raise breaker.errors()[1]("请求预算排队超时")
+        guard.before(max_wait=remaining())
+        try:
+            kwargs["timeout"] = _bounded_timeout(timeout)   # 扣掉两道限速排队用掉的时间
+        except requests.Timeout:
+            guard.breaker.release_probe()
+            raise
+    except requests.RequestException as e:
+        _incr("rejected")
+        metrics.UPSTREAM_SECONDS.observe(time.perf_counter() - t0, host=host, outcome=type(e).__name__)
+        raise
+    try:
+        r = get_session().get(upstream_url(url), **kwargs)
+    except requests.RequestException as e:
+        guard.after(error=e)
+        _incr("errors")
+        metrics.UPSTREAM_SECONDS.observe(time.perf_counter() - t0, host=host, outcome=type(e).__name__)
+        raise
+    guard.after(r)
+    metrics.UPSTREAM_SECONDS.observe(time.perf_counter() - t0, host=host, outcome=str(r.status_code))
+    for fn in _observers:
+        fn(url, kwargs.get("params"), r)
+    return r
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+intraday.py
+- 每只基金当日盘中估值的分时序列：每次从上游拿到估值（fundgz / 批量接口）就按 gztime 记一个点
+- 定长环形缓冲区，时间（当日分钟数）和涨跌幅分别存在 array 里，不为每个点建对象；新的交易日自动清空
+- 同一个 gztime 重复轮询只记一次（估值有变化则覆盖该点），早于最后一点的过期数据忽略
+- crossings() 给出盘中涨跌幅绝对值首次 / 再次达到阈值（默认 success.THRESHOLDS["daily_move_threshold"]）的时刻
+- 新记的点同时写进共享快照库（snapshot.SNAPSHOT_DB 的 ticks 表）：gunicorn 多 worker 时只有主进程抓上游记点，
+  其他 worker 读序列前最多每 SYNC_INTERVAL 秒按自增 id 补读新点，各 worker 看到同一条序列；重启后当日序列也还在
+- 库里只留最近一个交易日的点，换日后第一次写入时删掉旧的
+"""
+
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+import snapshot
+
+# ========== 配置 ==========
+CAPACITY = 512   # 每只基金最多保留多少个点（A 股交易时段 240 分钟，按分钟轮询也够用）
+SYNC_INTERVAL = 1.0   # 秒，读操作最多这么久从共享库补读一次其他进程记下的点
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ticks (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    code       TEXT NOT NULL,
+    day        TEXT NOT NULL,
+    minute     INTEGER NOT NULL,
+    change_pct REAL NOT NULL,
+    UNIQUE (code, day, minute)
+);
+"""
+
+
+def _parse_gztime(gztime: str) -> Optional[Tuple[str, int]]:
+    """gztime 如 "2024-06-11 14:35" -> ("2024-06-11", 875)；格式不对返回 None"""
+    if not gztime or len(gztime) < 16:
+        return None
+    try:
+        return gztime[:10], int(gztime[11:13]) * 60 + int(gztime[14:16])
+    except ValueError:
+        return None
+
+
+def _fmt_minute(minute: int) -> str:
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+class IntradaySeries:
+    """一只基金当日的分时估值（环形缓冲区）"""
+
+    __slots__ = ("day", "_minutes", "_values", "_head", "_size")
+
+    def __init__(self, capacity: int = CAPACITY):
+        self.day = ""
+        self._minutes = array("H", bytes(2 * capacity))
+        self._values = array("d", bytes(8 * capacity))
+        self._head = 0     # 下一个写入位置
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _last(self) -> int:
+        return (self._head - 1) % len(self._minutes)
+
+    def record(self, gztime: str, change_pct: float) -> bool:
+        """记一个点，返回是否有变化"""
+        parsed = _parse_gztime(gztime)
+        if parsed is None:
+            return False
+        return self.record_at(parsed[0], parsed[1], change_pct)
+
+    def record_at(self, day: str, minute: int, change_pct: float) -> bool:
+        if day != self.day:
+            if self.day and day < self.day:
+                return False
+            self.day, self._head, self._size = day, 0, 0
+        if self._size:
+            last = self._last()
+            if minute < self._minutes[last]:
+                return False
+            if minute == self._minutes[last]:
+                if self._values[last] == change_pct:
+                    return False
+                self._values[last] = change_pct
+                return True
+        self._minutes[self._head] = minute
+        self._values[self._head] = change_pct
+        self._head = (self._head + 1) % len(self._minutes)
+        self._size = min(self._size + 1, len(self._minutes))
+        return True
+
+    def latest(self) -> Optional[float]:
+        return self._values[self._last()] if self._size else None
+
+    def points(self) -> List[Tuple[int, float]]:
+        """按时间顺序的 [(当日分钟数, 涨跌幅)]"""
+        cap = len(self._minutes)
+        start = (self._head - self._size) % cap
+        return [(self._minutes[(start + i) % cap], self._values[(start + i) % cap]) for i in range(self._size)]
+
+    def crossings(self, threshold: float) -> List[dict]:
+        """涨跌幅进入 ≥ 阈值或 ≤ -阈值区间的时刻（含第一个点就在区间内、直接从一侧跳到另一侧）"""
+        out, zone = [], 0
+        for minute, value in self.points():
+            now = (1 if value > 0 else -1) if abs(value) >= threshold else 0
+            if now and now != zone:
+                out.append({"time": _fmt_minute(minute), "change_pct": value,
+                            "direction": "上涨" if now > 0 else "下跌"})
+            zone = now
+        return out
+
+
+class IntradayStore:
+    """全部基金的分时序列；db_path 为空时只在进程内存里保存"""
+
+    def __init__(self, capacity: int = CAPACITY, db_path: Optional[str] = None):
+        self.capacity = capacity
+        self.db_path = db_path
+        self._series: Dict[str, IntradaySeries] = {}
+        self._lock = threading.Lock()
+        self._shared = snapshot.SharedDB(SCHEMA)
+        self._seen_id = 0        # 已从库里读到的最大 id
+        self._synced_at = 0.0
+        self._pruned_day = ""
+
+    def record(self, code: str, data: Optional[dict]) -> bool:
+        """data 为 fundgz 格式的估值（gszzl、gztime）；没有 gztime 的（如 eastmoney 回退的收盘涨跌）不记"""
+        return self.record_many({code: data}) > 0
+
+    def record_many(self, estimates: Dict[str, Optional[dict]]) -> int:
+        """一批估值 {code: data} 一起记，写库只用一个事务；返回有变化的点数"""
+        points = []
+        for code, data in estimates.items():
+            if not data or not data.get("gztime"):
+                continue
+            parsed = _parse_gztime(data["gztime"])
+            try:
+                change = float(data.get("gszzl"))
+            except (TypeError, ValueError):
+                continue
+            if parsed is not None:
+                points.append((code, parsed[0], parsed[1], change))
+        if not points:
+            return 0
+        with self._lock:
+            added = [p for p in points if self._get_series(p[0]).record_at(p[1], p[2], p[3])]
+            self._persist_locked(added)
+        return len(added)
+
+    def _get_series(self, code: str) -> IntradaySeries:
+        s = self._series.get(code)
+        if s is None:
+            s = self._series[code] = IntradaySeries(self.capacity)
+        return s
+
+    def series(self, code: str) -> dict:
+        """{"date", "points": [{"time", "change_pct"}]}；没有数据时 points 为空"""
+        with self._lock:
+            self._sync_locked()
+            s = self._series.get(code)
+            day, pts = (s.day, s.points()) if s is not None else ("", [])
+        return {"date": day, "points": [{"time": _fmt_minute(m), "change_pct": v} for m, v in pts]}
+
+    def crossings(self, code: str, threshold: float) -> List[dict]:
+        with self._lock:
+            self._sync_locked()
+            s = self._series.get(code)
+            return s.crossings(threshold) if s is not None else []
+
+    def alerts(self, threshold: float, codes: Optional[List[str]] = None, day: Optional[str] = None) -> List[dict]:
+        """
+        各基金当日首次达到阈值的时刻，按时间先后排序：
+            [{"code", "date", "time", "change_pct", "direction", "crossings", "latest"}, ...]
+        day 指定时只看该交易日的序列
+        """
+        wanted = None if codes is None else set(codes)
+        with self._lock:
+            self._sync_locked()
+            items = [(c, s) for c, s in self._series.items() if wanted is None or c in wanted]
+            out = []
+            for code, s in items:
+                if day and s.day != day:
+                    continue
+                hits = s.crossings(threshold)
+                if hits:
+                    out.append(dict(hits[0], code=code, date=s.day, crossings=len(hits), latest=s.latest()))
+        out.sort(key=lambda a: (a["date"], a["time"], a["code"]))
+        return out
+
+    def clear(self):
+        """清空进程内的序列（共享库里的点不动，下次读时重新补读）"""
+        with self._lock:
+            self._series.clear()
+            self._seen_id = 0
+
+    # ---------- 共享存储 ----------
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        return self._shared.connect(self.db_path)
+
+    def _persist_locked(self, points: List[tuple]):
+        """新点写进共享库（调用方持有 self._lock）；换了交易日顺带删掉之前的点"""
+        if not self.db_path or not points:
+            return
+        day = max(p[1] for p in points)
+        try:
+            conn = self._db()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany("INSERT OR REPLACE INTO ticks (code, day, minute, change_pct) VALUES (?, ?, ?, ?)",
+                                 points)
+                if day > self._pruned_day:
+                    conn.execute("DELETE FROM ticks WHERE day < ?", (day,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._pruned_day = max(self._pruned_day, day)
+        except sqlite3.Error as e:
+            print("写入分时库失败:", e)
+
+    def _sync_locked(self, force: bool = False):
+        """补读其他进程（及重启前）记下的点（调用方持有 self._lock）；自己写的点读回来也不会重复记"""
+        now = time.time()
+        if not self.db_path or (not force and now - self._synced_at < SYNC_INTERVAL):
+            return
+        self._synced_at = now
+        try:
+            rows = self._db().execute("SELECT id, code, day, minute, change_pct FROM ticks WHERE id > ? ORDER BY id",
+                                      (self._seen_id,)).fetchall()
+        except sqlite3.Error as e:
+            print("读取分时库失败:", e)
+            return
+        for row_id, code, day, minute, change in rows:
+            self._get_series(code).record_at(day, minute, change)
+            self._seen_id = row_id
+
+
+TICKS = IntradayStore(db_path=snapshot.SNAPSHOT_DB)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+metrics.py
+- 进程内指标：上游请求耗时（按域名）、各抓取函数耗时和结果、fundgz→eastmoney 回退、历史为空、信号计算耗时
+- 直方图 / 计数器按标签分组，线程安全，不依赖 prometheus_client
+- render() 输出 Prometheus 文本格式，供 Flask /metrics；summary() 输出可读汇总，供 success.main 结尾打印
+注意：gunicorn 多 worker 时每个进程各有一份指标，/metrics 返回的是处理该请求的 worker 的数据
+"""
+
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# ========== 配置 ==========
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COMPUTE_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05)
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_float(x: float) -> str:
+    return repr(float(x)) if x != float("inf") else "+Inf"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, n: float = 1, **labels):
+        key = tuple(str(labels.get(k, "")) for k in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + n
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    def total(self, **labels) -> float:
+        """按部分标签求和，如 total(func="fetch_fundgz")"""
+        idx = [(self.labelnames.index(k), str(v)) for k, v in labels.items()]
+        return sum(v for key, v in self.values().items() if all(key[i] == want for i, want in idx))
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, v in sorted(self.values().items()):
+            lines.append(f"{self.name}{_fmt_labels(self.labelnames, key)} {_fmt_float(v)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], list] = {}   # key -> [各桶计数..., +Inf 计数, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(k, "")) for k in self.labelnames)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            s[i] += 1
+            s[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def series(self) -> Dict[Tuple[str, ...], list]:
+        with self._lock:
+            return {k: list(v) for k, v in self._series.items()}
+
+    def stats(self, key: Tuple[str, ...]) -> dict:
+        """count / 平均 / 由桶估算的 p50、p95（线性插值）"""
+        s = self.series().get(key)
+        if not s:
+            return {"count": 0, "avg": 0.0, "p50": 0.0, "p95": 0.0}
+        counts, total = s[:-1], s[-1]
+        n = sum(counts)
+        return {"count": n, "avg": total / n if n else 0.0,
+                "p50": self._quantile(counts, n, 0.5), "p95": self._quantile(counts, n, 0.95)}
+
+    def _quantile(self, counts: List[int], n: int, q: float) -> float:
+        rank, seen, lower = q * n, 0, 0.0
+        for i, c in enumerate(counts):
+            upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+            if c and seen + c >= rank:
+                return lower + (upper - lower) * (rank - seen) / c
+            seen += c
+            lower = upper
+        return lower
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, s in sorted(self.series().items()):
+            cum = 0
+            for bound, c in zip(self.buckets + (float("inf"),), s[:-1]):
+                cum += c
+                le = f'le="{_fmt_float(bound)}"'
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {cum}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {_fmt_float(s[-1])}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {cum}")
+        return lines
+
+
+# ========== 指标定义 ==========
+
+UPSTREAM_SECONDS = Histogram("fund_upstream_request_seconds",
+                             "上游 HTTP 请求耗时（含重试），outcome 为状态码或异常类型",
+                             ("host", "outcome"))
+FETCH_SECONDS = Histogram("fund_fetch_seconds", "抓取函数耗时，result=ok/empty/error", ("func", "result"))
+FETCH_ERRORS = Counter("fund_fetch_errors_total", "抓取函数内部吞掉的异常", ("func", "error"))
+ESTIMATE_SOURCE = Counter("fund_estimate_source_total",
+                          "当日估值来源：bulk/fundgz/eastmoney，none 表示都失败", ("source",))
+ESTIMATE_FALLBACK = Counter("fund_estimate_fallback_total", "fundgz 失败后回退 eastmoney 的次数", ("result",))
+HISTORY_LOADS = Counter("fund_history_loads_total", "历史涨跌读取：来源 navstore/network，是否为空",
+                        ("source", "empty"))
+SIGNAL_SECONDS = Histogram("fund_signal_compute_seconds", "信号计算耗时", ("func",), buckets=COMPUTE_BUCKETS)
+
+REGISTRY = [UPSTREAM_SECONDS, FETCH_SECONDS, FETCH_ERRORS, ESTIMATE_SOURCE, ESTIMATE_FALLBACK,
+            HISTORY_LOADS, SIGNAL_SECONDS]
+
+
+# ========== 埋点工具 ==========
+
+def _result_of(value) -> str:
+    return "empty" if value is None or value == [] or value == {} else "ok"
+
+
+def instrument(func_name: str) -> Callable:
+    """装饰抓取函数：记录耗时和结果（返回 None / 空视为 empty，抛异常视为 error）"""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            result = "error"
+            try:
+                value = fn(*args, **kwargs)
+                result = _result_of(value)
+                return value
+            except Exception as e:
+                record_error(func_name, e)
+                raise
+            finally:
+                FETCH_SECONDS.observe(time.perf_counter() - t0, func=func_name, result=result)
+        return wrapper
+    return deco
+
+
+def timed(hist: Histogram, **labels) -> Callable:
+    """装饰任意函数，耗时记入 hist"""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                hist.observe(time.perf_counter() - t0, **labels)
+        return wrapper
+    return deco
+
+
+def record_error(func_name: str, exc: BaseException):
+    FETCH_ERRORS.inc(func=func_name, error=type(exc).__name__)
+
+
+# ========== 输出 ==========
+
+def render() -> str:
+    lines: List[str] = []
+    for m in REGISTRY:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+def summary() -> str:
+    """可读汇总：各域名 / 各抓取函数的次数与耗时、回退率、空历史、信号计算耗时"""
+    out = ["—— 运行指标 ——"]
+    by_host: Dict[str, list] = {}
+    for (host, outcome) in UPSTREAM_SECONDS.series():
+        by_host.setdefault(host, []).append(outcome)
+    for host, outcomes in sorted(by_host.items()):
+        parts = []
+        for outcome in sorted(outcomes):
+            st = UPSTREAM_SECONDS.stats((host, outcome))
+            parts.append(f"{outcome}×{st['count']} 平均 {st['avg'] * 1000:.0f}ms p95≈{st['p95'] * 1000:.0f}ms")
+        out.append(f"上游 {host}：" + "；".join(parts))
+    for (func, result) in sorted(FETCH_SECONDS.series()):
+        st = FETCH_SECONDS.stats((func, result))
+        out.append(f"抓取 {func}[{result}]：{st['count']} 次，平均 {st['avg'] * 1000:.0f}ms，p95≈{st['p95'] * 1000:.0f}ms")
+    for (func, error), n in sorted(FETCH_ERRORS.values().items()):
+        out.append(f"异常 {func}：{error} × {int(n)}")
+
+    fundgz_tries = ESTIMATE_SOURCE.total(source="fundgz") + ESTIMATE_FALLBACK.total()
+    fallbacks = ESTIMATE_FALLBACK.total()
+    if fundgz_tries:
+        out.append(f"fundgz→eastmoney 回退：{int(fallbacks)}/{int(fundgz_tries)}（{fallbacks / fundgz_tries:.1%}），"
+                   f"回退后仍失败 {int(ESTIMATE_FALLBACK.total(result='failed'))}")
+    sources = {k[0]: int(v) for k, v in ESTIMATE_SOURCE.values().items()}
+    if sources:
+        out.append("估值来源：" + "，".join(f"{k} {v}" for k, v in sorted(sources.items())))
+    empty = HISTORY_LOADS.total(empty="1")
+    loads = HISTORY_LOADS.total()
+    if loads:
+        out.append(f"历史涨跌：读取 {int(loads)} 次（本地 {int(HISTORY_LOADS.total(source='navstore'))}），"
+                   f"为空 {int(empty)} 次")
+    for (func,) in sorted(SIGNAL_SECONDS.series()):
+        st = SIGNAL_SECONDS.stats((func,))
+        out.append(f"信号计算 {func}：{st['count']} 次，共 {st['avg'] * st['count'] * 1000:.2f}ms")
+    return "\n".join(out)
+
+
+def reset():
+    for m in REGISTRY:
+        with m._lock:
+            if isinstance(m, Histogram):
+                m._series.clear()
+            else:
+                m._values.clear()
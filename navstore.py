@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+navstore.py
+- 本地 SQLite 存储每只基金的历史净值：日期、单位净值、日涨跌幅
+- sync 命令只补每只基金缺失的交易日（从本地最新日期往后），按 lsjz 接口 pageIndex 翻页
+- success.py / app.py 通过 fetcher 优先从本地读取最近 N 日涨跌，本地没有或太旧才联网
+用法：
+    python navstore.py sync                       # 同步基金名单（funds.json）全部基金
+    python navstore.py sync --codes 019020 017974 # 只同步指定基金
+    python navstore.py show 019020 --days 10      # 查看本地最近 10 日
+"""
+
+import argparse
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+import success
+import universe
+
+# ========== 配置 ==========
+DB_PATH = os.path.join("data", "nav.db")
+SYNC_PAGE_SIZE = 20          # lsjz 接口单页条数
+FIRST_SYNC_DAYS = 3 * 365    # 本地没有数据时，首次回补多少个自然日
+MAX_LAG_TRADING_DAYS = 1     # 本地最新日期与今天之间缺了超过这么多个交易日视为过期（容忍 1 天发布延迟，如 QDII）
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS nav (
+    code       TEXT NOT NULL,
+    date       TEXT NOT NULL,   -- YYYY-MM-DD
+    nav        REAL,
+    change_pct REAL,            -- 日涨跌幅（%），接口缺失时为 NULL
+    PRIMARY KEY (code, date)
+) WITHOUT ROWID
+"""
+
+
+@contextmanager
+def _connect(db_path: Optional[str] = None):
+    """每次调用单独开连接，线程安全；WAL 模式下同步写入时读取不阻塞"""
+    path = db_path or DB_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(_SCHEMA)
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+# ========== 读取 ==========
+
+def missing_trading_days(newest: date, today: Optional[date] = None) -> int:
+    """
+    newest 之后、today 之前还有几个交易日（周一到周五，不含法定节假日）
+    当天的净值晚间才公布，不算缺；周五的数据周一看不缺
+    """
+    today = today or date.today()
+    gap = (today - newest).days - 1
+    if gap <= 0:
+        return 0
+    weeks, rest = divmod(gap, 7)
+    count = weeks * 5
+    for i in range(1, rest + 1):
+        if (newest + timedelta(days=i)).weekday() < 5:
+            count += 1
+    return count
+
+
+def latest_date(code: str, db_path: Optional[str] = None) -> Optional[str]:
+    with _connect(db_path) as conn:
+        row = conn.execute("SELECT MAX(date) FROM nav WHERE code = ?", (code,)).fetchone()
+    return row[0] if row else None
+
+
+def recent_rows(code: str, days: int = 5, max_lag: Optional[int] = MAX_LAG_TRADING_DAYS,
+                db_path: Optional[str] = None) -> List[Tuple[str, float]]:
+    """
+    本地最近 N 个交易日的 (日期, 涨跌幅)（从旧到新），与 success.fetch_history_rows 返回格式一致
+    本地最新日期之后缺了超过 max_lag 个交易日时返回 []，由调用方回退联网
+    """
+    with _connect(db_path) as conn:
+        rows = conn.execute(
+            "SELECT date, change_pct FROM nav WHERE code = ? AND change_pct IS NOT NULL "
+            "ORDER BY date DESC LIMIT ?", (code, days)).fetchall()
+    if not rows:
+        return []
+    if max_lag is not None:
+        newest = datetime.strptime(rows[0][0], "%Y-%m-%d").date()
+        if missing_trading_days(newest) > max_lag:
+            return []
+    return [(d, pct) for d, pct in reversed(rows)]
+
+
+def history(code: str, start: Optional[str] = None, end: Optional[str] = None,
+            db_path: Optional[str] = None) -> List[dict]:
+    """区间内的完整记录（从旧到新），供回测等长周期分析使用"""
+    sql = "SELECT date, nav, change_pct FROM nav WHERE code = ?"
+    args: list = [code]
+    if start:
+        sql += " AND date >= ?"
+        args.append(start)
+    if end:
+        sql += " AND date <= ?"
+        args.append(end)
+    sql += " ORDER BY date"
+    with _connect(db_path) as conn:
+        rows = conn.execute(sql, args).fetchall()
+    return [{"date": d, "nav": n, "change_pct": p} for d, n, p in rows]
+
+
+# ========== 同步 ==========
+
+def sync_fund(code: str, db_path: Optional[str] = None) -> int:
+    """补齐单只基金本地缺失的交易日，返回新写入条数"""
+    last = latest_date(code, db_path)
+    today = date.today()
+    if last:
+        start = datetime.strptime(last, "%Y-%m-%d").date() + timedelta(days=1)
+    else:
+        start = today - timedelta(days=FIRST_SYNC_DAYS)
+    if start > today:
+        return 0
+
+    rows: List[dict] = []
+    page = 1
+    while True:
+        page_rows, total = success.fetch_nav_page(
+            code, page, SYNC_PAGE_SIZE, start.isoformat(), today.isoformat())
+        rows.extend(r for r in page_rows if r["date"])
+        if not page_rows or page * SYNC_PAGE_SIZE >= total:
+            break
+        page += 1
+
+    if not rows:
+        return 0
+    with _connect(db_path) as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO nav (code, date, nav, change_pct) VALUES (?, ?, ?, ?)",
+            [(code, r["date"], r["nav"], r["change_pct"]) for r in rows])
+    return len(rows)
+
+
+def sync_all(codes: List[str], db_path: Optional[str] = None) -> dict:
+    """逐只同步，单只失败不影响其他基金；返回 {code: 新增条数 或 -1(失败)}"""
+    result = {}
+    for code in codes:
+        try:
+            result[code] = sync_fund(code, db_path)
+        except Exception as e:
+            print(f"同步 {code} 失败:", e)
+            result[code] = -1
+    return result
+
+
+# ========== 命令行 ==========
+
+def main():
+    parser = argparse.ArgumentParser(description="本地历史净值库")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_sync = sub.add_parser("sync", help="增量同步历史净值")
+    p_sync.add_argument("--codes", nargs="*", help="基金代码，默认基金名单（funds.json）全部")
+    p_show = sub.add_parser("show", help="查看本地最近 N 日")
+    p_show.add_argument("code")
+    p_show.add_argument("--days", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.cmd == "sync":
+        codes = args.codes or [f["code"] for f in universe.current().funds]
+        result = sync_all(codes)
+        added = sum(n for n in result.values() if n > 0)
+        failed = [c for c, n in result.items() if n < 0]
+        print(f"✅ 同步完成：{len(codes)} 只基金，新增 {added} 条" + (f"，失败：{failed}" if failed else ""))
+    elif args.cmd == "show":
+        for row in history(args.code)[-args.days:]:
+            print(row["date"], row["nav"], row["change_pct"])
+
+
+if __name__ == "__main__":
+    main()
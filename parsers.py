@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+parsers.py
+- 上游响应的解析：fundgz JSONP、eastmoney 基金页面、lsjz 历史净值、通用 JSON
+- 有 orjson 时用它解码 JSON（快数倍），没有就用标准库 json，结果一致
+- 全部在原始 bytes 上处理，不把整页解码成 str：
+  - fundgz：find / rfind 切出花括号之间的部分直接解码，不跑贪婪正则
+  - eastmoney：先定位“单位净值”，只在它所在那一行（最多 EASTMONEY_REGION 字节）里做锚定匹配，不在整页回溯
+  - lsjz：只需要 FSRQ 日期和 JZZZL 时用预编译正则按顺序取字段值，不构造整棵 JSON 对象
+- 结果与 success.py 原来的写法一致（tool/bench_parsers.py 校验并对比耗时和内存分配）
+"""
+
+import json
+import re
+from typing import Any, List, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:   # 可选依赖
+    orjson = None
+
+# ========== 配置 ==========
+EASTMONEY_MARKER = "单位净值"
+EASTMONEY_REGION = 4096   # 标记之后最多看这么多字节（原正则不跨行，这里再加一个上限）
+
+# 标记之后的部分全是 ASCII，按字节匹配对 UTF-8 / GBK 页面都成立
+_EASTMONEY_AFTER = re.compile(rb".*?(\d+\.\d+).*?\(([\+\-]\d+\.\d+)%\)")
+_EASTMONEY_DATE = re.compile(rb"\d{4}-\d{2}-\d{2}")
+# 同一条记录里 FSRQ 在 JZZZL 前面；[^{}]*? 保证两个字段取自同一个对象
+_LSJZ_ROW = re.compile(rb'"FSRQ"\s*:\s*"([^"]*)"[^{}]*?"JZZZL"\s*:\s*"?([^",}]*)')
+
+Payload = Union[bytes, bytearray, memoryview, str]
+
+
+def loads(data: Payload) -> Any:
+    """JSON 解码：优先 orjson"""
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, (bytearray, memoryview)):
+        data = bytes(data)
+    return json.loads(data)
+
+
+def parse_fundgz(body: bytes) -> Optional[dict]:
+    """fundgz 的 jsonpgz({...}); 取第一个 { 到最后一个 } 之间解码；没有估值（jsonpgz();）返回 None"""
+    start = body.find(b"{")
+    end = body.rfind(b"}")
+    if start < 0 or end < start:
+        return None
+    return loads(body[start:end + 1])
+
+
+def eastmoney_quote(body: Union[bytes, bytearray], encoding: str = "utf-8") -> Optional[Tuple[str, str]]:
+    """
+    基金页面里“单位净值 (2024-06-07) ... (+1.23%)”的 (涨跌幅字符串, 净值日期)，如 ("+1.23", "2024-06-07")；
+    页面上没有日期时日期为 ""，找不到涨跌幅返回 None
+    与原来的 单位净值.*?(\\d+\\.\\d+).*?\\(([\\+\\-]\\d+\\.\\d+)%\\) 一样逐个标记尝试、不跨行
+    """
+    try:
+        marker = EASTMONEY_MARKER.encode(encoding)
+    except (LookupError, UnicodeEncodeError):
+        marker = EASTMONEY_MARKER.encode("utf-8")
+    pos = body.find(marker)
+    while pos >= 0:
+        start = pos + len(marker)
+        end = body.find(b"\n", start, start + EASTMONEY_REGION)
+        m = _EASTMONEY_AFTER.match(body, start, end if end >= 0 else start + EASTMONEY_REGION)
+        if m:
+            d = _EASTMONEY_DATE.search(body, start, m.start(1))
+            return m.group(2).decode("ascii"), d.group().decode("ascii") if d else ""
+        pos = body.find(marker, start)
+    return None
+
+
+def lsjz_rows(body: bytes) -> List[Tuple[str, float]]:
+    """lsjz 响应里按原顺序（新到旧）的 (FSRQ, JZZZL)；涨跌为空或 null 的记录跳过"""
+    out = []
+    for day, val in _LSJZ_ROW.findall(body):
+        if val and val != b"null":
+            out.append((day.decode("ascii"), float(val)))
+    return out
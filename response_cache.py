@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+response_cache.py
+- Flask 接口的响应缓存：按（接口名, 数据版本）缓存序列化好的 JSON 字节，所有客户端共用
+- 压缩结果（gzip，装了 brotli 时还有 br）按编码懒生成一次，之后直接复用
+- 带 ETag / Last-Modified，客户端条件请求命中时返回 304，不再传输正文
+- 数据版本一般取 snapshot.SNAPSHOT.version，快照刷新后自然失效
+- 同一（接口名, 版本）的并发请求只序列化一次（single-flight，同 cache.py），其余请求等它的结果
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from flask import Response, request
+
+from cache import _InFlight
+
+try:
+    import brotli  # 可选依赖
+except ImportError:
+    brotli = None
+
+# ========== 配置 ==========
+MIN_COMPRESS_SIZE = 1024   # 小于这么多字节不压缩
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+class CachedPayload:
+    """一份序列化好的响应：原始字节 + 各编码的压缩字节（懒生成）"""
+    __slots__ = ("body", "etag", "last_modified", "_encoded", "_lock")
+
+    def __init__(self, body: bytes, last_modified: Optional[float] = None):
+        self.body = body
+        self.etag = 'W/"%s"' % hashlib.sha1(body).hexdigest()[:20]
+        self.last_modified = last_modified
+        self._encoded: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding: str) -> bytes:
+        with self._lock:
+            data = self._encoded.get(encoding)
+            if data is None:
+                if encoding == "br":
+                    data = brotli.compress(self.body, quality=BROTLI_QUALITY)
+                else:
+                    data = gzip.compress(self.body, compresslevel=GZIP_LEVEL, mtime=0)
+                self._encoded[encoding] = data
+            return data
+
+
+class ResponseCache:
+    def __init__(self):
+        self._entries: Dict[Hashable, Tuple[Hashable, CachedPayload]] = {}  # name -> (version, payload)
+        self._inflight: Dict[Tuple[Hashable, Hashable], _InFlight] = {}     # (name, version) -> 正在构建
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "builds": 0, "coalesced": 0, "not_modified": 0,
+                       "gzip": 0, "br": 0, "identity": 0}
+
+    def payload(self, name: Hashable, version: Hashable, build: Callable[[], Any],
+                last_modified: Optional[float] = None) -> CachedPayload:
+        """
+        同一 name 只保留最新版本；版本没变直接复用，变了调用 build() 重新序列化
+        同一版本正在构建时等那一次的结果，不重复构建（构建失败时等待方各自再试）
+        """
+        key = (name, version)
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry[0] == version:
+                self._stats["hits"] += 1
+                return entry[1]
+            call = self._inflight.get(key)
+            if call is not None:
+                self._stats["coalesced"] += 1
+                owner = False
+            else:
+                call = self._inflight[key] = _InFlight()
+                owner = True
+
+        if not owner:
+            call.event.wait()
+            if call.value is not None:
+                return call.value
+            return self._build(name, version, build, last_modified)
+        try:
+            call.value = self._build(name, version, build, last_modified)
+            return call.value
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.event.set()
+
+    def _build(self, name: Hashable, version: Hashable, build: Callable[[], Any],
+               last_modified: Optional[float]) -> CachedPayload:
+        body = json.dumps(build(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        payload = CachedPayload(body, last_modified)
+        with self._lock:
+            self._entries[name] = (version, payload)
+            self._stats["builds"] += 1
+        return payload
+
+    def response(self, name: Hashable, version: Hashable, build: Callable[[], Any],
+                 last_modified: Optional[float] = None, cache_control: str = "no-cache") -> Response:
+        """生成 Flask 响应：条件请求命中返回 304，否则按 Accept-Encoding 返回压缩后的缓存字节"""
+        payload = self.payload(name, version, build, last_modified)
+        headers = {"ETag": payload.etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if payload.last_modified:
+            headers["Last-Modified"] = formatdate(payload.last_modified, usegmt=True)
+
+        if _not_modified(payload):
+            with self._lock:
+                self._stats["not_modified"] += 1
+            return Response(status=304, headers=headers)
+
+        encoding = _choose_encoding(len(payload.body))
+        with self._lock:
+            self._stats[encoding] += 1
+        if encoding == "identity":
+            body = payload.body
+        else:
+            body = payload.encoded(encoding)
+            headers["Content-Encoding"] = encoding
+        return Response(body, mimetype="application/json", headers=headers)
+
+    def stats(self) -> dict:
+        with self._lock:
+            s = dict(self._stats)
+            s["size"] = len(self._entries)
+        s["name"] = "response"
+        s["brotli"] = brotli is not None
+        return s
+
+
+def _not_modified(payload: CachedPayload) -> bool:
+    inm = request.headers.get("If-None-Match")
+    if inm:
+        tags = [t.strip() for t in inm.split(",")]
+        return "*" in tags or payload.etag in tags or payload.etag[2:] in tags
+    ims = request.headers.get("If-Modified-Since")
+    if ims and payload.last_modified:
+        try:
+            return int(payload.last_modified) <= parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _choose_encoding(size: int) -> str:
+    if size < MIN_COMPRESS_SIZE:
+        return "identity"
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return "identity"
+
+
+RESPONSE_CACHE = ResponseCache()
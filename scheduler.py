@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+scheduler.py
+- 后台预取调度器：在 A 股交易时段按间隔刷新基金名单（universe.py / funds.json）的当日估值，写入 snapshot.SNAPSHOT
+- QDII 基金单独一组，有自己的时段和间隔
+- 收盘后定时增量同步历史净值（navstore），把新的收盘日推进到各基金的增量信号状态（signal_state）
+- 盘中轮询只刷新估值，历史涨跌直接取自信号状态，不读历史，连续涨跌由状态增量算好（evaluate）随快照写出；状态的最后收盘日落后（重启前停机太久、收盘同步失败）时
+  重读历史重建状态，重读不到就把这些基金标为 stale
+- 每轮间隔加随机抖动；调度器自己的后台抓取（refresh / close_sync）共用一个令牌桶限速
+  （http_client.budget，按线程设置：批量估值、逐只回退、历史、净值同步和重试都要取令牌）；
+  接口请求现场抓取不排这个队，只受 fetcher 的整批截止时间和各域名并发上限约束
+- status() 给出每组的上次 / 下次运行时间和每只基金的上次刷新时间，供 /api/scheduler/status 使用
+- 多进程部署（gunicorn 多 worker）时用文件锁选主：只有拿到 data/scheduler.lock 的进程抓取上游写快照，
+  其余进程的调度线程等待锁，主进程退出后自动接手
+注意：只按周一到周五判断交易日，不含法定节假日（节假日估值不变，多刷几次无害）
+"""
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+import fetcher
+import http_client
+import navstore
+import success
+import universe
+from signal_state import STATES
+from snapshot import SNAPSHOT
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，只能单进程运行，直接当主
+    fcntl = None
+
+# ========== 配置 ==========
+CN_TZ = timezone(timedelta(hours=8))   # 北京时间，无夏令时
+
+SCHEDULE = {
+    # A 股基金：盘中每 2 分钟刷新一次估值
+    "a_share": {"interval": 120, "windows": [("09:30", "11:30"), ("13:00", "15:00")]},
+    # QDII：估值跟随海外市场，盘中变化少，间隔放长
+    "qdii": {"interval": 600, "windows": [("09:30", "15:00")]},
+}
+CLOSE_SYNC_TIMES = ["20:30", "22:30"]   # 收盘后拉取最终净值的时间点（净值一般晚间公布）
+JITTER_SECONDS = 15                    # 每轮开始时间随机后延 0~15 秒
+RATE_LIMIT = 5.0                       # 后台抓取限速：每秒最多发起几次上游请求（每个 HTTP 请求算一个）
+RATE_BURST = 10
+TICK_SECONDS = 5                       # 调度循环检查间隔
+MAX_WORKERS = 8
+LEADER_LOCK = os.path.join("data", "scheduler.lock")
+LEADER_RETRY_SECONDS = 5               # 非主进程每隔几秒重试抢锁
+
+
+def now_cn() -> datetime:
+    return datetime.now(CN_TZ)
+
+
+def is_qdii(fund: dict) -> bool:
+    return "QDII" in fund["name"].upper()
+
+
+def group_of(fund: dict) -> str:
+    return "qdii" if is_qdii(fund) else "a_share"
+
+
+def lagging(state) -> bool:
+    """信号状态的最后收盘日之后缺了超过 navstore.MAX_LAG_TRADING_DAYS 个交易日（判断方式与净值库过期相同）"""
+    if not state.as_of:
+        return True
+    return navstore.missing_trading_days(date.fromisoformat(state.as_of)) > navstore.MAX_LAG_TRADING_DAYS
+
+
+def in_windows(now: datetime, windows) -> bool:
+    if now.weekday() >= 5:
+        return False
+    hm = now.strftime("%H:%M")
+    return any(start <= hm < end for start, end in windows)
+
+
+# ========== 限速 ==========
+
+class RateLimiter:
+    """令牌桶：每秒补充 rate 个令牌，最多攒 burst 个"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, stop: Optional[threading.Event] = None, timeout: Optional[float] = None) -> bool:
+        """取一个令牌，必要时等待；stop 被设置、或 timeout 秒内等不到时放弃并返回 False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+                if deadline is not None and now + wait > deadline:
+                    return False
+            if stop is not None:
+                if stop.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+
+# ========== 调度器 ==========
+
+class Scheduler:
+    def __init__(self, funds_provider: Callable[[], List[dict]] = lambda: universe.current().funds):
+        self.funds_provider = funds_provider
+        self.limiter = RateLimiter(RATE_LIMIT, RATE_BURST)
+        self._executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="prefetch")
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._last_run: Dict[str, float] = {}
+        self._next_run: Dict[str, float] = {}
+        self._last_sync: Dict[str, str] = {}   # 收盘同步时间点 -> 已执行的日期
+        self._last_error = ""
+        self._leader_lock: Optional[str] = None
+        self._leader_fd = None
+        self._leader = False
+
+    # ---------- 启停 ----------
+
+    def start(self, leader_lock: Optional[str] = None):
+        """
+        启动后台线程；给了 leader_lock 时先抢文件锁，抢到才开始调度（多 worker 部署只有一个在抓取）
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._leader_lock = leader_lock
+            self._thread = threading.Thread(target=self._loop, name="fund-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def is_running(self) -> bool:
+        """本进程是否正在调度（是主进程且线程在跑）"""
+        return self.is_active() and self._leader
+
+    def is_active(self) -> bool:
+        """本进程或同机其他 worker 的调度器在跑（本进程在等锁说明别的进程持有锁）"""
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    def _acquire_leadership(self) -> bool:
+        """阻塞到拿到文件锁或被 stop；锁随进程退出自动释放"""
+        if not self._leader_lock or fcntl is None:
+            return True
+        os.makedirs(os.path.dirname(self._leader_lock) or ".", exist_ok=True)
+        fd = open(self._leader_lock, "a+")
+        while True:
+            try:
+                fcntl.flock(fd.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                if self._stop.wait(LEADER_RETRY_SECONDS):
+                    fd.close()
+                    return False
+                continue
+            fd.seek(0)
+            fd.truncate()
+            fd.write(str(os.getpid()))
+            fd.flush()
+            self._leader_fd = fd
+            return True
+
+    # ---------- 刷新 ----------
+
+    def _limited(self, fn, *args, **kwargs):
+        """在调度器的令牌桶下执行（预算按线程设置，提交到本调度器线程池的任务要经过这里）"""
+        with http_client.budget(self.limiter):
+            return fn(*args, **kwargs)
+
+    def refresh(self, funds: List[dict], history: bool = False) -> int:
+        """
+        刷新一批基金写入快照，返回成功只数
+        估值走批量接口强制重抓；每个上游请求取调度器令牌桶的一个令牌
+        历史涨跌取自增量信号状态（signal_state），盘中轮询不读历史；
+        估值那天已经收盘进了状态（收盘同步之后）的基金改用缓存的历史，截到估值日之前；
+        没有状态的基金、状态落后（lagging）的基金、或 history=True 时逐只重读历史并重建状态；
+        重读后仍然落后的基金窗口是旧的，数据标为 stale
+        """
+        return self._limited(self._refresh, funds, history)
+
+    def _refresh(self, funds: List[dict], history: bool) -> int:
+        if self._stop.is_set():
+            return 0
+        codes = [f["code"] for f in funds]
+        estimates = fetcher.fetch_estimates(codes, refresh=True)
+
+        futures = {}
+        for f in funds:
+            state = STATES.get(f["code"])
+            if not history and state is not None and not lagging(state):
+                continue
+            if self._stop.is_set():
+                break
+            futures[f["code"]] = self._executor.submit(self._limited, fetcher.get_history, f["code"],
+                                                     refresh=history)
+        for code, fut in futures.items():
+            try:
+                hist = fut.result()
+            except Exception as e:
+                self._last_error = f"{type(e).__name__}: {e}"
+                continue
+            if hist:
+                # 窗口和 as_of 取自同一份历史：as_of 就是窗口最后一天
+                STATES.seed(code, [pct for _, pct in hist[-fetcher.HISTORY_DAYS:]], hist[-1][0])
+
+        items = []
+        for f in funds:
+            data = estimates.get(f["code"])
+            state = STATES.get(f["code"])
+            window = state.history() if state else []
+            consecutive = None
+            if state is not None:
+                daily = float(data.get("gszzl", 0.0)) if data else 0.0
+                if data and not STATES.set_intraday(f["code"], daily, data.get("gztime", ""),
+                                                    success.estimate_date(data)):
+                    # 估值那天已经收盘进了状态窗口（收盘同步后、周末）：按估值日之前的收盘日组装，不重复计入
+                    window = success.closes_before(fetcher.get_history(f["code"]), data, fetcher.HISTORY_DAYS)
+                else:
+                    consecutive = state.evaluate(daily)
+            item = fetcher.make_item(f["code"], f["name"], data, window)
+            if consecutive is not None:
+                item["consecutive"] = list(consecutive)
+            if state is not None and lagging(state) and item["status"] == "ok":
+                item["status"] = "stale"
+            items.append(item)
+        SNAPSHOT.update(items)
+        STATES.save()
+        return sum(1 for it in items if it["status"] != "missing")
+
+    def advance_states(self, funds: List[dict]) -> int:
+        """把净值库里比状态更新的收盘日逐日推进到状态里（O(1)/天，只读本地库），返回推进的天数"""
+        advanced = 0
+        for f in funds:
+            state = STATES.get(f["code"])
+            if state is None or not state.as_of:
+                continue
+            start = (date.fromisoformat(state.as_of) + timedelta(days=1)).isoformat()
+            for row in navstore.history(f["code"], start=start):
+                if row["change_pct"] is not None and STATES.close(f["code"], row["date"], row["change_pct"]):
+                    advanced += 1
+        return advanced
+
+    def close_sync(self, funds: List[dict]):
+        """收盘后：增量同步净值库，推进信号状态，再刷新估值；状态不知道收盘日期的基金重读历史"""
+        self._limited(navstore.sync_all, [f["code"] for f in funds])
+        self.advance_states(funds)
+        unseeded = [f for f in funds if not (STATES.get(f["code"]) and STATES.get(f["code"]).as_of)]
+        if unseeded:
+            self.refresh(unseeded, history=True)
+        self.refresh([f for f in funds if f not in unseeded])
+
+    # ---------- 主循环 ----------
+
+    def _loop(self):
+        if not self._acquire_leadership():
+            return
+        self._leader = True
+        # 此前的快照来自上一轮运行：预热刷新完成之前读出的都标为 stale
+        SNAPSHOT.start_generation()
+        self._schedule()
+
+    def _schedule(self):
+        # 启动时恢复上次的信号状态并补上停机期间的收盘日，再完整预热一次，
+        # 不管是否在交易时段，保证接口一开始就有快照
+        STATES.load()
+        self._run_safely("warmup", lambda: self._warmup(self.funds_provider()))
+        while not self._stop.wait(TICK_SECONDS):
+            self.tick(now_cn())
+
+    def _warmup(self, funds: List[dict]):
+        self.advance_states(funds)
+        self.refresh(funds)
+
+    def tick(self, now: datetime):
+        funds = self.funds_provider()
+        for group, conf in SCHEDULE.items():
+            if not in_windows(now, conf["windows"]):
+                continue
+            if time.time() < self._next_run.get(group, 0):
+                continue
+            members = [f for f in funds if group_of(f) == group]
+            self._run_safely(group, lambda: self.refresh(members))
+            self._next_run[group] = time.time() + conf["interval"] + random.uniform(0, JITTER_SECONDS)
+
+        today = now.date().isoformat()
+        hm = now.strftime("%H:%M")
+        for t in CLOSE_SYNC_TIMES:
+            if now.weekday() < 5 and hm >= t and self._last_sync.get(t) != today:
+                self._last_sync[t] = today
+                self._run_safely(f"close_sync@{t}", lambda: self.close_sync(funds))
+
+    def _run_safely(self, name: str, fn: Callable):
+        try:
+            fn()
+        except Exception as e:
+            self._last_error = f"{name}: {type(e).__name__}: {e}"
+        self._last_run[name] = time.time()
+
+    # ---------- 状态 ----------
+
+    def status(self) -> dict:
+        refreshed = SNAPSHOT.refreshed_at()
+        funds = []
+        for f in self.funds_provider():
+            ts = refreshed.get(f["code"])
+            item = SNAPSHOT.get(f["code"])
+            funds.append({
+                "code": f["code"],
+                "name": f["name"],
+                "group": group_of(f),
+                "last_refresh": _fmt(ts),
+                "status": item["status"] if item else "missing",
+            })
+        return {
+            "running": self.is_running(),
+            "leader": self._leader,
+            "pid": os.getpid(),
+            "now": now_cn().strftime("%Y-%m-%d %H:%M:%S"),
+            "schedule": SCHEDULE,
+            "close_sync_times": CLOSE_SYNC_TIMES,
+            "rate_limit": {"rate": self.limiter.rate, "burst": self.limiter.burst},
+            "last_run": {k: _fmt(v) for k, v in self._last_run.items()},
+            "next_run": {k: _fmt(v) for k, v in self._next_run.items()},
+            "last_close_sync": self._last_sync,
+            "last_error": self._last_error,
+            "snapshot_version": SNAPSHOT.version,
+            "funds": funds,
+        }
+
+
+def _fmt(ts: Optional[float]) -> Optional[str]:
+    if not ts:
+        return None
+    return datetime.fromtimestamp(ts, CN_TZ).strftime("%Y-%m-%d %H:%M:%S")
+
+
+SCHEDULER = Scheduler()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+signal_log.py
+- 每日信号的列式历史日志：Parquet 数据集，按月分区（data/signals/month=YYYY-MM/signals.parquet）
+  一年只有 12 个文件，避免每天一个小文件拖慢查询
+- append(rows)：追加到当月文件；同一天重复运行会替换当天的记录，不会重复
+- query(start, end, codes, signals)：按日期范围裁剪月份分区，代码 / 信号类型下推到扫描过滤，只读需要的列
+- 供 success.main（每日追加）和 Flask 接口 /api/signals/history 使用
+- 依赖 pyarrow（pip install pyarrow），未安装时 append / query 抛 RuntimeError
+用法：
+    python signal_log.py import outputs/        # 把历史 signals_*.csv 导入日志
+    python signal_log.py query --start 2025-01-01 --code 019020 --signal 买入
+"""
+
+import argparse
+import csv
+import glob
+import os
+import re
+import time
+from typing import Dict, List, Optional
+
+# 可选依赖 pyarrow 较重（导入约 0.5 秒），第一次读写日志时才导入（_require）
+pa = pc = ds = pq = None
+
+# ========== 配置 ==========
+LOG_DIR = os.path.join("data", "signals")
+PART_NAME = "signals.parquet"
+
+FIELDS = [
+    ("code", "string"),
+    ("name", "string"),
+    ("daily_change_pct", "float64"),
+    ("consecutive_days", "int32"),
+    ("consecutive_direction", "int8"),
+    ("consecutive_change_pct", "float64"),
+    ("strength", "float64"),
+    ("signal", "string"),
+    ("reasons", "string"),
+    ("risk_warning", "string"),
+    ("status", "string"),
+]
+COLUMNS = ["date"] + [name for name, _ in FIELDS]
+
+
+def _require():
+    global pa, pc, ds, pq
+    if pa is not None:
+        return
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("信号历史日志需要 pyarrow：pip install pyarrow") from None
+    pa, pc, ds, pq = pyarrow, pyarrow.compute, pyarrow.dataset, pyarrow.parquet
+
+
+def _schema():
+    return pa.schema([("date", pa.string())] + [(name, getattr(pa, typ)()) for name, typ in FIELDS])
+
+
+def _partitioning():
+    # 月份分区键按字符串处理，YYYY-MM 的字典序即时间顺序
+    return ds.partitioning(pa.schema([("month", pa.string())]), flavor="hive")
+
+
+# ========== 写 ==========
+
+def _month_dir(log_dir: str, month: str) -> str:
+    return os.path.join(log_dir, f"month={month}")
+
+
+def _to_table(rows: List[dict]):
+    schema = _schema()
+    return pa.table({f.name: pa.array([r.get(f.name) for r in rows], f.type) for f in schema},
+                    schema=schema)
+
+
+def append(rows: List[dict], log_dir: Optional[str] = None) -> int:
+    """
+    写入一批信号（每行需含 date 及 FIELDS 中的字段，缺失字段写空值），返回写入行数
+    每个月一个文件：读出当月已有数据，去掉本批涉及的日期后与新数据合并，原子替换
+    """
+    _require()
+    if not rows:
+        return 0
+    log_dir = log_dir or LOG_DIR
+    by_month: Dict[str, List[dict]] = {}
+    for r in rows:
+        by_month.setdefault(r["date"][:7], []).append(r)
+
+    for month, month_rows in by_month.items():
+        table = _to_table(month_rows)
+        path = os.path.join(_month_dir(log_dir, month), PART_NAME)
+        if os.path.exists(path):
+            old = pq.read_table(path, schema=_schema())
+            keep = pc.invert(pc.is_in(old["date"], value_set=pa.array(sorted({r["date"] for r in month_rows}))))
+            table = pa.concat_tables([old.filter(keep), table])
+        table = table.sort_by([("date", "ascending"), ("code", "ascending")])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        pq.write_table(table, tmp, compression="zstd")
+        os.replace(tmp, path)
+    return len(rows)
+
+
+# ========== 读 ==========
+
+def _dataset(log_dir: Optional[str] = None):
+    _require()
+    log_dir = log_dir or LOG_DIR
+    files = sorted(glob.glob(os.path.join(log_dir, "month=*", PART_NAME)))
+    if not files:
+        return None
+    return ds.dataset(files, format="parquet", schema=_schema().append(pa.field("month", pa.string())),
+                      partitioning=_partitioning(), partition_base_dir=log_dir)
+
+
+def query(start: Optional[str] = None, end: Optional[str] = None,
+          codes: Optional[List[str]] = None, signals: Optional[List[str]] = None,
+          columns: Optional[List[str]] = None, limit: Optional[int] = None,
+          log_dir: Optional[str] = None) -> List[dict]:
+    """
+    按条件读取信号历史，按（日期, 代码）升序返回 dict 列表
+    start / end: 日期闭区间 YYYY-MM-DD（先按月份裁剪，区间外的文件不打开）
+    codes / signals: 基金代码、信号类型过滤
+    columns: 只读取这些列（默认全部）
+    limit: 只返回最近的 limit 行
+    """
+    dataset = _dataset(log_dir)
+    if dataset is None:
+        return []
+    conds = []
+    if start:
+        conds += [pc.field("month") >= start[:7], pc.field("date") >= start]
+    if end:
+        conds += [pc.field("month") <= end[:7], pc.field("date") <= end]
+    if codes:
+        conds.append(pc.field("code").isin(list(codes)))
+    if signals:
+        conds.append(pc.field("signal").isin(list(signals)))
+    expr = None
+    for c in conds:
+        expr = c if expr is None else expr & c
+    cols = list(columns) if columns else COLUMNS
+    for key in ("code", "date"):
+        if key not in cols:
+            cols = [key] + cols
+    table = dataset.to_table(columns=cols, filter=expr)
+    table = table.sort_by([("date", "ascending"), ("code", "ascending")])
+    if limit is not None and table.num_rows > limit:
+        table = table.slice(table.num_rows - limit)
+    return table.to_pylist()
+
+
+def dates(log_dir: Optional[str] = None) -> List[str]:
+    """已记录的日期（只读 date 一列）"""
+    dataset = _dataset(log_dir)
+    if dataset is None:
+        return []
+    return sorted(set(dataset.to_table(columns=["date"])["date"].to_pylist()))
+
+
+# ========== 导入旧 CSV ==========
+
+def _signal_from_reasons(reasons: str, daily: float) -> str:
+    """旧 CSV 没有 signal 列，按 generate_signal 的 reasons 文案还原"""
+    if reasons.startswith("单日涨跌"):
+        return "买入" if daily > 0 else "减持"
+    if reasons.startswith("连续"):
+        return "趋势提醒"
+    return "无操作"
+
+
+def import_csv(paths: List[str], funds: List[dict], log_dir: Optional[str] = None) -> int:
+    """把 outputs/signals_YYYYMMDD.csv 导入日志；旧 CSV 没有代码列，按名称对照 funds 补上"""
+    code_of = {f["name"]: f["code"] for f in funds}
+    rows = []
+    for path in paths:
+        m = re.search(r"signals_(\d{4})(\d{2})(\d{2})\.csv$", path)
+        if not m:
+            continue
+        day = "-".join(m.groups())
+        with open(path, newline="", encoding="utf-8") as f:
+            for r in csv.DictReader(f):
+                daily = float(r.get("daily_change_pct") or 0)
+                rows.append({
+                    "date": r.get("date") or day,
+                    "code": r.get("code") or code_of.get(r.get("name", ""), ""),
+                    "name": r.get("name", ""),
+                    "daily_change_pct": daily,
+                    "consecutive_days": int(r.get("consecutive_days") or 0),
+                    "consecutive_direction": int(r.get("consecutive_direction") or 0),
+                    "consecutive_change_pct": float(r.get("consecutive_change_pct") or 0),
+                    "strength": float(r.get("strength") or 0),
+                    "signal": r.get("signal") or _signal_from_reasons(r.get("reasons", ""), daily),
+                    "reasons": r.get("reasons", ""),
+                    "risk_warning": r.get("risk_warning", ""),
+                    "status": r.get("status") or "ok",
+                })
+    return append(rows, log_dir)
+
+
+# ========== 命令行 ==========
+
+def main():
+    parser = argparse.ArgumentParser(description="信号历史日志")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_imp = sub.add_parser("import", help="导入 outputs/signals_*.csv")
+    p_imp.add_argument("dir", nargs="?", default="outputs")
+    p_q = sub.add_parser("query", help="查询信号历史")
+    p_q.add_argument("--start", type=str, default=None)
+    p_q.add_argument("--end", type=str, default=None)
+    p_q.add_argument("--code", nargs="*", default=None)
+    p_q.add_argument("--signal", nargs="*", default=None)
+    p_q.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.cmd == "import":
+        import universe
+        paths = sorted(glob.glob(os.path.join(args.dir, "signals_*.csv")))
+        n = import_csv(paths, universe.current().funds)
+        print(f"✅ 已导入 {len(paths)} 个文件，共 {n} 行")
+    else:
+        t0 = time.time()
+        rows = query(args.start, args.end, args.code, args.signal, limit=args.limit)
+        for r in rows:
+            print(r["date"], r["code"], r["name"], r["signal"], r["daily_change_pct"], r["reasons"])
+        print(f"共 {len(rows)} 行，用时 {(time.time() - t0) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
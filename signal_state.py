@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+signal_state.py
+- 每只基金的增量信号状态：最近 5 个已收盘交易日的涨跌 + 当日盘中估值
+- 维护已收盘窗口内的涨 / 跌天数和末尾同向段长度，新收盘日 close()、盘中估值 set_intraday() 都是 O(1) 更新
+- evaluate() 结果与 success.compute_recent_consecutive(history + [当日涨跌]) 逐位一致
+  （连续涨跌合计按原来的顺序逐项累加，窗口最多 5 天）
+- 估值所属交易日已经收盘进窗口（晚间同步后、周末）时不再记估值，同一天不会算两次
+- 调度器刷新快照时用 evaluate() 得出连续涨跌写进快照行（success.analyze_fund 的 consecutive），接口不再从历史重算
+- 盘中轮询只更新估值，不再读历史；状态存成 JSON（data/signal_state.json），重启后直接恢复
+"""
+
+import json
+import os
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# ========== 配置 ==========
+WINDOW_DAYS = 5   # 与 fetcher.HISTORY_DAYS 一致
+STATE_PATH = os.path.join("data", "signal_state.json")
+
+
+def _sign(x: float) -> int:
+    return 1 if x > 0 else -1 if x < 0 else 0
+
+
+class FundSignalState:
+    __slots__ = ("code", "closed", "as_of", "pos", "neg", "run_sign", "run_len",
+                 "intraday", "intraday_time")
+
+    def __init__(self, code: str, history: Iterable[float] = (), as_of: str = ""):
+        """history: 已收盘交易日涨跌（从旧到新）；as_of: 最后一个收盘日 YYYY-MM-DD"""
+        self.code = code
+        self.closed: deque = deque(maxlen=WINDOW_DAYS)
+        self.as_of = as_of
+        self.pos = self.neg = 0          # 窗口内涨 / 跌天数（零天不算）
+        self.run_sign = self.run_len = 0  # 从最近一天往前的同向非零段：方向、天数
+        self.intraday: Optional[float] = None
+        self.intraday_time = ""
+        for x in history:
+            self._push(float(x))
+
+    # ---------- 更新 ----------
+
+    def _push(self, x: float):
+        if len(self.closed) == self.closed.maxlen:
+            old = self.closed[0]
+            s = _sign(old)
+            if s:
+                # 同向段覆盖了窗口内全部非零天时，被挤出的最旧一天也在段里
+                if self.run_len == self.pos + self.neg:
+                    self.run_len -= 1
+                    if self.run_len == 0:
+                        self.run_sign = 0
+                if s > 0:
+                    self.pos -= 1
+                else:
+                    self.neg -= 1
+        self.closed.append(x)
+        s = _sign(x)
+        if s > 0:
+            self.pos += 1
+        elif s < 0:
+            self.neg += 1
+        if s:
+            if s == self.run_sign:
+                self.run_len += 1
+            else:
+                self.run_sign, self.run_len = s, 1
+
+    def close(self, day: str, change_pct: float) -> bool:
+        """收盘：当天净值涨跌进入窗口，盘中估值清空；day 不晚于 as_of 的重复收盘忽略"""
+        if self.as_of and day <= self.as_of:
+            return False
+        self._push(float(change_pct))
+        self.as_of = day
+        self.intraday = None
+        self.intraday_time = ""
+        return True
+
+    def set_intraday(self, change_pct: Optional[float], gztime: str = "", day: str = "") -> bool:
+        """
+        更新当日盘中估值（None 表示没有估值，按 0 处理）；day 为估值所属交易日（success.estimate_date）
+        day 不晚于 as_of 时那一天已经收盘进了窗口，清空估值，不重复计入；返回是否记下了估值
+        """
+        if day and self.as_of and day <= self.as_of:
+            change_pct, gztime = None, ""
+        self.intraday = None if change_pct is None else float(change_pct)
+        self.intraday_time = gztime or ""
+        return self.intraday is not None
+
+    # ---------- 计算 ----------
+
+    def history(self) -> List[float]:
+        return list(self.closed)
+
+    def evaluate(self, daily_change_pct: Optional[float] = None) -> Tuple[int, int, float]:
+        """
+        返回 (consecutive_days, consecutive_direction, consecutive_change_pct)
+        daily_change_pct 默认取盘中估值；与 compute_recent_consecutive(history + [daily]) 相同
+        """
+        d = self.intraday if daily_change_pct is None else daily_change_pct
+        d = 0.0 if d is None else d
+        sd = _sign(d)
+        pos = self.pos + (sd > 0)
+        neg = self.neg + (sd < 0)
+        if pos + neg == 0:
+            return 0, 0, 0.0
+        direction = 1 if pos >= neg else -1
+
+        count, change_sum = 0, 0.0
+        if sd:
+            if sd != direction:
+                return 0, direction, 0.0
+            count, change_sum = 1, change_sum + d
+        if self.run_sign == direction:
+            left = self.run_len
+            for x in reversed(self.closed):
+                if not left:
+                    break
+                if x != 0:
+                    change_sum += x
+                    left -= 1
+            count += self.run_len
+        return count, direction, change_sum
+
+    # ---------- 序列化 ----------
+
+    def to_dict(self) -> dict:
+        return {"code": self.code, "closed": list(self.closed), "as_of": self.as_of,
+                "intraday": self.intraday, "intraday_time": self.intraday_time}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "FundSignalState":
+        state = cls(d["code"], d.get("closed", ()), d.get("as_of", ""))
+        state.set_intraday(d.get("intraday"), d.get("intraday_time", ""))
+        return state
+
+
+class SignalStates:
+    """全部基金的状态表，带 JSON 持久化"""
+
+    def __init__(self, path: Optional[str] = STATE_PATH):
+        self.path = path
+        self._states: Dict[str, FundSignalState] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    def get(self, code: str) -> Optional[FundSignalState]:
+        with self._lock:
+            return self._states.get(code)
+
+    def seed(self, code: str, history: Iterable[float], as_of: str = "") -> FundSignalState:
+        """用完整历史（重新）初始化一只基金的状态"""
+        state = FundSignalState(code, history, as_of)
+        with self._lock:
+            old = self._states.get(code)
+            if old is not None:
+                # 新的 as_of 可能已经包含了旧估值那一天
+                state.set_intraday(old.intraday, old.intraday_time, old.intraday_time[:10])
+            self._states[code] = state
+            self._dirty = True
+        return state
+
+    def close(self, code: str, day: str, change_pct: float) -> bool:
+        with self._lock:
+            state = self._states.get(code)
+            if state is None or not state.close(day, change_pct):
+                return False
+            self._dirty = True
+            return True
+
+    def set_intraday(self, code: str, change_pct: Optional[float], gztime: str = "", day: str = "") -> bool:
+        """返回估值是否记进了状态；没有状态、或估值那天已经收盘（见 FundSignalState.set_intraday）返回 False"""
+        with self._lock:
+            state = self._states.get(code)
+            if state is None:
+                return False
+            before = (state.intraday, state.intraday_time)
+            kept = state.set_intraday(change_pct, gztime, day)
+            if (state.intraday, state.intraday_time) != before:
+                self._dirty = True
+            return kept
+
+    # ---------- 持久化 ----------
+
+    def load(self) -> int:
+        if not self.path:
+            return 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        with self._lock:
+            for d in raw.get("funds", []):
+                self._states[d["code"]] = FundSignalState.from_dict(d)
+            self._dirty = False
+            return len(self._states)
+
+    def save(self, force: bool = False):
+        """有变化才写；先写临时文件再替换，避免写到一半被读到"""
+        if not self.path:
+            return
+        with self._lock:
+            if not (self._dirty or force):
+                return
+            payload = {"window_days": WINDOW_DAYS, "funds": [s.to_dict() for s in self._states.values()]}
+            self._dirty = False
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+
+STATES = SignalStates()
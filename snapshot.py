@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+snapshot.py
+- 基金数据快照：每只基金最近一次抓取结果（估值 + 历史 + 状态）及刷新时间
+- 后台调度器（scheduler.py）写入，/api/* 直接读取，请求不再现场抓取上游
+- version 每次写入递增，便于调用方判断数据是否变化；多进程写同一个库时版本号在写事务里按库里的值递增
+- 快照同时落到本地 SQLite（data/snapshot.db）：gunicorn 多个 worker 共用同一份快照，
+  只有抢到调度器锁的 worker 抓取上游，其余 worker 读库；读时最多每 SYNC_INTERVAL 秒比对一次版本号，
+  版本变了才重新加载
+- 调度器抢到主进程后先 start_generation()：之前持久化的数据（上一轮运行留下的）在重新刷新之前读出时标为 stale，
+  重启后不会把旧快照顶着今天的日期当作 ok 返回
+- SharedDB：共享库按进程懒建的连接（intraday.py 的分时点也写在这个库里，共用它）
+- 环境变量 FUND_SNAPSHOT_DB 可改库路径，设为空字符串则只在进程内存里保存
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# ========== 配置 ==========
+SNAPSHOT_DB = os.environ.get("FUND_SNAPSHOT_DB", os.path.join("data", "snapshot.db"))
+SYNC_INTERVAL = 1.0   # 秒，读操作最多这么久检查一次库里的版本号
+SETUP_RETRIES = 5     # 几个进程同时第一次打开新库时，切 WAL / 建表可能撞上锁，最多试几次
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    code    TEXT PRIMARY KEY,
+    item    TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+
+class SharedDB:
+    """
+    共享 SQLite 库的连接，按进程懒建（gunicorn fork 后不能沿用父进程的连接，路径改了也重新连）
+    自动提交模式，写入由调用方自己 BEGIN IMMEDIATE；FundSnapshot 和 intraday.IntradayStore 共用
+    """
+
+    def __init__(self, schema: str):
+        self.schema = schema
+        self._conn: Optional[sqlite3.Connection] = None
+        self._key: Tuple[int, str] = (0, "")
+
+    def connect(self, db_path: Optional[str]) -> Optional[sqlite3.Connection]:
+        """db_path 为空时返回 None（只在进程内存里保存）；出错抛 sqlite3.Error"""
+        if not db_path:
+            return None
+        key = (os.getpid(), db_path)
+        if self._conn is None or self._key != key:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False, isolation_level=None)
+            for attempt in range(SETUP_RETRIES):
+                try:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("PRAGMA synchronous=NORMAL")
+                    conn.executescript(self.schema)
+                    break
+                except sqlite3.OperationalError:
+                    if attempt == SETUP_RETRIES - 1:
+                        conn.close()
+                        raise
+                    time.sleep(0.05 * (attempt + 1))
+            self._conn, self._key = conn, key
+        return self._conn
+
+
+class FundSnapshot:
+    def __init__(self, db_path: Optional[str] = None):
+        self._items: Dict[str, dict] = {}      # code -> fetcher 产出的单只基金结果
+        self._updated: Dict[str, float] = {}   # code -> 刷新时间戳
+        self._lock = threading.Lock()
+        self.version = 0
+        self.updated_at = 0.0
+        self.generation_at = 0.0               # 当前主进程开始抓取的时间，早于它刷新的数据读出时为 stale
+        self.db_path = db_path
+        self._shared = SharedDB(SCHEMA)
+        self._synced_at = 0.0
+
+    # ---------- 写 ----------
+
+    def update(self, items: List[dict]):
+        """
+        写入一批基金结果；missing 的基金保留旧数据（旧数据状态改为 stale）
+        有共享库时整个读-改-写在一个 BEGIN IMMEDIATE 事务里：先在事务内合并其他进程写入的最新数据，
+        版本号取库里的值加一，多个进程同时写不会互相覆盖，也不会拿到同一个版本号
+        """
+        now = time.time()
+        with self._lock:
+            if self.db_path:
+                try:
+                    self._update_db_locked(items, now)
+                    return
+                except sqlite3.Error as e:
+                    print("写入快照库失败:", e)   # 库不可用时至少本进程照常更新
+            self._items, self._updated = self._merged(self._items, self._updated, items, now)[:2]
+            self.version += 1
+            self.updated_at = now
+
+    def start_generation(self):
+        """主进程开始抓取时调用：此刻之前刷新的数据在被重新刷新之前标为 stale；版本号递增，各 worker 的响应缓存随之失效"""
+        now = time.time()
+        with self._lock:
+            if self.db_path:
+                try:
+                    self._update_db_locked([], now, generation_at=now)
+                    return
+                except sqlite3.Error as e:
+                    print("写入快照库失败:", e)
+            self.version += 1
+            self.generation_at = now
+
+    def _update_db_locked(self, items: List[dict], now: float, generation_at: Optional[float] = None):
+        conn = self._db()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._load_locked(conn)
+            new_items, new_updated, changed = self._merged(self._items, self._updated, items, now)
+            version = self.version + 1
+            conn.executemany(
+                "INSERT OR REPLACE INTO items (code, item, updated) VALUES (?, ?, ?)",
+                [(code, json.dumps(item, ensure_ascii=False), new_updated.get(code, now))
+                 for code, item in changed.items()])
+            meta = [("version", version), ("updated_at", now)]
+            if generation_at is not None:
+                meta.append(("generation_at", generation_at))
+            conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", meta)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        # 提交成功才换上新数据；失败时内存保持与库一致
+        self._items, self._updated = new_items, new_updated
+        self.version, self.updated_at = version, now
+        if generation_at is not None:
+            self.generation_at = generation_at
+        self._synced_at = time.time()
+
+    @staticmethod
+    def _merged(old_items: Dict[str, dict], old_updated: Dict[str, float], items: List[dict], now: float):
+        """在副本上合并一批结果，返回 (新 items, 新刷新时间, 有变化的基金)"""
+        new_items, new_updated, changed = dict(old_items), dict(old_updated), {}
+        for item in items:
+            code = item["code"]
+            if item["status"] == "missing" and code in new_items:
+                old = new_items[code]
+                if old["status"] != "stale":
+                    new_items[code] = changed[code] = dict(old, status="stale")
+                continue
+            new_items[code] = changed[code] = item
+            new_updated[code] = now
+        return new_items, new_updated, changed
+
+    # ---------- 读 ----------
+
+    def get(self, code: str) -> Optional[dict]:
+        with self._lock:
+            self._sync_locked()
+            return self._view_locked(code)
+
+    def _view_locked(self, code: str) -> Optional[dict]:
+        """读出一只基金；上一轮运行留下、当前主进程还没重新刷新的标为 stale"""
+        item = self._items.get(code)
+        if item is not None and item["status"] == "ok" and self._updated.get(code, 0) < self.generation_at:
+            return dict(item, status="stale")
+        return item
+
+    def items(self, codes: List[str], max_age: Optional[float] = None) -> Optional[List[dict]]:
+        """
+        按 codes 顺序返回快照；有基金不在快照里，或（给了 max_age 时）有基金超过 max_age 秒未刷新，返回 None
+        """
+        return self.read(codes, max_age)[0]
+
+    def read(self, codes: List[str], max_age: Optional[float] = None) -> Tuple[Optional[List[dict]], int, float]:
+        """
+        同 items()，另外返回这批数据所属的 (版本号, 写入时间)：三者在同一把锁下读出，
+        调用方按这个版本号缓存由 items 生成的响应，不会被读完之后才落地的写入错配
+        """
+        now = time.time()
+        with self._lock:
+            self._sync_locked()
+            out = []
+            for code in codes:
+                item = self._view_locked(code)
+                if item is None or (max_age is not None and now - self._updated.get(code, 0) > max_age):
+                    out = None
+                    break
+                out.append(item)
+            return out, self.version, self.updated_at
+
+    def load(self) -> int:
+        """启动时从共享库加载上次持久化的快照，返回基金只数（之后的读操作按 SYNC_INTERVAL 自动同步）"""
+        with self._lock:
+            self._sync_locked(force=True)
+            return len(self._items)
+
+    def refreshed_at(self) -> Dict[str, float]:
+        with self._lock:
+            self._sync_locked()
+            return dict(self._updated)
+
+    # ---------- 共享存储 ----------
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        return self._shared.connect(self.db_path)
+
+    def _sync_locked(self, force: bool = False):
+        """库里版本号比内存新时整体重新加载（调用方持有 self._lock）"""
+        now = time.time()
+        if not self.db_path or (not force and now - self._synced_at < SYNC_INTERVAL):
+            return
+        self._synced_at = now
+        try:
+            self._load_locked(self._db())
+        except sqlite3.Error as e:
+            print("读取快照库失败:", e)
+
+    def _load_locked(self, conn: sqlite3.Connection):
+        """读库里的版本号，和内存不同就整体重新加载；出错直接抛 sqlite3.Error"""
+        meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        version = int(meta.get("version", 0))
+        if version == self.version:
+            return
+        items, updated = {}, {}
+        for code, item, ts in conn.execute("SELECT code, item, updated FROM items"):
+            items[code] = json.loads(item)
+            updated[code] = ts
+        self._items, self._updated = items, updated
+        self.version = version
+        self.updated_at = meta.get("updated_at", 0.0)
+        self.generation_at = meta.get("generation_at", 0.0)
+
+
+SNAPSHOT = FundSnapshot(SNAPSHOT_DB)
@@ -11,61 +11,18 @@ fund_signals_final_all.py
 
 import os
 import csv
-import json
-import re
-import requests
+import http_client
+import metrics
+import parsers
+import universe
 import argparse
 from datetime import date, timedelta
 from typing import List, Optional
 
 # ========== 配置 ==========
-FUNDS = [
-    {"name": "易方达医疗保健行业混合C", "code": "019020"},
-    {"name": "易方达港股通优质增长混合C", "code": "017974"},
-    {"name": "易方达机器人ETF联接C", "code": "020973"},
-    {"name": "易方达标普信息科技指数(QDII-LOF)C", "code": "012868"},
-    {"name": "易方达人工智能ETF联接C", "code": "023565"},
-    {"name": "易方达全球成长精选混合(QDII)C", "code": "012922"},
-    {"name": "华夏恒生科技ETF联接(QDII)C", "code": "513180"},
-    {"name": "华夏食品饮料ETF联接C", "code": "013126"},
-    {"name": "华安标普全球石油指数(QDII-LOF)C", "code": "014982"},
-    {"name": "华安中证云计算与大数据主题指数C", "code": "019990"},
-    {"name": "前海开源中证军工指数A", "code": "000596"},
-    {"name": "永赢低碳环保智选混合C", "code": "016387"},
-    {"name": "永赢半导体产业智选混合C", "code": "015968"},
-    {"name": "永赢医药创新智选混合C", "code": "015916"},
-    {"name": "永赢中证沪深港黄金产业股票ETF联接C", "code": "517520"},
-    # {"name": "永赢数字经济智选混合C", "code": "018123"},
-    {"name": "华泰柏瑞中证红利低波动ETF联接C", "code": "007467"},
-    {"name": "天弘中证细分化工产业主题指数C", "code": "015897"},
-    {"name": "天弘纳斯达克100指数(QDII)C", "code": "018044"},
-    {"name": "招商沪深300地产等权重C", "code": "013273"},
-    {"name": "招商中证白酒指数C", "code": "012414"},
-    {"name": "招商中证TMT50ETF联接C", "code": "004409"},
-    {"name": "安信医药健康主题股票C", "code": "010710"},
-    {"name": "广发中证环保产业ETF联接C", "code": "002984"},
-    {"name": "广发港股通互联网指数C", "code": "021093"},
-    {"name": "广发纳斯达克100ETF联接QDII/C", "code": "006479"},
-    {"name": "华宝中证医疗ETF联接C", "code": "512170"},
-    {"name": "华宝中证稀有金属主题指数增强C", "code": "013943"},
-    {"name": "大成标普500等权重指数(QDII)A", "code": "013404"},
-    {"name": "大成标普500等权重指数(QDII)C", "code": "008401"},
-    {"name": "大成纳斯达克100ETF联接QDII/C", "code": "008971"},
-    {"name": "中欧医疗健康混合C", "code": "003096"},
-    {"name": "东方阿尔法优选混合C", "code": "007519"},
-    {"name": "富国全球消费精选混合(QDII)C", "code": "012062"},
-    {"name": "长城新兴产业灵活配置混合C", "code": "019412"},
-    {"name": "中信建投低碳成长混合C", "code": "013852"},
-    {"name": "中航机遇领航混合C", "code": "018957"},
-    {"name": "鹏华碳中和主题混合C", "code": "016531"},
-    {"name": "银华中证光伏产业ETF联接C", "code": "516880"},
-    {"name": "国联安中证半导体ETF联接C", "code": "007301"},
-    {"name": "德邦鑫星价值灵活配置混合C", "code": "002112"},
-    {"name": "嘉实上证科创板芯片ETF联接C", "code": "588200"},
-]
-
-OUTPUT_DIR = "outputs"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+# 跟踪的基金名单来自 funds.json（见 universe.py，改了自动重新加载），用时取 universe.current().funds，不在导入时固定
+
+OUTPUT_DIR = "outputs"   # main() 写 CSV 前才创建，导入本模块不碰文件系统
 
 THRESHOLDS = {
     "daily_move_threshold": 1.5,      # 单日涨跌阈值
@@ -76,35 +33,105 @@ HEADERS = {"User-Agent": "python-requests/2.x (+https://github.com/)"}
 
 # ========== 数据抓取 ==========
 
+@metrics.instrument("fetch_fundgz")
 def fetch_fundgz(code: str) -> Optional[dict]:
     url = f"http://fundgz.1234567.com.cn/js/{code}.js"
     try:
-        r = requests.get(url, headers=HEADERS, timeout=8)
+        r = http_client.get(url, headers=HEADERS, timeout=8)
         if r.status_code != 200:
             return None
-        m = re.search(r"(\{.*\})", r.text)
-        if not m:
-            return None
-        return json.loads(m.group(1))
-    except Exception:
+        return parsers.parse_fundgz(r.content)
+    except Exception as e:
+        metrics.record_error("fetch_fundgz", e)
         return None
 
+EASTMONEY_MAX_BYTES = 512 * 1024   # 页面读到这么多还没找到净值就放弃
+
+@metrics.instrument("fetch_eastmoney")
 def fetch_eastmoney(code: str) -> Optional[dict]:
+    """
+    从基金页面提取最新涨跌幅及其净值日期；流式读取，出现“单位净值”并匹配成功就停止，不下载整页，
+    过了整批截止时间（http_client.deadline）也停止
+    直接在原始字节上匹配（parsers.eastmoney_quote），不解码整页
+    """
     url = f"https://fund.eastmoney.com/{code}.html"
     try:
-        r = requests.get(url, headers=HEADERS, timeout=8)
-        if r.status_code != 200:
+        r = http_client.get(url, headers=HEADERS, timeout=8, stream=True)
+        try:
+            if r.status_code != 200:
+                return None
+            # 响应头没声明编码时 requests 默认 ISO-8859-1，页面实际是 UTF-8
+            enc = r.encoding if r.encoding and r.encoding.lower() != "iso-8859-1" else "utf-8"
+            buf = bytearray()
+            for chunk in r.iter_content(chunk_size=16384):
+                buf += chunk
+                quote = parsers.eastmoney_quote(buf, enc)
+                if quote:
+                    # 页面上是最近一个已公布净值日的涨跌，jzrq 记该净值日期（见 estimate_date）
+                    return {"name": "", "gszzl": quote[0], "jzrq": quote[1]}
+                left = http_client.remaining()
+                if len(buf) >= EASTMONEY_MAX_BYTES or (left is not None and left <= 0):
+                    break
             return None
-        txt = r.text
-        m = re.search(r"单位净值.*?(\d+\.\d+).*?\(([\+\-]\d+\.\d+)%\)", txt)
-        if m:
-            return {"name": "", "gszzl": m.group(2)}
-        return None
-    except Exception:
+        finally:
+            r.close()
+    except Exception as e:
+        metrics.record_error("fetch_eastmoney", e)
         return None
 
-def fetch_history_nav(code: str, days: int = 5) -> List[float]:
-    """从天天基金抓取最近 N 日涨跌"""
+FUNDMOB_URL = "https://fundmobapi.eastmoney.com/FundMNewApi/FundMNFInfo"
+BATCH_SIZE = 50   # 批量估值接口单次最多查询的基金数
+
+@metrics.instrument("fetch_estimates_batch")
+def fetch_estimates_batch(codes: List[str]) -> dict:
+    """
+    一次请求查询多只基金的估值（天天基金移动端 FundMNFInfo 接口，Fcodes 逗号分隔）
+    返回 {code: 与 fetch_fundgz 同格式的 dict}；没有估值的基金（如部分 QDII）不在结果里
+    """
+    if not codes:
+        return {}
+    params = {
+        "pageIndex": 1,
+        "pageSize": len(codes),
+        "plat": "Android",
+        "appType": "ttjj",
+        "product": "EFund",
+        "Version": "1",
+        "deviceid": "fund-signals",
+        "Fcodes": ",".join(codes),
+    }
+    try:
+        r = http_client.get(FUNDMOB_URL, headers=HEADERS, params=params, timeout=8)
+        if r.status_code != 200:
+            return {}
+        rows = (parsers.loads(r.content) or {}).get("Datas") or []
+    except Exception as e:
+        metrics.record_error("fetch_estimates_batch", e)
+        return {}
+    out = {}
+    for row in rows:
+        code, gszzl = row.get("FCODE"), row.get("GSZZL")
+        try:
+            float(gszzl)
+        except (TypeError, ValueError):
+            continue   # "--" 等表示暂无估值，交给逐只接口兜底
+        out[code] = {
+            "fundcode": code,
+            "name": row.get("SHORTNAME", ""),
+            "jzrq": row.get("PDATE", ""),
+            "dwjz": row.get("NAV", ""),
+            "gsz": row.get("GSZ", ""),
+            "gszzl": gszzl,
+            "gztime": row.get("GZTIME", ""),
+        }
+    return out
+
+@metrics.instrument("fetch_history_rows")
+def fetch_history_rows(code: str, days: int = 5) -> List[tuple]:
+    """
+    从天天基金抓取最近的历史涨跌，带净值日期：[(YYYY-MM-DD, 涨跌幅), ...]，从旧到新
+    一次取 2N 条，跳过涨跌为空的记录后最多返回这么多条（调用方按需截取最近几日）
+    """
     from datetime import datetime, timedelta
     end = datetime.today()
     start = end - timedelta(days=days*3)
@@ -120,19 +147,78 @@ def fetch_history_nav(code: str, days: int = 5) -> List[float]:
     headers = HEADERS.copy()
     headers["Referer"] = f"https://fundf10.eastmoney.com/jjjz_{code}.html"
     try:
-        r = requests.get(url, headers=headers, params=params, timeout=8)
+        r = http_client.get(url, headers=headers, params=params, timeout=8)
         r.raise_for_status()
-        data = r.json()
-        lsjz = data.get("Data", {}).get("LSJZList", [])
-        pct = []
-        for row in reversed(lsjz):  # 从旧到新
-            val = row.get("JZZZL")
-            if val:
-                pct.append(float(val))
-        return pct[:days]
+        # 只取 FSRQ / JZZZL，不构造整个 JSON；接口按新到旧返回，反转成从旧到新
+        rows = parsers.lsjz_rows(r.content)
+        rows.reverse()
+        return rows
     except Exception as e:
-        print("异常:", e)
+        metrics.record_error("fetch_history_rows", e)
+        return []
+
+def fetch_history_nav(code: str, days: int = 5) -> List[float]:
+    """从天天基金抓取最近 N 日涨跌（从旧到新）"""
+    return [pct for _, pct in fetch_history_rows(code, days)[-days:]]
+
+def estimate_date(data: Optional[dict]) -> str:
+    """
+    当日涨跌对应的交易日：fundgz / 批量接口取估值时间 gztime 的日期；
+    eastmoney 页面回退给的是已公布净值的涨跌，取它的净值日期 jzrq；都没有返回 ""
+    """
+    if not data:
+        return ""
+    gztime = data.get("gztime") or ""
+    if len(gztime) >= 10 and gztime[4] == "-":
+        return gztime[:10]
+    return "" if "gztime" in data else data.get("jzrq") or ""
+
+def closes_before(rows: List[tuple], data: Optional[dict], days: int = 5) -> List[float]:
+    """
+    已收盘历史 [(日期, 涨跌幅)]（从旧到新）里早于当日涨跌所属交易日的最近 N 日
+    晚间净值同步后、周末时本地净值已包含估值那一天，去掉它，避免 history + [当日涨跌] 把同一天算两次
+    """
+    if not rows:
         return []
+    day = estimate_date(data)
+    if day:
+        rows = [r for r in rows if r[0] < day]
+    return [pct for _, pct in rows[-days:]]
+
+@metrics.instrument("fetch_nav_page")
+def fetch_nav_page(code: str, page: int, page_size: int = 20,
+                   start_date: str = "", end_date: str = "") -> (List[dict], int):
+    """
+    抓取 lsjz 历史净值的一页（新到旧）
+    返回：
+        rows: [{"date", "nav", "change_pct"}, ...]，change_pct 缺失时为 None
+        total: 接口给出的总条数
+    """
+    from datetime import datetime
+    url = "https://api.fund.eastmoney.com/f10/lsjz"
+    params = {
+        "fundCode": code,
+        "pageIndex": page,
+        "pageSize": page_size,
+        "startDate": start_date,
+        "endDate": end_date,
+        "_": int(datetime.now().timestamp()*1000)
+    }
+    headers = HEADERS.copy()
+    headers["Referer"] = f"https://fundf10.eastmoney.com/jjjz_{code}.html"
+    r = http_client.get(url, headers=headers, params=params, timeout=8)
+    r.raise_for_status()
+    data = parsers.loads(r.content)
+    body = data.get("Data") or {}
+    rows = []
+    for row in body.get("LSJZList") or []:
+        nav, pct = row.get("DWJZ"), row.get("JZZZL")
+        rows.append({
+            "date": row.get("FSRQ"),
+            "nav": float(nav) if nav else None,
+            "change_pct": float(pct) if pct else None,
+        })
+    return rows, int(data.get("TotalCount") or 0)
 
 # ========== 连续计算（按多数方向判定） ==========
 
@@ -178,49 +264,113 @@ def generate_signal(daily_change_pct, consecutive_days, consecutive_change_pct):
         risk = "趋势持续可能有机会或风险"
     return sig, reasons, risk
 
+@metrics.timed(metrics.SIGNAL_SECONDS, func="analyze_fund")
+def analyze_fund(code: str, name: str, data: Optional[dict], history: List[float],
+                 consecutive: Optional[tuple] = None) -> dict:
+    """
+    由当日估值和历史涨跌计算单只基金的连续趋势、强度和信号
+    consecutive 为已算好的 (天数, 方向, 合计)（调度器由 signal_state 增量得出），给了就不再从 history 重算
+    """
+    daily_change_pct = float(data.get("gszzl", 0.0)) if data else 0.0
+    if consecutive is None:
+        consecutive = compute_recent_consecutive(history + [daily_change_pct])
+    consecutive_days, consecutive_direction, consecutive_change_pct = consecutive
+    strength = min(1, abs(consecutive_change_pct)/10)  # 可按规则调整
+    sig, reasons, risk = generate_signal(daily_change_pct, consecutive_days, consecutive_change_pct)
+    return {
+        "code": code,
+        "name": name,
+        "daily_change_pct": daily_change_pct,
+        "consecutive_days": consecutive_days,
+        "consecutive_direction": consecutive_direction,
+        "consecutive_change_pct": consecutive_change_pct,
+        "strength": strength,
+        "signal": sig,
+        "reasons": reasons,
+        "risk_warning": risk,
+    }
+
 # ========== 主流程 ==========
 
+def process_funds(funds: List[dict], today: str) -> (List[dict], List[dict], str):
+    """
+    抓取并分析一批基金，返回 (CSV 行, 信号日志行, 本进程指标汇总)
+    模块级函数，便于多进程分片时在子进程里调用
+    """
+    from fetcher import fetch_all  # fetcher 依赖本模块，放到函数内导入避免循环引用
+
+    results, log_rows = [], []
+    # 并发抓取所有基金，总耗时约等于最慢的一次请求
+    for item in fetch_all(funds, days=5):
+        r = analyze_fund(item["code"], item["name"], item["data"], item["history"])
+        results.append({
+            "date": today,
+            "name": r["name"],
+            "daily_change_pct": r["daily_change_pct"],
+            "consecutive_days": r["consecutive_days"],
+            "consecutive_direction": r["consecutive_direction"],
+            "consecutive_change_pct": round(r["consecutive_change_pct"],2),
+            "strength": round(r["strength"],2),
+            "reasons": r["reasons"],
+            "risk_warning": r["risk_warning"],
+            "status": item["status"]
+        })
+        log_rows.append(dict(r, date=today, status=item["status"]))
+    return results, log_rows, metrics.summary()
+
+CSV_FIELDS = ["date", "name", "daily_change_pct", "consecutive_days", "consecutive_direction",
+              "consecutive_change_pct", "strength", "reasons", "risk_warning", "status"]   # process_funds 的 CSV 行
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--date", type=str, default=date.today().isoformat(), help="指定日期，格式 YYYY-MM-DD")
+    parser.add_argument("--watchlist", type=str, default=universe.ALL_WATCHLIST, help="只处理某个自选列表（见 funds.json）")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="分成几个进程处理（基金很多时用；每个进程有各自的上游并发上限）")
     args = parser.parse_args()
     today = args.date
-    results = []
-
-    for f in FUNDS:
-        code, name = f["code"], f["name"]
-
-        data = fetch_fundgz(code) or fetch_eastmoney(code)
-        daily_change_pct = float(data.get("gszzl", 0.0)) if data else 0.0
-
-        history = fetch_history_nav(code, days=5) + [daily_change_pct]
-        consecutive_days, consecutive_direction, consecutive_change_pct = compute_recent_consecutive(history)
-
-        strength = min(1, abs(consecutive_change_pct)/10)  # 可按规则调整
+    funds = universe.current().watchlist(args.watchlist)
+    if funds is None:
+        parser.error(f"自选列表不存在：{args.watchlist}")
+    if not funds:
+        print(f"⚠️ 自选列表 {args.watchlist} 里没有启用的基金，只生成表头")
+    results, log_rows, summaries = [], [], []
 
-        sig, reasons, risk = generate_signal(daily_change_pct, consecutive_days, consecutive_change_pct)
-
-        results.append({
-            "date": today,
-            "name": name,
-            "daily_change_pct": daily_change_pct,
-            "consecutive_days": consecutive_days,
-            "consecutive_direction": consecutive_direction,
-            "consecutive_change_pct": round(consecutive_change_pct,2),
-            "strength": round(strength,2),
-            "reasons": reasons,
-            "risk_warning": risk
-        })
+    parts = [p for p in universe.shard(funds, args.shards) if p] if args.shards > 1 else []
+    if len(parts) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=len(parts)) as pool:
+            for res, logs, summary in pool.map(process_funds, parts, [today] * len(parts)):
+                results.extend(res)
+                log_rows.extend(logs)
+                summaries.append(summary)
+    else:
+        results, log_rows, summary = process_funds(funds, today)
+        summaries.append(summary)
 
     # 先按当日涨跌幅绝对值，从高到低；再按连续天数，从高到低
     results.sort(key=lambda x: ( x["reasons"]), reverse=True)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
     out_file = os.path.join(OUTPUT_DIR, f"signals_{today.replace('-','')}.csv")
     with open(out_file, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
         writer.writeheader()
         writer.writerows(results)
 
     print(f"✅ 已生成 {out_file}")
 
+    # 同时追加到列式信号日志，按日期查询历史不必再逐个解析 CSV
+    try:
+        import signal_log
+        signal_log.append(log_rows)
+        print(f"✅ 已写入信号日志 {signal_log.LOG_DIR}")
+    except Exception as e:
+        print("写入信号日志失败:", e)
+
+    for i, summary in enumerate(summaries):
+        if len(summaries) > 1:
+            print(f"[分片 {i + 1}/{len(summaries)}]")
+        print(summary)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+对比逐只循环（success.compute_recent_consecutive + generate_signal）和
+向量化批量引擎（batch_signals.run_batch）的耗时，并校验结果逐项一致
+用法：python tool/bench_batch_signals.py [--days 6] [--sizes 40 1000 10000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+# 引用仓库根目录下的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import batch_signals
+import success
+
+
+def make_histories(n_funds: int, n_days: int, seed: int = 42):
+    """随机涨跌，约 10% 为零天，模拟停牌 / 持平"""
+    rnd = random.Random(seed)
+    return [[0.0 if rnd.random() < 0.1 else round(rnd.gauss(0, 1.5), 2) for _ in range(n_days)]
+            for _ in range(n_funds)]
+
+
+def scalar_loop(histories):
+    out = []
+    for h in histories:
+        days, direction, change_sum = success.compute_recent_consecutive(h)
+        strength = min(1, abs(change_sum) / 10)
+        sig, _, _ = success.generate_signal(h[-1], days, change_sum)
+        out.append((days, direction, change_sum, strength, sig))
+    return out
+
+
+def check_same(scalar, batch):
+    for i, (days, direction, change_sum, strength, sig) in enumerate(scalar):
+        if (days != batch["consecutive_days"][i] or direction != batch["consecutive_direction"][i]
+                or change_sum != batch["consecutive_change_pct"][i]
+                or strength != batch["strength"][i] or sig != batch["signal"][i]):
+            raise AssertionError(f"第 {i} 只基金结果不一致：{scalar[i]}")
+
+
+def bench(fn, *args, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=6, help="每只基金的交易日数（默认 5 日历史 + 当日）")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[40, 1000, 10000])
+    args = parser.parse_args()
+
+    print(f"{'基金数':>8} {'逐只循环(ms)':>14} {'批量构建矩阵(ms)':>18} {'批量计算(ms)':>14} {'加速比':>8}")
+    for n in args.sizes:
+        histories = make_histories(n, args.days)
+        matrix = batch_signals.build_matrix(histories)
+        check_same(scalar_loop(histories), batch_signals.run_batch(matrix))
+
+        t_loop = bench(scalar_loop, histories)
+        t_build = bench(batch_signals.build_matrix, histories)
+        t_batch = bench(batch_signals.run_batch, matrix)
+        print(f"{n:>8} {t_loop * 1000:>14.2f} {t_build * 1000:>18.2f} {t_batch * 1000:>14.2f} "
+              f"{t_loop / t_batch:>7.1f}x")
+    print("✅ 批量结果与逐只循环完全一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基金名称匹配基准：原逐行扫描 match_funds_linear vs 预建索引 match_funds
+- 默认用合成的 2 万只基金名单（无需联网）；--real 则下载 fundcode_search.js
+- 校验两者匹配代码 / 方式 / 相似度逐项一致，输出每秒匹配名称数
+用法：python tool/bench_match.py [--universe 20000] [--queries 2000] [--real]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+# 引用仓库根目录和 tool 目录下的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fund_index import FundIndex
+from fundlist import FUND_JS_URL
+from getfundnum import FUND_NAMES, download_fund_list, match_funds, match_funds_linear
+
+COMPANIES = ["易方达", "华夏", "华安", "永赢", "天弘", "招商", "广发", "华宝", "大成", "中欧",
+             "富国", "鹏华", "银华", "嘉实", "南方", "博时", "汇添富", "工银瑞信", "建信", "国泰"]
+THEMES = ["医疗保健", "半导体", "新能源", "消费升级", "人工智能", "中证500", "沪深300", "创业板",
+          "科创板芯片", "红利低波", "恒生科技", "纳斯达克100", "标普500", "军工", "光伏产业", "白酒",
+          "云计算", "稀有金属", "机器人", "碳中和", "港股通互联网", "食品饮料", "黄金产业", "化工"]
+KINDS = ["混合", "指数", "ETF联接", "股票", "灵活配置混合", "精选混合", "指数增强", "主题指数"]
+CLASSES = ["A", "C", "E", "(QDII)A", "(QDII)C", "发起式C"]
+
+
+def synth_universe(n: int, seed: int = 7):
+    rnd = random.Random(seed)
+    data, seen = [], set()
+    while len(data) < n:
+        name = rnd.choice(COMPANIES) + rnd.choice(THEMES) + rnd.choice(KINDS) + rnd.choice(CLASSES)
+        if len(seen) < n * 3 // 4 and name in seen:
+            name = name.replace(rnd.choice(CLASSES[:2]), f"{rnd.randint(1, 99)}号") if rnd.random() < 0.5 else name
+        seen.add(name)
+        data.append([f"{len(data):06d}", "", name, "混合型", ""])
+    return data
+
+
+def synth_queries(fund_data, n: int, seed: int = 11):
+    """三分之一原样、三分之一截断（子串）、三分之一改字（模糊）"""
+    rnd = random.Random(seed)
+    out = []
+    for i in range(n):
+        name = rnd.choice(fund_data)[2]
+        if i % 3 == 1:
+            name = name[:max(4, len(name) - rnd.randint(1, 3))]
+        elif i % 3 == 2:
+            pos = rnd.randrange(len(name))
+            name = name[:pos] + rnd.choice("基金优选成长") + name[pos + 1:]
+        out.append(name)
+    return out
+
+
+COMPARE_KEYS = ["匹配代码", "匹配方式", "相似度_score"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--universe", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--linear-queries", type=int, default=60, help="逐行扫描太慢，只抽样这么多个对照")
+    parser.add_argument("--real", action="store_true", help="使用真实 fundcode_search.js 名单")
+    args = parser.parse_args()
+
+    fund_data = download_fund_list(FUND_JS_URL) if args.real else synth_universe(args.universe)
+    queries = (FUND_NAMES * (args.queries // len(FUND_NAMES) + 1))[:args.queries] if args.real \
+        else synth_queries(fund_data, args.queries)
+
+    t0 = time.perf_counter()
+    index = FundIndex(fund_data)
+    t_build = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    fast = match_funds(queries, fund_data, index=index)
+    t_fast = time.perf_counter() - t0
+
+    sample = queries[:args.linear_queries]
+    t0 = time.perf_counter()
+    slow = match_funds_linear(sample, fund_data)
+    t_slow = time.perf_counter() - t0
+
+    mismatches = [(a["原始名称"], [a[k] for k in COMPARE_KEYS], [b[k] for k in COMPARE_KEYS])
+                  for a, b in zip(slow, fast) if any(a[k] != b[k] for k in COMPARE_KEYS)]
+
+    print(f"名单 {len(fund_data)} 只，索引构建 {t_build * 1000:.0f} ms")
+    print(f"逐行扫描：{len(sample)} 个名称 {t_slow:.2f}s，{len(sample) / t_slow:,.1f} 个/秒")
+    print(f"预建索引：{len(queries)} 个名称 {t_fast:.2f}s，{len(queries) / t_fast:,.1f} 个/秒")
+    print(f"对照 {len(sample)} 个名称，不一致 {len(mismatches)} 个")
+    for m in mismatches[:10]:
+        print("  ", m)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上游响应解析基准：success.py 原来的写法 vs parsers.py
+- 合成接近真实大小的 fundgz JSONP、eastmoney 基金页面（净值在页面中部）、lsjz 响应、fundcode_search 全量名单
+- 每种载荷先校验两种写法结果一致，再输出单次解析耗时（微秒）和 tracemalloc 统计的峰值分配
+- parsers 的 JSON 解码器：有 orjson 用 orjson，--no-orjson 强制标准库 json 对比
+用法：python tool/bench_parsers.py [--repeat 2000] [--no-orjson]
+"""
+
+import argparse
+import codecs
+import json
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+
+# 引用仓库根目录下的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fundlist
+import parsers
+
+# ========== 原来的写法（success.py / fundlist.py 改动前） ==========
+
+LEGACY_EASTMONEY = re.compile(r"单位净值.*?(\d+\.\d+).*?\(([\+\-]\d+\.\d+)%\)")
+
+
+def legacy_fundgz(body: bytes):
+    m = re.search(r"(\{.*\})", body.decode("utf-8"))
+    return json.loads(m.group(1)) if m else None
+
+
+def legacy_eastmoney(body: bytes, chunk_size: int = 16384):
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buf = ""
+    for i in range(0, len(body), chunk_size):
+        buf += decoder.decode(body[i:i + chunk_size])
+        start = buf.find("单位净值")
+        if start >= 0:
+            m = LEGACY_EASTMONEY.search(buf, start)
+            if m:
+                return m.group(2)
+    return None
+
+
+def legacy_lsjz(body: bytes):
+    data = json.loads(body.decode("utf-8"))
+    pct = []
+    for row in reversed(data.get("Data", {}).get("LSJZList", [])):
+        val = row.get("JZZZL")
+        if val:
+            pct.append(float(val))
+    return pct
+
+
+def legacy_fund_js(body: bytes):
+    text = body.decode("utf-8-sig")
+    return json.loads(text[text.find("[["):text.rfind("]]") + 2])
+
+
+# ========== 新写法（与 success.py / fundlist.py 中的调用一致） ==========
+
+def new_eastmoney(body: bytes, chunk_size: int = 16384):
+    buf = bytearray()
+    for i in range(0, len(body), chunk_size):
+        buf += body[i:i + chunk_size]
+        quote = parsers.eastmoney_quote(buf)
+        if quote:
+            return quote[0]
+    return None
+
+
+def new_lsjz(body: bytes):
+    rows = parsers.lsjz_rows(body)
+    rows.reverse()
+    return [pct for _, pct in rows]
+
+
+def new_fund_js(body: bytes):
+    return fundlist.parse_fund_js(body)
+
+
+# ========== 合成载荷 ==========
+
+def make_payloads(seed: int = 3) -> dict:
+    rnd = random.Random(seed)
+    est = {"fundcode": "019020", "name": "易方达医疗保健行业混合C", "jzrq": "2024-06-07", "dwjz": "1.2345",
+           "gsz": "1.2468", "gszzl": "1.00", "gztime": "2024-06-11 15:00"}
+    fundgz = f"jsonpgz({json.dumps(est, ensure_ascii=False)});".encode("utf-8")
+
+    # 真实页面约 150 KB、多行，“单位净值”在中部；前面的导航里也出现一次但不带涨跌幅
+    lines = ["<html><head><meta charset=\"utf-8\"><title>易方达医疗保健行业混合C(019020)</title></head><body>",
+             "<li><a href=\"#\">单位净值查询</a></li>"]
+    for i in range(1500):
+        lines.append(f"<div class=\"item{i}\"><span>基金经理 {rnd.random():.6f}</span><span>规模 {i}.{i % 97}亿元</span></div>")
+    lines.append("<dl class=\"dataItem02\"><dt><p>单位净值 (2024-06-07)</p></dt><dd class=\"dataNums\">"
+                 "<span class=\"ui-num\">1.2345</span><span class=\"ui-num\">(+0.52%)</span></dd></dl>")
+    for i in range(1500):
+        lines.append(f"<div class=\"tail{i}\">历史业绩 {rnd.random():.6f}</div>")
+    html = "\n".join(lines).encode("utf-8")
+
+    def lsjz(n):
+        rows = [{"FSRQ": f"2024-05-{31 - i:02d}", "DWJZ": f"{1 + rnd.random():.4f}", "LJJZ": f"{1 + rnd.random():.4f}",
+                 "SDATE": None, "ACTUALSYI": "", "NAVTYPE": "1", "JZZZL": "" if i == 3 else f"{rnd.gauss(0, 1.2):.2f}",
+                 "SGZT": "开放申购", "SHZT": "开放赎回", "FHFCZ": "", "FHFCBZ": "", "DTYPE": None, "FHSP": ""}
+                for i in range(n)]
+        body = {"Data": {"LSJZList": rows, "FundType": "002", "SYType": None, "isNewType": False, "Feature": "211"},
+                "ErrCode": 0, "ErrMsg": None, "TotalCount": 1200, "Expansion": None, "PageSize": n, "PageIndex": 1}
+        return json.dumps(body, ensure_ascii=False).encode("utf-8")
+
+    listing = [[f"{i:06d}", "YFDYLBJHHC", f"易方达医疗保健行业混合{i}号C", "混合型-偏股", "YIFANGDAYILIAO"]
+               for i in range(20000)]
+    fund_js = ("var r = " + json.dumps(listing, ensure_ascii=False) + ";").encode("utf-8")
+
+    return {"fundgz": fundgz, "eastmoney": html, "lsjz_10": lsjz(10), "lsjz_20": lsjz(20),
+            "fundcode_search": fund_js}
+
+
+CASES = {
+    "fundgz": (legacy_fundgz, parsers.parse_fundgz),
+    "eastmoney": (legacy_eastmoney, new_eastmoney),
+    "lsjz_10": (legacy_lsjz, new_lsjz),
+    "lsjz_20": (legacy_lsjz, new_lsjz),
+    "fundcode_search": (legacy_fund_js, new_fund_js),
+}
+
+
+# ========== 计时 / 分配 ==========
+
+def time_per_call(fn, payload, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn(payload)
+    return (time.perf_counter() - t0) / repeat
+
+
+def peak_allocation(fn, payload) -> int:
+    """一次调用期间的峰值分配字节数（含返回值）"""
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    fn(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak - base
+
+
+def main():
+    parser = argparse.ArgumentParser(description="上游响应解析基准")
+    parser.add_argument("--repeat", type=int, default=2000, help="小载荷重复次数（大载荷自动减少）")
+    parser.add_argument("--no-orjson", action="store_true", help="parsers 改用标准库 json")
+    args = parser.parse_args()
+    if args.no_orjson:
+        parsers.orjson = None
+
+    payloads = make_payloads()
+    print(f"JSON 解码器：{'orjson' if parsers.orjson is not None else 'json（标准库）'}")
+    print(f"{'载荷':<16}{'大小':>10}  {'原写法 μs':>10}{'新写法 μs':>10}{'加速':>7}  "
+          f"{'原峰值 KB':>10}{'新峰值 KB':>10}")
+    for name, (old, new) in CASES.items():
+        payload = payloads[name]
+        a, b = old(payload), new(payload)
+        if a != b:
+            print(f"{name}: 结果不一致 {str(a)[:80]} vs {str(b)[:80]}")
+            continue
+        repeat = max(3, args.repeat * 1024 // max(1024, len(payload)))
+        t_old = time_per_call(old, payload, repeat)
+        t_new = time_per_call(new, payload, repeat)
+        peak_old = peak_allocation(old, payload)
+        peak_new = peak_allocation(new, payload)
+        print(f"{name:<16}{len(payload) / 1024:>8.1f}KB  {t_old * 1e6:>10.1f}{t_new * 1e6:>10.1f}"
+              f"{t_old / t_new:>6.1f}x  {peak_old / 1024:>10.1f}{peak_new / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
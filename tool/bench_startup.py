@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+冷启动基准：导入耗时 + 重启后第一个有效响应的耗时
+- import：新进程里 import app / success 的耗时（中位数），--top 时列出 -X importtime 最慢的模块
+- first response：以子进程启动 python app.py，从启动到 /api/funds/signals 返回非空结果的时间；
+  上游走本地回放服务（tool/replay.py，带延迟），分两轮：
+    cold  工作目录里没有快照，只能现场抓取整批基金
+    warm  上一轮留下的 data/snapshot.db，启动时加载快照直接作答，后台再刷新
+在临时目录里运行，不碰仓库的 data/
+用法：python tool/bench_startup.py [--runs 5] [--latency 100] [--top 15] [--no-scheduler]
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+TOOL_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TOOL_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, TOOL_DIR)
+
+
+def _env(**extra) -> dict:
+    env = dict(os.environ, PYTHONPATH=REPO_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    env.update({k: str(v) for k, v in extra.items()})
+    return env
+
+
+def import_seconds(module: str, workdir: str) -> float:
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=workdir, env=_env(), check=True,
+                         capture_output=True, text=True).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def slowest_imports(module: str, workdir: str, top: int) -> list:
+    """-X importtime 输出里累计耗时最长的仓库模块和顶层第三方包"""
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=workdir,
+                         env=_env(), check=True, capture_output=True, text=True).stderr
+    rows = []
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cum, name = line.split("|")
+        if name.strip() == "package" or not cum.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth <= 1:
+            rows.append((int(cum) / 1e6, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def first_response(workdir: str, upstream: str, scheduler: bool, timeout: float = 120.0) -> dict:
+    """启动 app.py 子进程，轮询到 /api/funds/signals 返回非空列表为止"""
+    port = free_port()
+    env = _env(FUND_DEBUG=0, FUND_HOST="127.0.0.1", FUND_PORT=port, FUND_UPSTREAM=upstream,
+               FUND_SCHEDULER=1 if scheduler else 0)
+    url = f"http://127.0.0.1:{port}/api/funds/signals"
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, "app.py")], cwd=workdir, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    listening = None
+    try:
+        while time.perf_counter() - t0 < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=timeout) as r:
+                    rows = json.loads(r.read())
+                if rows:
+                    return {"listening": listening, "first_response": time.perf_counter() - t0, "rows": len(rows),
+                            "statuses": sorted({row["status"] for row in rows})}
+            except (urllib.error.URLError, ConnectionError):
+                if proc.poll() is not None:
+                    raise RuntimeError(f"app.py 退出，返回码 {proc.returncode}")
+                time.sleep(0.01)
+                continue
+            finally:
+                if listening is None and _port_open(port):
+                    listening = time.perf_counter() - t0
+        raise RuntimeError(f"{timeout}s 内没有拿到有效响应")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def _port_open(port: int) -> bool:
+    with socket.socket() as s:
+        return s.connect_ex(("127.0.0.1", port)) == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动基准")
+    parser.add_argument("--runs", type=int, default=5, help="导入耗时测几次取中位数")
+    parser.add_argument("--latency", type=float, default=100.0, help="回放服务平均延迟（毫秒）")
+    parser.add_argument("--top", type=int, default=0, help="列出最慢的若干个导入")
+    parser.add_argument("--no-scheduler", action="store_true", help="不启动后台调度器（FUND_SCHEDULER=0）")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="fund-startup-")
+    print(f"工作目录 {workdir}")
+    for module in ("app", "success"):
+        times = [import_seconds(module, workdir) for _ in range(args.runs)]
+        print(f"import {module:<8} 中位数 {statistics.median(times) * 1000:7.1f} ms（最快 {min(times) * 1000:.1f} ms）")
+    if args.top:
+        for seconds, name in slowest_imports("app", workdir, args.top):
+            print(f"    {seconds * 1000:8.1f} ms  {name}")
+
+    import replay
+    store = replay.FixtureStore(os.path.join(workdir, "fixtures"))
+    replay.synth(store, universe_size=100)
+    stub = replay.StubServer(store, latency=args.latency, jitter=args.latency / 4, seed=1).start()
+    try:
+        for label in ("cold", "warm"):
+            r = first_response(workdir, stub.url, scheduler=not args.no_scheduler)
+            listening = f"{r['listening']:.2f}s" if r["listening"] is not None else "-"
+            print(f"{label}: 端口就绪 {listening}，首个有效响应 {r['first_response']:.2f}s"
+                  f"（{r['rows']} 只，状态 {','.join(r['statuses'])}）")
+    finally:
+        stub.stop()
+    print("回放服务:", stub.stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线基准套件：上游全部走本地回放服务（tool/replay.py），不需要网络，结果可存档对比发现性能回退
+- pipeline：完整 success.main（批量估值 + 逐只兜底 + lsjz 历史 + 信号 + CSV + 信号日志），每次清空缓存
+- api：Flask /api/funds/signals 并发轮询（gzip；--etag 时再跑一轮条件请求），输出 req/s 和延迟分位数
+- match：match_funds 在合成的大名单上的匹配速度（含索引构建）
+在临时目录里运行，不碰仓库的 data/ 和 outputs/；没有指定 --fixtures 时现场生成合成夹具
+用法：
+    python tool/bench_suite.py [--latency 30 --jitter 10 --error-rate 0.01] [--only pipeline api]
+    python tool/bench_suite.py --save bench.json                       # 存档
+    python tool/bench_suite.py --baseline bench.json --tolerance 0.2   # 比存档慢 20% 以上时退出码 1
+"""
+
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import redirect_stdout
+from datetime import date
+
+TOOL_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TOOL_DIR))
+sys.path.insert(0, TOOL_DIR)
+
+# 必须在导入仓库模块之前设置：快照只放内存、不启动调度器
+os.environ["FUND_SNAPSHOT_DB"] = ""
+os.environ["FUND_SCHEDULER"] = "0"
+
+BENCHES = ("pipeline", "api", "match")
+
+
+def result(value: float, unit: str, higher_is_better: bool = False, **extra) -> dict:
+    return dict(extra, value=round(value, 4), unit=unit, higher_is_better=higher_is_better)
+
+
+# ========== 各项基准 ==========
+
+def bench_pipeline(runs: int) -> dict:
+    import cache
+    import success
+    import universe
+
+    times = []
+    for _ in range(runs):
+        for c in cache.ALL_CACHES:
+            c.clear()
+        sys.argv = ["success.py", "--date", date.today().isoformat()]
+        t0 = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            success.main()
+        times.append(time.perf_counter() - t0)
+    return {"pipeline": result(statistics.median(times), "s", runs=runs, min=round(min(times), 4),
+                               funds=len(universe.current().funds))}
+
+
+def bench_api(concurrency: int, duration: float, etag: bool) -> dict:
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    import app
+    import cache
+    from loadtest import percentile, worker
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", 0, app.app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/api/funds/signals"
+    out = {}
+    try:
+        for c in cache.ALL_CACHES:
+            c.clear()
+        t0 = time.perf_counter()
+        app.app.test_client().get("/api/funds/signals")   # 首次：抓取并写快照
+        out["api_first_request"] = result(time.perf_counter() - t0, "s")
+        for name, use_etag in [("api_signals", False)] + ([("api_signals_etag", True)] if etag else []):
+            latencies, codes, lock = [], Counter(), threading.Lock()
+            deadline = time.time() + duration
+            threads = [threading.Thread(target=worker, args=(url, deadline, use_etag, True, latencies, codes, lock))
+                       for _ in range(concurrency)]
+            t0 = time.time()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.time() - t0
+            latencies.sort()
+            out[name] = result(len(latencies) / elapsed, "req/s", higher_is_better=True,
+                               p50_ms=round(percentile(latencies, 50) * 1000, 2),
+                               p99_ms=round(percentile(latencies, 99) * 1000, 2),
+                               status={str(k): v for k, v in codes.items()})
+    finally:
+        server.shutdown()
+    return out
+
+
+def bench_match(universe_size: int, queries: int) -> dict:
+    from bench_match import synth_queries, synth_universe
+    from fund_index import FundIndex
+    from getfundnum import match_funds
+
+    fund_data = synth_universe(universe_size)
+    names = synth_queries(fund_data, queries)
+    t0 = time.perf_counter()
+    index = FundIndex(fund_data)
+    t_build = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    match_funds(names, fund_data, index=index)
+    t_match = time.perf_counter() - t0
+    return {"match_index_build": result(t_build, "s", universe=universe_size),
+            "match_funds": result(queries / t_match, "names/s", higher_is_better=True, queries=queries)}
+
+
+# ========== 对比 ==========
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """返回回退项 [(名称, 基线, 本次, 变化比例)]"""
+    regressions = []
+    for name, r in results.items():
+        b = baseline.get(name)
+        if not b or not b.get("value"):
+            continue
+        change = (r["value"] - b["value"]) / b["value"]
+        worse = -change if r["higher_is_better"] else change
+        if worse > tolerance:
+            regressions.append((name, b["value"], r["value"], worse))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线基准套件")
+    parser.add_argument("--only", nargs="*", choices=BENCHES, default=list(BENCHES))
+    parser.add_argument("--fixtures", help="夹具目录（默认现场生成合成夹具）")
+    parser.add_argument("--extra", type=int, default=0, help="合成夹具额外虚构的基金数")
+    parser.add_argument("--latency", type=float, default=20.0, help="回放服务平均延迟（毫秒）")
+    parser.add_argument("--jitter", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--runs", type=int, default=3, help="pipeline 重复次数")
+    parser.add_argument("-c", "--concurrency", type=int, default=16)
+    parser.add_argument("-d", "--duration", type=float, default=5.0)
+    parser.add_argument("--etag", action="store_true", help="api 额外跑一轮条件请求")
+    parser.add_argument("--universe", type=int, default=20000, help="match 的合成名单规模")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--save", help="结果存为 JSON")
+    parser.add_argument("--baseline", help="与之前存档的 JSON 对比")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="变差超过这个比例算回退")
+    args = parser.parse_args()
+
+    save = os.path.abspath(args.save) if args.save else None
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+    fixtures = os.path.abspath(args.fixtures) if args.fixtures else None
+    workdir = tempfile.mkdtemp(prefix="fund-bench-")
+    os.chdir(workdir)
+
+    import replay
+    store = replay.FixtureStore(fixtures or os.path.join(workdir, "fixtures"))
+    if fixtures:
+        store.load()
+    else:
+        replay.synth(store, extra=args.extra)
+    stub = replay.StubServer(store, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                             throttle_rate=args.throttle_rate, seed=1).start()
+    import http_client
+    http_client.UPSTREAM_OVERRIDE = stub.url
+
+    print(f"工作目录 {workdir}，回放 {len(store.items)} 个夹具，延迟 {args.latency}±{args.jitter}ms，"
+          f"5xx {args.error_rate:.0%}，429 {args.throttle_rate:.0%}")
+    results = {}
+    try:
+        if "pipeline" in args.only:
+            results.update(bench_pipeline(args.runs))
+        if "api" in args.only:
+            results.update(bench_api(args.concurrency, args.duration, args.etag))
+        if "match" in args.only:
+            results.update(bench_match(args.universe, args.queries))
+    finally:
+        stub.stop()
+
+    for name, r in results.items():
+        extra = {k: v for k, v in r.items() if k not in ("value", "unit", "higher_is_better")}
+        print(f"{name:<20} {r['value']:>12,.4f} {r['unit']:<8} {extra}")
+    print("回放服务:", stub.stats)
+
+    if save:
+        with open(save, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"✅ 已保存 {save}")
+    if baseline:
+        with open(baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for name, old, new, worse in regressions:
+            print(f"❌ 回退 {name}：{old} → {new}（变差 {worse:.0%}）")
+        if regressions:
+            sys.exit(1)
+        print(f"✅ 与基线相比没有超过 {args.tolerance:.0%} 的回退")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Flask 接口（app.py）的自检：离线运行，上游走本地回放服务（tool/replay.py），快照库、净值库、基金名单都在临时目录
+- /api/funds/signals：带 ETag，条件请求返回 304；funds.json 删减基金后（快照没变）返回新名单的结果
+- 响应缓存：同一版本的响应被很多请求同时要时只序列化一次；缓存键用与数据同一次读出的快照版本，
+  读完快照之后才落地的写入不会让旧数据缓存在新版本下
+- 分时序列：主进程抓取时记下的点写进共享快照库，另一个进程（新建的 IntradayStore 模拟另一个 worker）读到同样的序列；
+  换交易日后旧的点从库里删掉
+- 旧快照：过期时先用来作答的行、以及调度器新一轮开始前持久化的行都标为 stale（另一个进程读到的也是），刷新完成后才是 ok
+- SSE 推送：带 retry 字段，推完有限几轮就断开（线程不被一个看板占半小时），客户端传再大的轮数 / 间隔也封顶；
+  更新轮只看共享快照的版本号、推送变了的行，不请求上游
+用法：python tool/check_api.py
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import types
+
+TOOL_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TOOL_DIR))
+sys.path.insert(0, TOOL_DIR)
+
+N_FUNDS = 8
+WORKDIR = tempfile.mkdtemp(prefix="fund-check-")
+FUNDS = [{"code": f"9{i:05d}", "name": f"合成测试基金{i}号混合C"} for i in range(N_FUNDS)]
+with open(os.path.join(WORKDIR, "funds.json"), "w", encoding="utf-8") as f:
+    json.dump({"funds": FUNDS}, f, ensure_ascii=False)
+# universe / snapshot 导入时读环境变量，要在导入任何仓库模块之前设好
+os.environ["FUND_UNIVERSE"] = os.path.join(WORKDIR, "funds.json")
+os.environ["FUND_SNAPSHOT_DB"] = os.path.join(WORKDIR, "snapshot.db")
+os.environ["FUND_SCHEDULER"] = "0"
+import app
+import http_client
+import intraday
+import navstore
+import replay
+import snapshot
+import universe
+from response_cache import ResponseCache
+
+
+def events(body: str) -> list:
+    """SSE 响应拆成 [(event, data)]；retry 字段记为 ("retry", 毫秒)"""
+    out = []
+    for block in body.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+        if "retry" in fields:
+            out.append(("retry", int(fields["retry"])))
+        elif "event" in fields:
+            out.append((fields["event"], json.loads(fields["data"])))
+    return out
+
+
+def write_universe(funds: list):
+    with open(os.environ["FUND_UNIVERSE"], "w", encoding="utf-8") as f:
+        json.dump({"funds": funds}, f, ensure_ascii=False)
+    st = os.stat(os.environ["FUND_UNIVERSE"])
+    os.utime(os.environ["FUND_UNIVERSE"], ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))   # 同一秒内改两次也能看出变化
+    universe._checked_at = 0.0   # 不等 RELOAD_CHECK_SECONDS
+
+
+def check_signals_etag_and_universe(client):
+    r = client.get("/api/funds/signals")
+    assert r.status_code == 200 and len(r.get_json()) == N_FUNDS, r.status_code
+    etag = r.headers["ETag"]
+    r = client.get("/api/funds/signals", headers={"If-None-Match": etag})
+    assert r.status_code == 304 and r.headers["ETag"] == etag, r.status_code
+
+    version = app.SNAPSHOT.version
+    write_universe(FUNDS[:-1])
+    try:
+        r = client.get("/api/funds/signals", headers={"If-None-Match": etag})
+        assert app.SNAPSHOT.version == version   # 快照没变，只有名单变了
+        assert r.status_code == 200, r.status_code
+        assert [row["code"] for row in r.get_json()] == [f["code"] for f in FUNDS[:-1]]
+        assert r.headers["ETag"] != etag
+    finally:
+        write_universe(FUNDS)
+
+
+def check_payload_single_flight(client):
+    cache, builds, start = ResponseCache(), [], threading.Barrier(16)
+
+    def build():
+        builds.append(1)
+        time.sleep(0.2)   # 序列化一大批信号要一段时间，期间其他请求陆续到达
+        return [{"n": i} for i in range(1000)]
+
+    got = []
+
+    def request_one():
+        start.wait()
+        got.append(cache.payload("signals", 1, build))
+
+    threads = [threading.Thread(target=request_one) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(builds) == 1, len(builds)
+    assert len({id(p) for p in got}) == 1
+    assert cache.stats()["coalesced"] == 15, cache.stats()
+
+    # 构建失败：等待方不拿到 None，而是自己再试
+    def broken():
+        raise RuntimeError("boom")
+    try:
+        cache.payload("signals", 2, broken)
+        raise AssertionError("应当抛出构建时的异常")
+    except RuntimeError:
+        pass
+    assert cache.payload("signals", 2, build) is not None
+
+
+def check_cache_key_matches_items(client):
+    """调度器恰好在读完快照、生成响应之前写入：这次响应按读到的版本缓存，下一次请求拿到新数据"""
+    code = FUNDS[0]["code"]
+    real_read = app.SNAPSHOT.read
+
+    def read_then_write(codes, max_age=None):
+        out = real_read(codes, max_age)
+        item = app.SNAPSHOT.get(code)
+        app.SNAPSHOT.update([dict(item, data=dict(item["data"], gszzl="7.77"), consecutive=None)])
+        return out
+
+    app.SNAPSHOT.read = read_then_write
+    try:
+        first = client.get("/api/funds/signals").get_json()
+    finally:
+        del app.SNAPSHOT.read
+    assert first[0]["daily_change_pct"] != 7.77, first[0]
+    second = client.get("/api/funds/signals").get_json()
+    assert second[0]["daily_change_pct"] == 7.77, second[0]
+
+
+def check_ticks_shared_across_workers(client):
+    intraday.SYNC_INTERVAL = 0   # 读时每次都补读，不等 1 秒
+    other = intraday.IntradayStore(db_path=app.TICKS.db_path)   # 另一个 worker：自己从没抓过上游
+    code = FUNDS[0]["code"]
+    first = client.get(f"/api/fund/{code}/intraday").get_json()
+    assert first["points"], first
+    assert other.series(code) == app.TICKS.series(code)
+
+    day = first["date"]
+    app.TICKS.record(code, {"gszzl": "3.21", "gztime": f"{day} 15:01"})
+    assert other.series(code)["points"][-1] == {"time": "15:01", "change_pct": 3.21}
+    assert other.crossings(code, 3.0) == app.TICKS.crossings(code, 3.0) != []
+
+    # 第二天第一个点写入时，前一天的点从库里删掉
+    app.TICKS.record(code, {"gszzl": "0.10", "gztime": "9999-12-31 09:31"})
+    with sqlite3.connect(app.TICKS.db_path) as conn:
+        assert conn.execute("SELECT DISTINCT day FROM ticks").fetchall() == [("9999-12-31",)]
+    assert intraday.IntradayStore(db_path=app.TICKS.db_path).series(code)["points"] == [
+        {"time": "09:31", "change_pct": 0.1}]
+
+
+def check_restored_rows_marked_stale(client):
+    # 快照过期（如重启后调度器还没跑）：先用旧快照作答，行标为 stale，后台刷新写回后才是 ok
+    app.SNAPSHOT_MAX_AGE = 0
+    try:
+        rows = client.get("/api/funds/signals").get_json()
+    finally:
+        app.SNAPSHOT_MAX_AGE = 300
+    assert rows and all(r["status"] == "stale" for r in rows), rows
+    with app._background_refresh:   # 等后台刷新写完
+        pass
+    rows = client.get("/api/funds/signals").get_json()
+    assert all(r["status"] == "ok" for r in rows), rows
+
+    # 调度器新一轮开始：之前持久化的行在被重新刷新之前都是 stale，另一个 worker 读库也一样
+    snapshot.SYNC_INTERVAL = 0
+    other = snapshot.FundSnapshot(app.SNAPSHOT.db_path)
+    codes = [f["code"] for f in FUNDS]
+    etag = client.get("/api/funds/signals").headers["ETag"]
+    app.SNAPSHOT.start_generation()
+    r = client.get("/api/funds/signals", headers={"If-None-Match": etag})
+    assert r.status_code == 200 and all(row["status"] == "stale" for row in r.get_json()), r.status_code
+    assert all(item["status"] == "stale" for item in other.items(codes))
+    app.SNAPSHOT.update(app.fetch_all(FUNDS))
+    assert all(row["status"] == "ok" for row in client.get("/api/funds/signals").get_json())
+    assert all(item["status"] == "ok" for item in other.items(codes))
+
+
+def check_stream_is_bounded(client):
+    """
+    一个连接最多推 STREAM_UPDATE_ROUNDS 轮、每轮最多等 STREAM_UPDATE_INTERVAL 秒，之后 end 断开，由 retry 重连；
+    更新轮里快照变了才推 update，只推变了的那只，整个连接不请求上游
+    """
+    sleeps = []
+    code = FUNDS[1]["code"]
+
+    def sleep(seconds):   # 不真等，只记下每轮等了多久；第一轮等待期间调度器刷新了一只基金
+        sleeps.append(seconds)
+        if len(sleeps) == 1:
+            item = app.SNAPSHOT.get(code)
+            app.SNAPSHOT.update([dict(item, data=dict(item["data"], gszzl="6.66"), consecutive=None)])
+
+    real_time = app.time
+    app.time = types.SimpleNamespace(sleep=sleep)
+    before = http_client.stats()["requests"]
+    try:
+        body = client.get("/api/funds/signals/stream?updates=1000&interval=3600").get_data(as_text=True)
+    finally:
+        app.time = real_time
+    assert http_client.stats()["requests"] == before
+    ev = events(body)
+    assert ev[0] == ("retry", app.STREAM_RETRY_MS), ev[:1]
+    rows = [d for e, d in ev if e == "signal"]
+    assert len(rows) == N_FUNDS and all(r["status"] == "ok" for r in rows), rows
+    updates = [d for e, d in ev if e == "update"]
+    assert [(u["code"], u["daily_change_pct"]) for u in updates] == [(code, 6.66)], updates
+    assert ev[-1][0] == "end", ev[-1]
+    assert len(sleeps) == app.STREAM_UPDATE_ROUNDS, sleeps
+    assert sum(sleeps) <= app.STREAM_UPDATE_ROUNDS * app.STREAM_UPDATE_INTERVAL <= 120, sleeps
+
+
+def main():
+    navstore.DB_PATH = os.path.join(WORKDIR, "nav.db")
+    store = replay.FixtureStore(os.path.join(WORKDIR, "fixtures"))
+    for f in FUNDS:
+        replay.synth_fund(store, f["code"], f["name"])
+    stub = replay.StubServer(store).start()
+    http_client.UPSTREAM_OVERRIDE = stub.url
+    try:
+        client = app.app.test_client()
+        for check in (check_signals_etag_and_universe, check_payload_single_flight, check_cache_key_matches_items,
+                      check_ticks_shared_across_workers,
+                      check_restored_rows_marked_stale, check_stream_is_bounded):
+            check(client)
+            print(f"✅ {check.__name__}")
+    finally:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
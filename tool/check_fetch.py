@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+抓取引擎（fetcher.py）的自检：离线运行，上游走本地回放服务（tool/replay.py），可调延迟
+- 整批截止时间：上游很慢时按截止时间返回，且截止时正在进行的请求随之结束，下一批不用等线程池腾出来
+- 调度器的请求预算（http_client.budget）：后台刷新和收盘同步的每个请求（批量估值、线程池里的历史、净值同步）都取令牌，
+  令牌不够时排队不超过截止时间；接口请求现场抓取不在预算里，不取令牌
+用法：python tool/check_fetch.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+TOOL_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TOOL_DIR))
+sys.path.insert(0, TOOL_DIR)
+import breaker
+import cache
+import fetcher
+import http_client
+import intraday
+import navstore
+import replay
+import scheduler
+
+N_FUNDS = 60   # 多于线程池大小（fetcher.MAX_WORKERS），慢请求能把池子占满
+
+
+def pool_busy_for() -> float:
+    """线程池里已在跑的任务还要多久才全部结束：给每个工作线程各塞一个空任务，等它们都跑完"""
+    t0 = time.perf_counter()
+    executor = fetcher._get_executor()
+    for f in [executor.submit(time.sleep, 0.05) for _ in range(fetcher.MAX_WORKERS)]:
+        f.result()
+    return time.perf_counter() - t0 - 0.05
+
+
+def check_deadline_frees_pool(stub: replay.StubServer, funds: list):
+    """上游延迟 1.5 s、截止 0.5 s：这一批按时返回，截止时正在等上游的任务也随之结束，线程池马上空出来"""
+    stub.latency = 1500
+    t0 = time.perf_counter()
+    rows = fetcher.fetch_all(funds, deadline=0.5)
+    first = time.perf_counter() - t0
+    assert first < 0.8, first
+    assert all(r["status"] == "missing" for r in rows)
+    # 原来截止时已发出的请求要把 1.5 s 等完，下一批至少还要排 1 s 的队
+    busy = pool_busy_for()
+    assert busy < 0.3, busy
+
+    stub.latency = 0
+    cache.ESTIMATE_CACHE.clear()
+    cache.HISTORY_CACHE.clear()
+    rows = fetcher.fetch_all(funds, deadline=10)
+    assert all(r["status"] == "ok" for r in rows), {r["status"] for r in rows}
+    print(f"    截止 0.5s 的一批用时 {first:.2f}s，之后线程池还忙 {busy:.2f}s")
+
+
+class CountingLimiter(scheduler.RateLimiter):
+    def __init__(self, rate: float, burst: int):
+        super().__init__(rate, burst)
+        self.granted = 0
+
+    def acquire(self, stop=None, timeout=None) -> bool:
+        ok = super().acquire(stop, timeout)
+        self.granted += ok
+        return ok
+
+
+def check_budget_covers_scheduler_requests(stub: replay.StubServer, funds: list):
+    stub.latency = 0
+    sched = scheduler.Scheduler(lambda: funds)
+    sched.limiter = limiter = CountingLimiter(rate=10 ** 6, burst=10 ** 6)
+    before = http_client.stats()["requests"]
+    assert sched.refresh(funds) == len(funds)   # 还没有信号状态：批量估值 + 逐只历史（调度器线程池）
+    sched.close_sync(funds[:1])                 # 净值同步 + 刷新
+    sent = http_client.stats()["requests"] - before
+    assert limiter.granted == sent > len(funds), (limiter.granted, sent)
+
+    # 接口请求现场抓取：调度器的令牌桶再紧也不排队
+    sched.limiter = tight = CountingLimiter(rate=5, burst=5)
+    cache.ESTIMATE_CACHE.clear()
+    cache.HISTORY_CACHE.clear()
+    rows = fetcher.fetch_all(funds, deadline=10)
+    assert all(r["status"] == "ok" for r in rows), {r["status"] for r in rows}
+    assert tight.granted == 0, tight.granted
+
+    # 预算很紧时整批仍按截止时间返回，发出去的请求不超过令牌数
+    cache.ESTIMATE_CACHE.clear()
+    cache.HISTORY_CACHE.clear()
+    before = http_client.stats()
+    t0 = time.perf_counter()
+    with http_client.budget(scheduler.RateLimiter(rate=5, burst=5)):
+        fetcher.fetch_all(funds, deadline=0.5)
+    took = time.perf_counter() - t0
+    after = http_client.stats()
+    assert took < 0.8, took
+    assert after["rejected"] > before["rejected"]
+    assert after["requests"] - after["rejected"] - (before["requests"] - before["rejected"]) <= 5 + 5
+    print(f"    调度器发出 {sent} 个请求取了 {limiter.granted} 个令牌；每秒 5 个令牌时截止 0.5s 的一批用时 {took:.2f}s")
+
+
+def main():
+    workdir = tempfile.mkdtemp(prefix="fund-check-")
+    navstore.DB_PATH = os.path.join(workdir, "nav.db")   # 空库，历史全部走上游
+    intraday.TICKS.db_path = os.path.join(workdir, "snapshot.db")   # 分时点、快照、信号状态都不写进仓库的 data/
+    scheduler.SNAPSHOT.db_path = os.path.join(workdir, "snapshot.db")
+    scheduler.STATES.path = None
+    breaker.MIN_CALLS = 10 ** 6                          # 故意制造的超时不触发熔断
+    store = replay.FixtureStore(os.path.join(workdir, "fixtures"))
+    funds = [{"code": f"9{i:05d}", "name": f"合成测试基金{i}号混合C"} for i in range(N_FUNDS)]
+    for f in funds:
+        replay.synth_fund(store, f["code"], f["name"])
+    replay.synth_fund(store, funds[0]["code"], funds[0]["name"], days=navstore.SYNC_PAGE_SIZE)   # 净值同步用
+    stub = replay.StubServer(store).start()
+    http_client.UPSTREAM_OVERRIDE = stub.url
+    try:
+        for check in (check_deadline_frees_pool, check_budget_covers_scheduler_requests):
+            cache.ESTIMATE_CACHE.clear()
+            cache.HISTORY_CACHE.clear()
+            check(stub, funds)
+            print(f"✅ {check.__name__}")
+    finally:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
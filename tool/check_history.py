@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史涨跌窗口的自检：离线运行，上游走本地回放服务（tool/replay.py），净值库写在临时目录
+- 联网路径（success.fetch_history_nav）和本地净值库（navstore.recent_rows）取到的是同一段最近 N 日
+- 估值所属交易日已经收盘入库时（晚间同步后、周末），历史里去掉这一天，history + [当日涨跌] 不重复计入
+- 本地净值库是否过期按缺了几个交易日判断，不按自然日
+- 持久化的信号状态落后（停机太久、收盘同步失败）时调度器重读历史重建状态；重读不到就标为 stale，不顶着旧窗口给 ok
+- 调度器写进快照行的连续涨跌（signal_state 增量得出）与按 history + [当日涨跌] 重算一致
+用法：python tool/check_history.py
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import date, timedelta
+
+TOOL_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TOOL_DIR))
+sys.path.insert(0, TOOL_DIR)
+import cache
+import fetcher
+import http_client
+import intraday
+import navstore
+import replay
+import scheduler
+import success
+
+CODE, NAME = "019020", "易方达医疗保健行业混合C"
+WINDOWS = (3, 5)   # fetch_history_nav 每次取 2N 条，每个 N 都要有对应 pageSize 的夹具
+
+
+def check_window_matches_store(workdir: str):
+    """两条路径都是最近 N 个交易日、从旧到新"""
+    db = os.path.join(workdir, "nav.db")
+    assert navstore.sync_fund(CODE, db_path=db) == navstore.SYNC_PAGE_SIZE
+    for days in WINDOWS:
+        local = [pct for _, pct in navstore.recent_rows(CODE, days, db_path=db)]
+        network = success.fetch_history_nav(CODE, days=days)
+        newest = [r["change_pct"] for r in navstore.history(CODE, db_path=db)][-days:]
+        assert local == newest, (days, local, newest)
+        assert network == local, (days, network, local)
+
+
+def check_estimate_day_not_counted_twice(workdir: str):
+    """估值日期已在历史里：去掉那天及以后，仍保留 N 日；估值日期在历史之后：原样取最近 N 日"""
+    db = os.path.join(workdir, "nav.db")
+    days = fetcher.HISTORY_DAYS
+    rows = navstore.recent_rows(CODE, days + 1, db_path=db)
+    closed_day = rows[-1][0]
+    pcts = [pct for _, pct in rows]
+    assert success.closes_before(rows, {"gszzl": "1.00", "gztime": f"{closed_day} 15:00"}, days) == pcts[:-1]
+    assert success.closes_before(rows, {"gszzl": "1.00", "gztime": "9999-12-31 15:00"}, days) == pcts[1:]
+    # eastmoney 回退给的是已公布净值的涨跌，按页面上的净值日期截
+    page = success.fetch_eastmoney(CODE)
+    assert page["jzrq"] == closed_day, page
+    assert success.closes_before(rows, page, days) == pcts[:-1]
+    assert success.closes_before(rows, None, days) == pcts[1:]
+
+    # 走完整抓取：批量估值的 GZTIME 落在本地最新收盘日上
+    navstore.DB_PATH = db
+    cache.HISTORY_CACHE.clear()
+    cache.ESTIMATE_CACHE.clear()
+    key = replay.fixture_key(replay.FUNDMOB_HOST, replay.FUNDMOB_PATH, params={replay.SPLIT_PARAM: CODE})
+    row = json.loads(replay.FixtureStore.body(STORE.get(key)))
+    STORE.put(key, 200, "application/json", json.dumps(dict(row, GZTIME=f"{closed_day} 15:00")).encode("utf-8"))
+    item = fetcher.fetch_all([{"code": CODE, "name": NAME}])[0]
+    assert item["status"] == "ok", item
+    assert item["history"] == pcts[:-1], (item["history"], pcts)
+    r = success.analyze_fund(CODE, NAME, item["data"], item["history"])
+    expected = success.compute_recent_consecutive(pcts[:-1] + [float(row["GSZZL"])])
+    assert (r["consecutive_days"], r["consecutive_direction"], r["consecutive_change_pct"]) == expected
+
+
+def check_lag_in_trading_days(workdir: str):
+    """周末不算缺；周中缺了两三个交易日的本地库不再当作新鲜"""
+    monday = date(2024, 6, 10)
+    cases = [
+        (monday - timedelta(days=3), monday, 0),                 # 周五 -> 周一
+        (monday, monday + timedelta(days=1), 0),                 # 周一 -> 周二
+        (monday, monday + timedelta(days=2), 1),                 # 缺周二
+        (monday, monday + timedelta(days=4), 3),                 # 缺周二到周四（按自然日 4 天，原来算新鲜）
+        (monday - timedelta(days=3), monday + timedelta(days=2), 2),
+        (monday - timedelta(days=14), monday, 9),
+        (monday, monday, 0),
+    ]
+    for newest, today, expected in cases:
+        got = navstore.missing_trading_days(newest, today)
+        assert got == expected, (newest, today, got, expected)
+
+    db = os.path.join(workdir, "lag.db")
+    navstore.latest_date(CODE, db_path=db)   # 建表
+    today = date.today()
+    for lag in range(0, 6):
+        newest = today - timedelta(days=1)
+        while navstore.missing_trading_days(newest) < lag:
+            newest -= timedelta(days=1)
+        with sqlite3.connect(db) as conn:
+            conn.execute("DELETE FROM nav")
+            conn.executemany("INSERT INTO nav (code, date, nav, change_pct) VALUES (?, ?, 1.0, ?)",
+                             [(CODE, (newest - timedelta(days=i)).isoformat(), 0.1 * i) for i in range(5)])
+        fresh = bool(navstore.recent_rows(CODE, 5, db_path=db))
+        assert fresh == (navstore.missing_trading_days(newest) <= navstore.MAX_LAG_TRADING_DAYS), (newest, lag)
+
+
+def check_lagging_state_reloaded(workdir: str):
+    """状态停在两周前：刷新后窗口和 as_of 跟上最新收盘日；历史取不到时仍是旧窗口，但不算 ok"""
+    scheduler.STATES.path = None
+    scheduler.SNAPSHOT.db_path = os.path.join(workdir, "snapshot.db")
+    fund = {"code": CODE, "name": NAME}
+    sched = scheduler.Scheduler(lambda: [fund])
+    old_day = (date.today() - timedelta(days=16)).isoformat()
+    cache.HISTORY_CACHE.clear()
+    cache.ESTIMATE_CACHE.clear()
+
+    real_get_history = fetcher.get_history
+    fetcher.get_history = lambda *args, **kwargs: []   # 上游和净值库都拿不到历史
+    try:
+        scheduler.STATES.seed(CODE, [9.0] * fetcher.HISTORY_DAYS, old_day)
+        sched.refresh([fund])
+    finally:
+        fetcher.get_history = real_get_history
+    item = scheduler.SNAPSHOT.get(CODE)
+    assert item["status"] == "stale" and item["history"] == [9.0] * fetcher.HISTORY_DAYS, item
+    assert scheduler.STATES.get(CODE).as_of == old_day
+
+    sched.refresh([fund])
+    rows = fetcher.get_history(CODE)
+    state = scheduler.STATES.get(CODE)
+    assert state.as_of == rows[-1][0] and not scheduler.lagging(state), state.as_of
+    item = scheduler.SNAPSHOT.get(CODE)
+    assert item["status"] == "ok", item
+    assert item["history"] == success.closes_before(rows, item["data"], fetcher.HISTORY_DAYS), item
+
+    # 估值日在状态之后：连续涨跌由状态增量算好写进快照行，与按 history + [当日涨跌] 重算一致
+    key = replay.fixture_key(replay.FUNDMOB_HOST, replay.FUNDMOB_PATH, params={replay.SPLIT_PARAM: CODE})
+    row = json.loads(replay.FixtureStore.body(STORE.get(key)))
+    STORE.put(key, 200, "application/json", json.dumps(dict(row, GZTIME="9999-12-31 15:00")).encode("utf-8"))
+    sched.refresh([fund])
+    item = scheduler.SNAPSHOT.get(CODE)
+    daily = float(item["data"]["gszzl"])
+    assert item["history"] == [pct for _, pct in rows[-fetcher.HISTORY_DAYS:]], item
+    assert tuple(item["consecutive"]) == success.compute_recent_consecutive(item["history"] + [daily]), item
+    assert success.analyze_fund(CODE, NAME, item["data"], item["history"], item["consecutive"]) == \
+        success.analyze_fund(CODE, NAME, item["data"], item["history"])
+
+
+STORE = None
+
+
+def main():
+    global STORE
+    workdir = tempfile.mkdtemp(prefix="fund-check-")
+    store = STORE = replay.FixtureStore(os.path.join(workdir, "fixtures"))
+    intraday.TICKS.db_path = os.path.join(workdir, "snapshot.db")   # 分时点不写进仓库的 data/
+    # 同一只基金的合成数据按相同种子生成、前几条一致：pageSize=2N 给 fetch_history_nav，pageSize=20 给 navstore 同步
+    for days in WINDOWS:
+        replay.synth_fund(store, CODE, NAME, days=2 * days)
+    replay.synth_fund(store, CODE, NAME, days=navstore.SYNC_PAGE_SIZE)
+    stub = replay.StubServer(store).start()
+    http_client.UPSTREAM_OVERRIDE = stub.url
+    try:
+        for check in (check_window_matches_store, check_estimate_day_not_counted_twice, check_lag_in_trading_days,
+                      check_lagging_state_reloaded):
+            check(workdir)
+            print(f"✅ {check.__name__}")
+    finally:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
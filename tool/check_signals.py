@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+信号计算的等价性自检：随机序列对拍，以逐只的 success.compute_recent_consecutive / generate_signal 为准
+- batch_signals：长短不一（含空列表、全零）的历史拼成矩阵后批量计算，逐项一致
+- signal_state：随机的播种 / 收盘 / 盘中估值 / 重新播种 / 序列化操作序列，增量状态与按列表重算一致；
+  估值日已收盘（收盘同步后又刷新估值）时估值不计入，同一天不算两次
+用法：python tool/check_signals.py [--trials 20000] [--seed 7]
+"""
+
+import argparse
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+# 引用仓库根目录下的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import batch_signals
+import signal_state
+import success
+
+
+def random_changes(rnd: random.Random, n: int) -> list:
+    """约 15% 零天（停牌 / 持平），偶尔整段同号，覆盖多数方向打平和连续段贯穿整个窗口的情况"""
+    if rnd.random() < 0.1:
+        s = rnd.choice((1, -1))
+        return [0.0 if rnd.random() < 0.15 else s * round(rnd.uniform(0.01, 3), 2) for _ in range(n)]
+    return [0.0 if rnd.random() < 0.15 else round(rnd.gauss(0, 1.5), 2) for _ in range(n)]
+
+
+def scalar(h: list) -> tuple:
+    days, direction, change_sum = success.compute_recent_consecutive(h)
+    daily = h[-1] if h else 0.0
+    sig, _, _ = success.generate_signal(daily, days, change_sum)
+    return days, direction, change_sum, min(1, abs(change_sum) / 10), sig
+
+
+def check_batch_matches_scalar(rnd: random.Random, trials: int):
+    histories = [random_changes(rnd, rnd.randint(0, 8)) for _ in range(trials)]
+    histories += [[], [0.0], [0.0] * 6, [1.0, -1.0], [-1.0, 1.0], [2.0] * 6]
+    out = batch_signals.run_histories(histories)
+    for i, h in enumerate(histories):
+        got = (int(out["consecutive_days"][i]), int(out["consecutive_direction"][i]),
+               float(out["consecutive_change_pct"][i]), float(out["strength"][i]), str(out["signal"][i]))
+        assert got == scalar(h), (h, got, scalar(h))
+
+
+def check_state_matches_scalar(rnd: random.Random, trials: int):
+    """参照模型：按日期记下的全部收盘日 + 未被收盘覆盖的估值，每步都用 compute_recent_consecutive 重算"""
+    start = date(2024, 1, 1)
+
+    def day(i: int) -> str:
+        return (start + timedelta(days=i)).isoformat()
+
+    for _ in range(trials):
+        n = rnd.randint(0, 8)
+        closes = list(zip(range(n), random_changes(rnd, n)))
+        states = signal_state.SignalStates(path=None)
+        state = states.seed("000001", [p for _, p in closes], day(n - 1) if n else "")
+        last = n - 1
+        intraday = None   # (交易日序号, 涨跌)
+        for _ in range(rnd.randint(1, 12)):
+            op = rnd.random()
+            if op < 0.35:
+                i = last + rnd.choice((1, 1, 2)) if rnd.random() < 0.85 else max(0, last - rnd.randint(0, 2))
+                pct = random_changes(rnd, 1)[0]
+                if states.close("000001", day(i), pct):
+                    closes.append((i, pct))
+                    last = i
+                    intraday = None
+            elif op < 0.75:
+                i = last + rnd.choice((-1, 0, 1, 1, 1))
+                pct = random_changes(rnd, 1)[0]
+                kept = states.set_intraday("000001", pct, f"{day(i)} 14:30", day(i))
+                intraday = (i, pct) if not closes or i > last else None
+                assert kept == (intraday is not None), (closes, i)
+            elif op < 0.85:
+                # 重新播种（如 history=True 的刷新），窗口和 as_of 取自同一份收盘记录
+                state = states.seed("000001", [p for _, p in closes][-signal_state.WINDOW_DAYS:],
+                                    day(last) if closes else "")
+            else:
+                state = signal_state.FundSignalState.from_dict(state.to_dict())
+                states._states["000001"] = state
+            state = states.get("000001")
+            window = [p for _, p in closes][-signal_state.WINDOW_DAYS:]
+            daily = intraday[1] if intraday else 0.0
+            assert state.history() == window, (state.history(), window)
+            assert state.evaluate() == success.compute_recent_consecutive(window + [daily]), (closes, intraday)
+            x = random_changes(rnd, 1)[0]
+            assert state.evaluate(x) == success.compute_recent_consecutive(window + [x]), (closes, x)
+
+    # 收盘同步之后再刷新估值：估值还是当天的，不再计入
+    state = signal_state.FundSignalState("000001", [1.0, 2.0], "2024-06-11")
+    state.set_intraday(1.5, "2024-06-12 15:00", "2024-06-12")
+    assert state.close("2024-06-12", 1.4)
+    assert not state.set_intraday(1.5, "2024-06-12 15:00", "2024-06-12")
+    assert state.evaluate() == success.compute_recent_consecutive([1.0, 2.0, 1.4]), state.evaluate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="信号计算等价性自检")
+    parser.add_argument("--trials", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    for check in (check_batch_matches_scalar, check_state_matches_scalar):
+        check(random.Random(args.seed), args.trials)
+        print(f"✅ {check.__name__}（{args.trials} 组）")
+
+
+if __name__ == "__main__":
+    main()
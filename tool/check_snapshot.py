@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享快照（snapshot.py）的自检：几个 FundSnapshot 各用自己的连接写同一个临时库，模拟 gunicorn 多个 worker 并发写
+- 版本号：每次写入在库里正好加一，不重复、不跳号
+- 不丢更新：写完后版本号和库一致的实例，内存里的数据也和库一致（原来先读后写分成两步，中间别人写的会丢）
+- missing 的基金只把库里最新的那份标成 stale，不会用读到的旧数据盖掉别人刚写的新数据
+用法：python tool/check_snapshot.py [--writers 4] [--rounds 150]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import snapshot
+
+
+def item(code: str, n: int, status: str = "ok") -> dict:
+    return {"code": code, "name": code, "data": {"gszzl": str(n)} if status != "missing" else None,
+            "history": [], "status": status}
+
+
+def db_state(db: str) -> tuple:
+    with sqlite3.connect(db) as conn:
+        version = int(conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0])
+        items = {code: json.loads(raw) for code, raw in conn.execute("SELECT code, item FROM items")}
+    return version, items
+
+
+def check_concurrent_writers(writers: int, rounds: int):
+    db = os.path.join(tempfile.mkdtemp(prefix="fund-check-"), "snapshot.db")
+    snaps = [snapshot.FundSnapshot(db) for _ in range(writers)]
+
+    def work(w: int):
+        for i in range(rounds):
+            # 各自的基金轮流写；共享的 "shared" 由 0 号写新值，其他实例报告 missing
+            snaps[w].update([item(f"w{w}-{i % 7}", i),
+                             item("shared", i) if w == 0 else item("shared", -1, "missing")])
+
+    threads = [threading.Thread(target=work, args=(w,)) for w in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    version, items = db_state(db)
+    assert version == writers * rounds, (version, writers * rounds)
+    assert len(items) == writers * 7 + 1, len(items)
+    for s in snaps:
+        if s.version == version:
+            assert s._items == items
+    # 0 号最后一次写入的新值还在（可能已被标成 stale），没有被别的实例用更早读到的旧值覆盖
+    assert items["shared"]["data"] == {"gszzl": str(rounds - 1)}, items["shared"]
+    # 另一个实例读到的也是同一份
+    fresh = snapshot.FundSnapshot(db)
+    assert fresh.load() == len(items) and fresh.version == version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="共享快照并发写自检")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=150)
+    args = parser.parse_args()
+    for check in (check_concurrent_writers,):
+        check(args.writers, args.rounds)
+        print(f"✅ {check.__name__}（{args.writers} 个实例 × {args.rounds} 次写入）")
+
+
+if __name__ == "__main__":
+    main()
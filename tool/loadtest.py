@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+接口压测：多线程持续请求给定接口，输出每秒请求数和延迟分位数
+- 默认模拟看板轮询 /api/funds/signals（带 gzip）；--etag 时带上次的 ETag，模拟浏览器条件请求（大多返回 304）
+- 每个线程一个独立连接（requests.Session），不与仓库内的 http_client 共享连接池
+用法：
+    gunicorn -c gunicorn.conf.py wsgi:application        # 先启动服务
+    python tool/loadtest.py --url http://127.0.0.1:5000/api/funds/signals -c 32 -d 15 [--etag]
+"""
+
+import argparse
+import threading
+import time
+from collections import Counter
+
+import requests
+
+
+def worker(url: str, deadline: float, use_etag: bool, gzip: bool, latencies: list, codes: Counter,
+           lock: threading.Lock):
+    session = requests.Session()
+    headers = {"Accept-Encoding": "gzip" if gzip else "identity"}
+    local_lat, local_codes = [], Counter()
+    while time.time() < deadline:
+        t0 = time.perf_counter()
+        try:
+            r = session.get(url, headers=headers, timeout=30)
+            r.content
+            status = r.status_code
+            if use_etag and r.headers.get("ETag"):
+                headers["If-None-Match"] = r.headers["ETag"]
+        except requests.RequestException as e:
+            status = type(e).__name__
+        local_lat.append(time.perf_counter() - t0)
+        local_codes[status] += 1
+    with lock:
+        latencies.extend(local_lat)
+        codes.update(local_codes)
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="接口压测")
+    parser.add_argument("--url", default="http://127.0.0.1:5000/api/funds/signals")
+    parser.add_argument("-c", "--concurrency", type=int, default=16, help="并发线程数")
+    parser.add_argument("-d", "--duration", type=float, default=10.0, help="持续秒数")
+    parser.add_argument("--etag", action="store_true", help="带 If-None-Match 条件请求")
+    parser.add_argument("--no-gzip", action="store_true", help="不接受压缩")
+    args = parser.parse_args()
+
+    latencies, codes, lock = [], Counter(), threading.Lock()
+    deadline = time.time() + args.duration
+    threads = [threading.Thread(target=worker, args=(args.url, deadline, args.etag, not args.no_gzip,
+                                                     latencies, codes, lock))
+               for _ in range(args.concurrency)]
+    t0 = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - t0
+
+    latencies.sort()
+    print(f"URL: {args.url}  并发 {args.concurrency}  时长 {elapsed:.1f}s")
+    print(f"请求数 {len(latencies)}，{len(latencies) / elapsed:.1f} req/s")
+    print("状态码：" + "，".join(f"{k}×{v}" for k, v in sorted(codes.items(), key=lambda kv: str(kv[0]))))
+    print("延迟(ms)：" + "  ".join(f"p{p} {percentile(latencies, p) * 1000:.1f}" for p in (50, 90, 99))
+          + f"  max {latencies[-1] * 1000 if latencies else 0:.1f}")
+
+
+if __name__ == "__main__":
+    main()
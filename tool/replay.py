@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上游录制 / 回放：离线运行和压测，不依赖网络
+- record：联网抓一遍 funds.json 里的基金（fundgz、eastmoney 页面、lsjz、批量估值、fundcode_search），
+  经 http_client 的响应观察者把原始响应存成夹具（默认 data/fixtures/<域名>/*.json）
+- synth：没有网络时按 funds.json 生成格式相同的合成夹具（--extra 可再虚构若干只基金）
+- serve：本地回放服务，按夹具返回响应，可注入延迟、5xx、429 限流
+  仓库代码设置 FUND_UPSTREAM=http://127.0.0.1:<端口> 后所有上游请求都发到这里（见 http_client.py）
+夹具按 域名 + 路径 + 查询参数 匹配，时间戳、起止日期等每次都变的参数不参与匹配；
+批量估值接口按基金拆开存，回放时按请求的 Fcodes 现场拼装
+用法：
+    python tool/replay.py synth [--extra 200]
+    python tool/replay.py record [--codes 019020 012868]
+    python tool/replay.py serve --port 8765 --latency 80 --jitter 40 --error-rate 0.02 --throttle-rate 0.01
+    FUND_UPSTREAM=http://127.0.0.1:8765 python success.py
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+# 引用仓库根目录下的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import universe
+
+# ========== 配置 ==========
+FIXTURE_DIR = os.path.join("data", "fixtures")
+IGNORED_PARAMS = {"_", "startDate", "endDate", "rt"}   # 每次请求都不同的参数
+FUNDMOB_PATH = "/FundMNewApi/FundMNFInfo"
+SPLIT_PARAM = "Fcodes"
+
+FUNDGZ_HOST = "fundgz.1234567.com.cn"
+EASTMONEY_HOST = "fund.eastmoney.com"
+LSJZ_HOST = "api.fund.eastmoney.com"
+FUNDMOB_HOST = "fundmobapi.eastmoney.com"
+
+
+# ========== 夹具 ==========
+
+def fixture_key(host: str, path: str, query: str = "", params: Optional[dict] = None) -> str:
+    pairs = parse_qsl(query, keep_blank_values=True) + [(k, str(v)) for k, v in (params or {}).items()]
+    pairs = sorted((k, v) for k, v in pairs if k not in IGNORED_PARAMS)
+    return f"{host}{path}" + (f"?{urlencode(pairs)}" if pairs else "")
+
+
+class FixtureStore:
+    """夹具目录：每个响应一个 JSON 文件 {key, status, content_type, body | body_b64}"""
+
+    def __init__(self, root: str = FIXTURE_DIR):
+        self.root = root
+        self.items: Dict[str, dict] = {}
+
+    def load(self) -> "FixtureStore":
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(".json"):
+                    with open(os.path.join(dirpath, name), "r", encoding="utf-8") as f:
+                        fx = json.load(f)
+                    self.items[fx["key"]] = fx
+        return self
+
+    def put(self, key: str, status: int, content_type: str, body: bytes):
+        fx = {"key": key, "status": status, "content_type": content_type}
+        try:
+            fx["body"] = body.decode("utf-8")
+        except UnicodeDecodeError:
+            fx["body_b64"] = base64.b64encode(body).decode("ascii")
+        self.items[key] = fx
+        host = key.split("/", 1)[0]
+        os.makedirs(os.path.join(self.root, host), exist_ok=True)
+        path = os.path.join(self.root, host, hashlib.sha1(key.encode("utf-8")).hexdigest()[:16] + ".json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(fx, f, ensure_ascii=False)
+
+    def get(self, key: str) -> Optional[dict]:
+        return self.items.get(key)
+
+    @staticmethod
+    def body(fx: dict) -> bytes:
+        if "body_b64" in fx:
+            return base64.b64decode(fx["body_b64"])
+        return fx["body"].encode("utf-8")
+
+
+# ========== 录制 ==========
+
+class Recorder:
+    """http_client 响应观察者：把 200 响应写进夹具；批量估值按基金拆开"""
+
+    def __init__(self, store: FixtureStore):
+        self.store = store
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, url: str, params: Optional[dict], response):
+        if response.status_code != 200:
+            return
+        parts = urlsplit(url)
+        ctype = response.headers.get("Content-Type", "")
+        body = response.content
+        with self._lock:
+            if parts.path == FUNDMOB_PATH:
+                for row in (json.loads(body) or {}).get("Datas") or []:
+                    key = fixture_key(parts.netloc, parts.path, params={SPLIT_PARAM: row.get("FCODE")})
+                    self.store.put(key, 200, ctype, json.dumps(row, ensure_ascii=False).encode("utf-8"))
+                    self.count += 1
+                return
+            self.store.put(fixture_key(parts.netloc, parts.path, parts.query, params), 200, ctype, body)
+            self.count += 1
+
+
+def record(codes: List[str], store: FixtureStore) -> int:
+    import fundlist
+    import http_client
+    import success
+
+    recorder = Recorder(store)
+    http_client.add_observer(recorder)
+    try:
+        success.fetch_estimates_batch(codes)
+        for code in codes:
+            success.fetch_fundgz(code)
+            success.fetch_eastmoney(code)
+            success.fetch_history_nav(code)
+        fundlist.load_fund_list(force=True)
+    finally:
+        http_client.remove_observer(recorder)
+    return recorder.count
+
+
+# ========== 合成 ==========
+
+def _rnd(code: str) -> random.Random:
+    return random.Random(zlib.crc32(code.encode()))
+
+
+def synth_fund(store: FixtureStore, code: str, name: str, days: int = 10, has_estimate: bool = True):
+    """一只基金的四类响应；没有估值的（模拟 QDII）批量接口给 "--"，需要逐只接口兜底"""
+    rnd = _rnd(code)
+    today = date.today()
+    changes = [round(rnd.gauss(0, 1.2), 2) for _ in range(days)]
+    nav = round(rnd.uniform(0.8, 3.0), 4)
+    gszzl = f"{rnd.gauss(0, 1.2):.2f}"
+    gztime = f"{today.isoformat()} 15:00"
+    jzrq = (today - timedelta(days=1)).isoformat()
+
+    est = {"fundcode": code, "name": name, "jzrq": jzrq, "dwjz": f"{nav:.4f}",
+           "gsz": f"{nav * (1 + float(gszzl) / 100):.4f}", "gszzl": gszzl, "gztime": gztime}
+    store.put(fixture_key(FUNDGZ_HOST, f"/js/{code}.js"), 200, "application/javascript; charset=utf-8",
+              f"jsonpgz({json.dumps(est, ensure_ascii=False)});".encode("utf-8"))
+
+    filler = "<div class=\"fundInfoItem\">" + "基金概况 " * 4000 + "</div>"   # 真实页面净值前有几十 KB
+    html = (f"<html><head><meta charset=\"utf-8\"><title>{name}({code})</title></head><body>{filler}"
+            f"<dl class=\"dataItem02\"><dt>单位净值 ({jzrq})</dt><dd><span>{nav:.4f}</span>"
+            f"<span>({float(changes[0]):+.2f}%)</span></dd></dl>{filler}</body></html>")
+    store.put(fixture_key(EASTMONEY_HOST, f"/{code}.html"), 200, "text/html; charset=utf-8", html.encode("utf-8"))
+
+    rows = []
+    for i, pct in enumerate(changes):   # 新到旧
+        rows.append({"FSRQ": (today - timedelta(days=i + 1)).isoformat(), "DWJZ": f"{nav:.4f}",
+                     "LJJZ": f"{nav:.4f}", "JZZZL": f"{pct:.2f}"})
+    lsjz = {"Data": {"LSJZList": rows}, "ErrCode": 0, "TotalCount": len(rows), "PageSize": days,
+            "PageIndex": 1}
+    store.put(fixture_key(LSJZ_HOST, "/f10/lsjz", params={"fundCode": code, "pageIndex": 1, "pageSize": days}),
+              200, "application/json; charset=utf-8", json.dumps(lsjz, ensure_ascii=False).encode("utf-8"))
+
+    row = {"FCODE": code, "SHORTNAME": name, "PDATE": jzrq, "NAV": f"{nav:.4f}",
+           "GSZ": est["gsz"] if has_estimate else "--", "GSZZL": gszzl if has_estimate else "--",
+           "GZTIME": gztime if has_estimate else "--"}
+    store.put(fixture_key(FUNDMOB_HOST, FUNDMOB_PATH, params={SPLIT_PARAM: code}), 200,
+              "application/json; charset=utf-8", json.dumps(row, ensure_ascii=False).encode("utf-8"))
+
+
+def synth(store: FixtureStore, extra: int = 0, universe_size: int = 20000) -> int:
+    from bench_match import synth_universe
+
+    u = universe.current()
+    qdii = set(u.watchlists.get("qdii", []))
+    funds = [(e["code"], e["name"]) for e in u.entries]
+    funds += [(f"9{i:05d}", f"合成测试基金{i}号混合C") for i in range(extra)]
+    for code, name in funds:
+        synth_fund(store, code, name, has_estimate=code not in qdii)
+
+    listing = [[code, "", name, "混合型-偏股", ""] for code, name in funds] + synth_universe(universe_size)
+    body = "var r = " + json.dumps(listing, ensure_ascii=False) + ";"
+    store.put(fixture_key(EASTMONEY_HOST, "/js/fundcode_search.js"), 200, "application/javascript",
+              body.encode("utf-8"))
+    return len(store.items)
+
+
+# ========== 回放服务 ==========
+
+class _QuietServer(ThreadingHTTPServer):
+    """客户端提前断开（如 eastmoney 流式读到净值就关闭连接）是正常情况，不打印异常栈"""
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+class StubServer:
+    """
+    按夹具回放上游响应；路径格式 /{原域名}{原路径}?{原查询}
+    latency / jitter：每个请求的延迟（毫秒，均值 / 均匀抖动）
+    error_rate：返回 503 的比例；throttle_rate：返回 429（Retry-After: 1）的比例
+    """
+
+    def __init__(self, store: FixtureStore, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, seed: Optional[int] = None):
+        self.store = store
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.stats = {"requests": 0, "hits": 0, "misses": 0, "errors": 0, "throttled": 0}
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = _QuietServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-upstream", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _roll(self) -> (float, str):
+        """本次请求的延迟（秒）和注入的故障"""
+        with self._lock:
+            delay = max(0.0, self.latency + self._rnd.uniform(-self.jitter, self.jitter)) / 1000
+            r = self._rnd.random()
+        if r < self.error_rate:
+            return delay, "error"
+        if r < self.error_rate + self.throttle_rate:
+            return delay, "throttle"
+        return delay, ""
+
+    def resolve(self, path: str) -> Optional[tuple]:
+        """返回 (status, content_type, body)，没有夹具返回 None"""
+        parts = urlsplit(path)
+        host, _, rest = parts.path.lstrip("/").partition("/")
+        rest = "/" + rest
+        if rest == FUNDMOB_PATH:
+            codes = dict(parse_qsl(parts.query)).get(SPLIT_PARAM, "")
+            rows = []
+            for code in filter(None, codes.split(",")):
+                fx = self.store.get(fixture_key(host, rest, params={SPLIT_PARAM: code}))
+                if fx:
+                    rows.append(json.loads(FixtureStore.body(fx)))
+            body = {"Datas": rows, "ErrCode": 0, "Success": True, "TotalCount": len(rows)}
+            return 200, "application/json; charset=utf-8", json.dumps(body, ensure_ascii=False).encode("utf-8")
+        fx = self.store.get(fixture_key(host, rest, parts.query))
+        if fx is None:
+            return None
+        return fx["status"], fx["content_type"], FixtureStore.body(fx)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"   # keep-alive，与真实上游一样复用连接
+
+            def do_GET(self):
+                stub._count("requests")
+                delay, fault = stub._roll()
+                if delay:
+                    time.sleep(delay)
+                if fault == "error":
+                    stub._count("errors")
+                    return self._send(503, "text/plain", b"injected error")
+                if fault == "throttle":
+                    stub._count("throttled")
+                    return self._send(429, "text/plain", b"injected throttle", {"Retry-After": "1"})
+                resolved = stub.resolve(self.path)
+                if resolved is None:
+                    stub._count("misses")
+                    return self._send(404, "text/plain", b"no fixture")
+                stub._count("hits")
+                self._send(*resolved)
+
+            def _send(self, status: int, content_type: str, body: bytes, headers: Optional[dict] = None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="上游录制 / 回放")
+    parser.add_argument("--dir", default=FIXTURE_DIR, help="夹具目录")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("record", help="联网录制真实响应")
+    p.add_argument("--codes", nargs="*", help="默认 funds.json 全部基金")
+
+    p = sub.add_parser("synth", help="生成合成夹具")
+    p.add_argument("--extra", type=int, default=0, help="额外虚构多少只基金")
+    p.add_argument("--universe", type=int, default=20000, help="fundcode_search 名单里的合成基金数")
+
+    p = sub.add_parser("serve", help="启动回放服务")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--latency", type=float, default=0.0, help="平均延迟（毫秒）")
+    p.add_argument("--jitter", type=float, default=0.0, help="延迟抖动（毫秒）")
+    p.add_argument("--error-rate", type=float, default=0.0, help="返回 503 的比例")
+    p.add_argument("--throttle-rate", type=float, default=0.0, help="返回 429 的比例")
+    args = parser.parse_args()
+
+    store = FixtureStore(args.dir)
+    if args.cmd == "record":
+        codes = args.codes or [e["code"] for e in universe.current().entries]
+        print(f"录制 {record(codes, store)} 个响应 → {args.dir}")
+    elif args.cmd == "synth":
+        print(f"生成 {synth(store, args.extra, args.universe)} 个夹具 → {args.dir}")
+    else:
+        store.load()
+        if not store.items:
+            parser.error(f"{args.dir} 没有夹具，先运行 record 或 synth")
+        server = StubServer(store, args.host, args.port, args.latency, args.jitter,
+                            args.error_rate, args.throttle_rate)
+        print(f"回放 {len(store.items)} 个夹具：{server.url}（FUND_UPSTREAM={server.url}）")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            print("统计:", server.stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,16 @@
 测试抓取单只基金历史净值（涨跌百分比）脚本
 """
 
-import requests
+import os
+import sys
 import json
 import re
 from datetime import datetime, timedelta
 
+# 复用仓库根目录下的共享 HTTP 客户端（连接池 + 重试）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import http_client
+
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.0.0 Safari/537.36",
 }
@@ -28,7 +33,7 @@ def fetch_history_nav(code: str, days: int = 5):
     headers = HEADERS.copy()
     headers["Referer"] = f"https://fundf10.eastmoney.com/jjjz_{code}.html"
     try:
-        r = requests.get(url, headers=headers, params=params, timeout=8)
+        r = http_client.get(url, headers=headers, params=params, timeout=8)
         print("Raw response for code", code, ":", r.text[:500])
         # 提取回调函数包裹的 JSON
         m = re.search(r"\((\{.*\})\)", r.text)
@@ -45,7 +50,7 @@ def fetch_history_nav(code: str, days: int = 5):
             val = row.get("JZZZL", "")
             if val and re.match(r"[\-\+]?\d+(\.\d+)?", str(val)):
                 pct.append(float(val))
-        return list(reversed(pct))[:days]
+        return list(reversed(pct))[-days:]  # 从旧到新的最近 N 日
     except Exception as e:
         print("异常:", e)
         return []
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+universe.py
+- 跟踪的基金名单从配置文件加载（默认仓库根目录 funds.json，环境变量 FUND_UNIVERSE 可指定其他路径）
+- 按代码建字典索引，按代码查基金 O(1)
+- 每个用户的自选列表（watchlists）只是代码列表，数据都取自共享快照，不按用户重复抓取 / 计算
+- 文件修改后自动重新加载（最多每 RELOAD_CHECK_SECONDS 秒检查一次修改时间）
+- shard() 把名单稳定地切成 N 份，供多进程分片处理
+
+funds.json 格式：
+    {
+      "funds": [{"code": "019020", "name": "...", "match_name": "可选，按名称匹配代码时用的名称", "enabled": true}, ...],
+      "watchlists": {"qdii": ["012868", ...], ...}
+    }
+enabled 为 false 的基金不参与抓取，只保留在名称匹配清单里；自选列表 "all" 固定为全部启用的基金
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
+# ========== 配置 ==========
+UNIVERSE_PATH = os.environ.get("FUND_UNIVERSE",
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), "funds.json"))
+RELOAD_CHECK_SECONDS = 5.0
+ALL_WATCHLIST = "all"
+
+
+class Universe:
+    def __init__(self, entries: List[dict], watchlists: Optional[Dict[str, List[str]]] = None,
+                 version: str = ""):
+        self.entries = entries
+        # 启用的基金，格式与原 success.FUNDS 一致：[{"name", "code"}, ...]
+        self.funds: List[dict] = [{"name": e["name"], "code": e["code"]}
+                                  for e in entries if e.get("enabled", True)]
+        self.by_code: Dict[str, dict] = {f["code"]: f for f in self.funds}
+        self.version = version
+        self.watchlists: Dict[str, List[str]] = {ALL_WATCHLIST: [f["code"] for f in self.funds]}
+        for name, codes in (watchlists or {}).items():
+            # 只保留名单里启用的基金，保持配置中的顺序、去重
+            self.watchlists[name] = [c for c in dict.fromkeys(codes) if c in self.by_code]
+
+    @classmethod
+    def load(cls, path: str = UNIVERSE_PATH) -> "Universe":
+        with open(path, "rb") as f:
+            raw = f.read()
+        doc = json.loads(raw.decode("utf-8"))
+        entries = []
+        for e in doc.get("funds", []):
+            if not e.get("code") or not e.get("name"):
+                raise ValueError(f"{path}: 基金条目缺少 code / name：{e}")
+            entries.append(e)
+        return cls(entries, doc.get("watchlists"), hashlib.sha1(raw).hexdigest()[:12])
+
+    def get(self, code: str) -> Optional[dict]:
+        return self.by_code.get(code)
+
+    def name_of(self, code: str, default: str = "未知名称") -> str:
+        f = self.by_code.get(code)
+        return f["name"] if f else default
+
+    def watchlist(self, name: str) -> Optional[List[dict]]:
+        """自选列表对应的基金（{"name", "code"}），不存在返回 None"""
+        codes = self.watchlists.get(name)
+        if codes is None:
+            return None
+        return [self.by_code[c] for c in codes]
+
+    def match_names(self) -> List[str]:
+        """按名称匹配代码时使用的名称清单（含未启用的基金）"""
+        return [e.get("match_name") or e["name"] for e in self.entries]
+
+
+def shard(funds: List[dict], n: int) -> List[List[dict]]:
+    """按代码的 CRC32 稳定切成 n 份（同一只基金总落在同一份），每份保持原顺序"""
+    n = max(1, n)
+    parts: List[List[dict]] = [[] for _ in range(n)]
+    for f in funds:
+        parts[zlib.crc32(f["code"].encode()) % n].append(f)
+    return parts
+
+
+_current: Optional[Universe] = None
+_current_mtime = 0.0
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def current(path: str = UNIVERSE_PATH) -> Universe:
+    """进程内共享的名单；文件有修改时重新加载，加载失败则继续用旧名单"""
+    global _current, _current_mtime, _checked_at
+    with _lock:
+        now = time.monotonic()
+        if _current is not None and now - _checked_at < RELOAD_CHECK_SECONDS:
+            return _current
+        _checked_at = now
+        mtime = os.path.getmtime(path) if os.path.exists(path) else 0.0
+        if _current is None or mtime != _current_mtime:
+            try:
+                _current = Universe.load(path)
+                _current_mtime = mtime
+            except (OSError, ValueError) as e:
+                if _current is None:
+                    raise
+                print("重新加载基金名单失败，继续使用旧名单:", e)
+        return _current
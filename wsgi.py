@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+wsgi.py
+- 生产环境入口：gunicorn -c gunicorn.conf.py wsgi:application
+- 每个 worker 导入时先加载上次持久化的快照（重启后马上能作答），再启动调度线程，
+  但只有抢到 data/scheduler.lock 的 worker 抓取上游，其余 worker 直接读共享快照（data/snapshot.db）
+"""
+
+from app import app, preload_snapshot, start_scheduler
+
+preload_snapshot()
+start_scheduler()
+
+application = app